@@ -0,0 +1,67 @@
+class ContigFile:
+    """
+    FASTA file of contigs written by ContigWriter, read one record at a time so the contigs
+    never have to be held in memory. Headers are ">contig_<id> length=<bases> coverage=<mean>"
+    (coverage only when known); contig ids count the contigs from 1 in file order.
+    Iterating yields the contig sequences.
+    """
+
+    def __init__(self, fileLocation, stats=None):
+        self.fileLocation = fileLocation
+        # summary statistics from the writer, when the file was just written
+        self.stats = stats
+
+    # Input: header line
+    # Output: contig id, length, coverage (None when the header has none)
+    def parseHeader(self, line):
+        fields = line[1:].split()
+        contigId = int(fields[0].rsplit("_", 1)[1])
+        values = dict(field.split("=", 1) for field in fields[1:])
+        coverage = values.get("coverage")
+        return (
+            contigId,
+            int(values["length"]),
+            None if coverage is None else float(coverage),
+        )
+
+    # Output: (contig id, sequence, length, coverage) of every contig, in file order
+    def records(self):
+        header = None
+        sequence = []
+        with open(self.fileLocation, "r") as file:
+            for line in file:
+                if line[0] == ">":
+                    if header is not None:
+                        yield (header[0], "".join(sequence), *header[1:])
+                    header = self.parseHeader(line)
+                    sequence = []
+                elif line.strip():
+                    sequence.append(line.strip())
+        if header is not None:
+            yield (header[0], "".join(sequence), *header[1:])
+
+    # Output: (contig id, length, coverage) of every contig, read from the headers only
+    def headers(self):
+        with open(self.fileLocation, "r") as file:
+            for line in file:
+                if line[0] == ">":
+                    yield self.parseHeader(line)
+
+    def __iter__(self):
+        return (sequence for _, sequence, _, _ in self.records())
+
+    def __len__(self):
+        if self.stats is not None:
+            return self.stats["count"]
+        return sum(1 for _ in self.headers())
+
+    # Output: length of every contig
+    def lengths(self):
+        return [length for _, length, _ in self.headers()]
+
+    # Output: coverage of every contig, or None when the file has no coverage
+    def coverage(self):
+        coverage = [contigCoverage for _, _, contigCoverage in self.headers()]
+        if not coverage or None in coverage:
+            return None
+        return coverage
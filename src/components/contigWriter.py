@@ -0,0 +1,91 @@
+from collections import Counter
+from components.contigFile import ContigFile
+
+
+class ContigWriter:
+    """
+    Streams contigs to a FASTA file as they are created, dropping the ones shorter than
+    minContigLength. Count, total length, minimum and maximum are updated with every contig;
+    N50 and L50 come from a count of each contig length, so no contig is kept in memory.
+    """
+
+    def __init__(self, fileLocation, minContigLength=0, lineWidth=80):
+        self.fileLocation = fileLocation
+        self.minContigLength = minContigLength
+        # bases per sequence line
+        self.lineWidth = lineWidth
+        self.file = open(fileLocation, "w")
+        self.count = 0
+        self.totalLength = 0
+        self.minLength = None
+        self.maxLength = None
+        # contigs shorter than minContigLength
+        self.filtered = 0
+        # number of written contigs of each length
+        self.lengthCounts = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Input: contig sequence, mean coverage (None when unknown)
+    # Output: whether the contig was written (it is long enough)
+    def write(self, sequence, coverage=None):
+        length = len(sequence)
+        if length < self.minContigLength:
+            self.filtered += 1
+            return False
+        self.count += 1
+        self.totalLength += length
+        if self.minLength is None or length < self.minLength:
+            self.minLength = length
+        if self.maxLength is None or length > self.maxLength:
+            self.maxLength = length
+        self.lengthCounts[length] += 1
+
+        header = f">contig_{self.count} length={length}"
+        if coverage is not None:
+            header += f" coverage={coverage:.3f}"
+        lines = [
+            sequence[start : start + self.lineWidth]
+            for start in range(0, length, self.lineWidth)
+        ]
+        self.file.write(header + "\n" + "".join(line + "\n" for line in lines))
+        return True
+
+    # Output: N50 (length of the contig that takes the longest contigs past half of the
+    #         total length) and L50 (number of contigs needed), 0 without contigs
+    def n50(self):
+        half = self.totalLength / 2
+        cumulativeLength = 0
+        cumulativeCount = 0
+        for length in sorted(self.lengthCounts, reverse=True):
+            count = self.lengthCounts[length]
+            if cumulativeLength + length * count >= half:
+                # contigs of this length needed to reach half of the total
+                needed = max(1, -(-(half - cumulativeLength) // length))
+                return length, cumulativeCount + int(needed)
+            cumulativeLength += length * count
+            cumulativeCount += count
+        return 0, 0
+
+    # Output: summary statistics of the written contigs
+    def stats(self):
+        n50, l50 = self.n50()
+        return {
+            "count": self.count,
+            "totalLength": self.totalLength,
+            "minLength": self.minLength or 0,
+            "maxLength": self.maxLength or 0,
+            "n50": n50,
+            "l50": l50,
+            "filtered": self.filtered,
+        }
+
+    # Output: contig file to read the contigs back lazily
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        return ContigFile(self.fileLocation, stats=self.stats())
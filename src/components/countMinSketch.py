@@ -0,0 +1,70 @@
+import math
+import numpy as np
+
+# counters saturate at this value (uint8 counters)
+MAX_SKETCH_COUNT = 255
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of k-mer codes with a fixed memory budget: depth rows of width
+    saturating uint8 counters. Estimates never undercount, so a k-mer whose estimate is
+    below a threshold was seen fewer times than the threshold.
+    """
+
+    def __init__(self, memoryBudget, falsePositiveRate=0.01, seed=0):
+        if not 0 < falsePositiveRate < 1:
+            raise ValueError("False positive rate must be between 0 and 1")
+        # the usual count-min bound: ln(1 / delta) rows, each as wide as the budget allows
+        self.depth = max(1, math.ceil(math.log(1 / falsePositiveRate)))
+        self.width = int(min(memoryBudget // self.depth, 2**32))
+        if self.width < 1024:
+            raise ValueError(
+                f"Memory budget of {memoryBudget} bytes is too small for a count-min sketch"
+            )
+        self.falsePositiveRate = falsePositiveRate
+        # multiply-shift hashing: the top 32 bits of code * multiplier (odd) are scaled to the
+        # row width, so the whole budget is used without rounding the width to a power of 2
+        rng = np.random.default_rng(seed)
+        self.multipliers = (
+            rng.integers(0, 2**63, size=self.depth, dtype=np.uint64) * np.uint64(2)
+            + np.uint64(1)
+        )
+        self.table = np.zeros((self.depth, self.width), dtype=np.uint8)
+
+    # Output: bytes held by the counters
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    # Input: k-mer codes
+    # Output: generator of (row, counter of each code in the row), one row at a time
+    def rowSlots(self, codes):
+        codes = np.asarray(codes, dtype=np.uint64)
+        for row, multiplier in zip(self.table, self.multipliers):
+            hashes = (codes * multiplier) >> np.uint64(32)
+            yield row, (hashes * np.uint64(self.width)) >> np.uint64(32)
+
+    # Input: k-mer codes (one entry per occurrence)
+    # Output: counters of the codes incremented
+    def add(self, codes):
+        for row, slots in self.rowSlots(codes):
+            uniqueSlots, slotCounts = np.unique(slots, return_counts=True)
+            row[uniqueSlots] = np.minimum(
+                row[uniqueSlots].astype(np.int64) + slotCounts, MAX_SKETCH_COUNT
+            )
+
+    # Input: k-mer codes
+    # Output: estimated count of each code (at least its true count)
+    def estimate(self, codes):
+        estimates = np.full(len(codes), MAX_SKETCH_COUNT, dtype=np.uint8)
+        for row, slots in self.rowSlots(codes):
+            np.minimum(estimates, row[slots], out=estimates)
+        return estimates
+
+    # Input: threshold
+    # Output: estimated probability that a k-mer seen once has an estimate of at least the threshold
+    #         (every row collides with enough other counts; approximated by the row occupancy)
+    def estimatedFalsePositiveRate(self, threshold=2):
+        occupancy = (self.table >= threshold - 1).mean(axis=1)
+        return float(np.prod(occupancy))
@@ -1,15 +1,87 @@
 import json
 import logging
 import time
-from collections import defaultdict, deque
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import os
+from components.contigWriter import ContigWriter
+from components.csrGraph import CsrGraph
+
+
+# ways of turning the graph into contigs
+CONTIG_MODES = ["greedy", "unitigs", "paths"]
+
+# CreateContigs instance of a worker process, over the shared graph
+workerContigs = None
+# node ids of every component (grouped by component) and start of each, shared with the graph
+workerComponents = None
+
+
+# Input: descriptor of the shared graph, CreateContigs settings
+# Output: worker process attached to the shared graph. Runs once in every worker process.
+def attachContigWorker(descriptor, settings):
+    global workerContigs, workerComponents
+    graph, workerComponents = CsrGraph.fromSharedMemory(descriptor)
+    workerContigs = CreateContigs(graph, **settings)
+
+
+# Input: component ids
+# Output: (component, paths, capped start nodes, timed out) of each component. Runs in a worker process.
+def assembleComponents(components):
+    componentNodes = workerComponents["componentNodes"]
+    componentIndptr = workerComponents["componentIndptr"]
+    return [
+        (
+            component,
+            *workerContigs.componentPaths(
+                componentNodes[
+                    componentIndptr[component] : componentIndptr[component + 1]
+                ].tolist()
+            ),
+        )
+        for component in components
+    ]
 
 
 class CreateContigs:
-    def __init__(self, graph):
+    def __init__(
+        self,
+        graph,
+        overlap=None,
+        mode="greedy",
+        maxPathsPerStart=1000,
+        maxPathLength=10000,
+        componentTimeBudget=60.0,
+        workers=1,
+        minContigLength=0,
+        contigsFile=None,
+    ):
+        # CSR graph, or an edge dictionary (node -> list of nodes)
+        if not isinstance(graph, CsrGraph):
+            graph = CsrGraph.fromEdgeDict(graph)
+        if mode not in CONTIG_MODES:
+            raise ValueError(f"Contig mode must be one of {CONTIG_MODES}")
         self.graph = graph
-        self.edgesCount = defaultdict(lambda: [0, 0])  # [incoming, outgoing]
+        # number of bases shared by consecutive nodes of a path: k - 2 for a compacted graph of
+        # unitig sequences, None for (k-1)-mer nodes (each node adds its last base)
+        self.overlap = overlap
+        # greedy: coverage-guided walks, unitigs: maximal non-branching paths (both O(V + E), every
+        # edge used once), paths: every path from each start node (exponential on branchy graphs)
+        self.mode = mode
+        # caps of the paths mode: paths kept per start node, nodes in a path, seconds of search
+        # per weakly connected component
+        self.maxPathsPerStart = maxPathsPerStart
+        self.maxPathLength = maxPathLength
+        self.componentTimeBudget = componentTimeBudget
+        # processes the weakly connected components are spread over
+        self.workers = workers
+        # contigs shorter than this many bases are not written
+        self.minContigLength = minContigLength
         self.allPaths = []
+        self.contigs = []
+        # mean coverage of each contig (same order as the contigs), when the graph has node coverage
+        self.contigCoverage = []
         scriptDir = os.path.dirname(os.path.dirname(__file__))
         dataDir = "data"
         dataDir = os.path.join(scriptDir, "data")
@@ -17,153 +89,449 @@ class CreateContigs:
         self.outputDataDir = os.path.join(dataDir, "output_data")
         os.makedirs(self.logsDataDir, exist_ok=True)
         os.makedirs(self.outputDataDir, exist_ok=True)
+        # FASTA file the contigs are streamed to
+        self.contigsFile = (
+            os.path.join(self.outputDataDir, "contigs.fasta")
+            if contigsFile is None
+            else contigsFile
+        )
 
-    # Input: edge list from readsToKmers
-    # Output: a list of all start nodes (nodes that only have outgoing edges)
+    # Input: graph
+    # Output: [incoming, outgoing] edge counts of every node (keyed by node sequence), a list of all
+    #         start nodes (nodes that only have outgoing edges)
     def findStartNodes(self):
-        startNodes = []
-
-        for node, edges in self.graph.items():
-            self.edgesCount[node][1] += len(edges)
-            for edge in edges:
-                self.edgesCount[edge][0] += 1
-
-        startNodes = [
-            node for node, counts in self.edgesCount.items() if counts[0] == 0
-        ]
-        return self.edgesCount, startNodes
+        graph = self.graph
+        edgesCount = {
+            sequence: [incoming, outgoing]
+            for sequence, incoming, outgoing in zip(
+                graph.sequences(), graph.inDegree.tolist(), graph.outDegree.tolist()
+            )
+        }
+        startNodes = graph.sequences(np.flatnonzero(graph.inDegree == 0))
+        return edgesCount, startNodes
 
-    # Input: node to check
+    # Input: node id to check
     # Output: bool, node is end of path or not
     def checkIfLastNode(self, currentNode):
-        # if the currentNode is not in the graph or the # of outgoing edges for the current node is 0, return True
-        return currentNode not in self.graph or self.edgesCount[currentNode][1] == 0
-
-    # Input: node to check
-    # Output: bool, list of children (nodes connected to current node via an outgoing edge from the current node)
-    def lookForChildren(self, currentNode):
-        if len(self.graph[currentNode]) > 1:
-            return True, self.graph[currentNode]
+        # if the # of outgoing edges for the current node is 0, return True
+        return self.graph.outDegree[currentNode] == 0
+
+    # Input: node id
+    # Output: children of the node, highest coverage (edge weight) first
+    def orderedChildren(self, currentNode):
+        children = self.graph.outNeighbors(currentNode)
+        if len(children) > 1:
+            weights = self.graph.outWeights(currentNode).astype(np.int64)
+            children = children[np.argsort(-weights, kind="stable")]
+        return children.tolist()
+
+    # Input: start node, time.monotonic() deadline of the start node's component
+    # Output: paths from the start node to a dead end (or cut at maxPathLength nodes), at most
+    #         maxPathsPerStart of them, and whether the deadline was hit. The search is a
+    #         depth-first search that never revisits a node of the current path (loops are
+    #         collapsed) and follows the highest coverage branch first. Paths are chains of
+    #         (node, parent entry) entries, so paths sharing a prefix store it once.
+    def followPaths(self, startNode, deadline):
+        nodes = [startNode]
+        parents = [-1]
+        pathEnds = []
+        if self.checkIfLastNode(startNode) or self.maxPathLength <= 1:
+            return [self.pathFromEntry(nodes, parents, 0)], False
+
+        onPath = self.onPath
+        onPath[startNode] = True
+        stack = [(0, iter(self.orderedChildren(startNode)))]
+        timedOut = False
+        steps = 0
+        while stack and len(pathEnds) < self.maxPathsPerStart:
+            if not steps % 1024 and time.monotonic() > deadline:
+                timedOut = True
+                break
+            steps += 1
+            entry, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                onPath[nodes[entry]] = False
+                stack.pop()
+                continue
+            if onPath[child]:  # collapses loop
+                continue
+            nodes.append(child)
+            parents.append(entry)
+            if self.checkIfLastNode(child) or len(stack) + 1 >= self.maxPathLength:
+                pathEnds.append(len(nodes) - 1)
+            else:
+                onPath[child] = True
+                stack.append((len(nodes) - 1, iter(self.orderedChildren(child))))
+        for entry, children in stack:
+            onPath[nodes[entry]] = False
+
+        return [self.pathFromEntry(nodes, parents, entry) for entry in pathEnds], timedOut
+
+    # Input: path entries (node and parent entry of each), last entry of a path
+    # Output: node ids of the path
+    def pathFromEntry(self, nodes, parents, entry):
+        path = []
+        while entry != -1:
+            path.append(nodes[entry])
+            entry = parents[entry]
+        return path[::-1]
+
+    # Output: node and edge lists used by the traversals, built once per graph
+    def prepareTraversal(self):
+        graph = self.graph
+        # out-edges of every node, highest weight first
+        edgeOrder = np.lexsort(
+            (-graph.edgeWeights.astype(np.int64), graph.edgeSources())
+        )
+        self.walkTargets = graph.outIndices[edgeOrder].tolist()
+        self.nextEdge = graph.outIndptr[:-1].tolist()
+        self.lastEdge = graph.outIndptr[1:].tolist()
+        self.outIndices = graph.outIndices.tolist()
+        self.outIndptr = graph.outIndptr.tolist()
+        self.inDegree = graph.inDegree.tolist()
+        self.isOneInOneOut = ((graph.inDegree == 1) & (graph.outDegree == 1)).tolist()
+        self.isIsolated = ((graph.inDegree == 0) & (graph.outDegree == 0)).tolist()
+        self.nodeCoverage = (
+            np.zeros(graph.numNodes)
+            if graph.nodeCoverage is None
+            else np.asarray(graph.nodeCoverage)
+        ).tolist()
+        self.visited = [False] * graph.numNodes
+        self.onPath = [False] * graph.numNodes
+
+    # Input: node ids of a weakly connected component (ascending)
+    # Output: maximal non-branching paths. Every path starts at a node that is not 1-in-1-out,
+    #         follows one of its out-edges and continues through 1-in-1-out nodes; isolated
+    #         cycles become one path each. Every edge is in exactly one path.
+    def nonBranchingPaths(self, nodes):
+        outIndices = self.outIndices
+        outIndptr = self.outIndptr
+        isOneInOneOut = self.isOneInOneOut
+        visited = self.visited
+        paths = []
+        for node in nodes:
+            if isOneInOneOut[node]:
+                continue
+            visited[node] = True
+            if self.isIsolated[node]:
+                paths.append([node])
+            for edge in range(outIndptr[node], outIndptr[node + 1]):
+                path = [node]
+                child = outIndices[edge]
+                path.append(child)
+                while isOneInOneOut[child]:
+                    visited[child] = True
+                    child = outIndices[outIndptr[child]]
+                    path.append(child)
+                paths.append(path)
+        for node in nodes:
+            if visited[node]:
+                continue
+            # a cycle of 1-in-1-out nodes, walked once from its smallest node id
+            path = [node]
+            visited[node] = True
+            child = outIndices[outIndptr[node]]
+            while child != node:
+                visited[child] = True
+                path.append(child)
+                child = outIndices[outIndptr[child]]
+            paths.append(path)
+        return paths
+
+    # Input: node ids of a weakly connected component (ascending)
+    # Output: coverage-guided walks. A walk starts at a node with unused out-edges (start nodes
+    #         first, highest coverage first) and follows the unused out-edge with the highest
+    #         weight until it reaches a node without one. Every edge is used once, and nodes
+    #         without edges are contigs of their own.
+    def greedyPaths(self, nodes):
+        targets = self.walkTargets
+        nextEdge = self.nextEdge
+        lastEdge = self.lastEdge
+        inDegree = self.inDegree
+        coverage = self.nodeCoverage
+        paths = []
+        startOrder = sorted(
+            nodes, key=lambda node: (inDegree[node] != 0, -coverage[node])
+        )
+        for start in startOrder:
+            if self.isIsolated[start]:
+                paths.append([start])
+            while nextEdge[start] < lastEdge[start]:
+                path = [start]
+                node = start
+                while nextEdge[node] < lastEdge[node]:
+                    child = targets[nextEdge[node]]
+                    nextEdge[node] += 1
+                    path.append(child)
+                    node = child
+                paths.append(path)
+        return paths
+
+    # Input: node ids of a weakly connected component (ascending)
+    # Output: paths from every start node of the component (paths mode), number of start nodes
+    #         that reached maxPathsPerStart paths, whether the component spent its
+    #         componentTimeBudget seconds (its remaining start nodes are then skipped)
+    def enumeratePaths(self, nodes):
+        deadline = time.monotonic() + self.componentTimeBudget
+        cappedStarts = 0
+        timedOut = False
+        paths = []
+        # given the list of startNodes, explore all possible paths from each start node
+        for node in nodes:
+            if self.inDegree[node]:
+                continue
+            startPaths, timedOut = self.followPaths(node, deadline)
+            if len(startPaths) >= self.maxPathsPerStart:
+                cappedStarts += 1
+            paths.extend(startPaths)
+            if timedOut:
+                break
+        return paths, cappedStarts, timedOut
+
+    # Input: node ids of a weakly connected component (ascending)
+    # Output: paths of the component, start nodes that reached maxPathsPerStart paths and
+    #         whether the component ran out of time (paths mode)
+    def componentPaths(self, nodes):
+        if not hasattr(self, "walkTargets"):
+            self.prepareTraversal()
+        if self.mode == "greedy":
+            return self.greedyPaths(nodes), 0, False
+        if self.mode == "unitigs":
+            return self.nonBranchingPaths(nodes), 0, False
+        return self.enumeratePaths(nodes)
+
+    # Input: node ids of each component (nodes grouped by component, start of every component)
+    # Output: (component, paths, capped start nodes, timed out) of every component as it is
+    #         ready, in component order, worked out by a pool of processes that share the graph
+    #         arrays. Components are handed out largest first; small components are grouped so
+    #         each task has a similar amount of work. Finished components wait only for the
+    #         components before them.
+    def assembleComponentsInParallel(self, componentNodes, componentIndptr):
+        graph = self.graph
+        componentSizes = np.diff(componentIndptr) + np.add.reduceat(
+            graph.outDegree[componentNodes].astype(np.int64), componentIndptr[:-1]
+        )
+        taskSize = max(1, int(componentSizes.sum()) // (self.workers * 16))
+        tasks = []
+        currentTask, currentSize = [], 0
+        for component in np.argsort(-componentSizes, kind="stable").tolist():
+            currentTask.append(component)
+            currentSize += int(componentSizes[component])
+            if currentSize >= taskSize:
+                tasks.append(currentTask)
+                currentTask, currentSize = [], 0
+        if currentTask:
+            tasks.append(currentTask)
+
+        settings = {
+            "mode": self.mode,
+            "maxPathsPerStart": self.maxPathsPerStart,
+            "maxPathLength": self.maxPathLength,
+            "componentTimeBudget": self.componentTimeBudget,
+        }
+        finished = {}
+        nextComponent = 0
+        sharedMemory, descriptor = graph.toSharedMemory(
+            {"componentNodes": componentNodes, "componentIndptr": componentIndptr}
+        )
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=attachContigWorker,
+                initargs=(descriptor, settings),
+            ) as executor:
+                for taskResults in executor.map(assembleComponents, tasks):
+                    for component, *componentResult in taskResults:
+                        finished[component] = componentResult
+                    while nextComponent in finished:
+                        yield (nextComponent, *finished.pop(nextComponent))
+                        nextComponent += 1
+        finally:
+            sharedMemory.close()
+            sharedMemory.unlink()
+
+    # Input: graph
+    # Output: paths of every weakly connected component, in component order (components are
+    #         numbered by their smallest node id), so the paths do not depend on the workers.
+    #         Paths are yielded one component at a time.
+    def assemblePaths(self):
+        graph = self.graph
+        components = graph.weaklyConnectedComponents()
+        numComponents = int(components.max()) + 1 if len(components) else 0
+        componentNodes = np.argsort(components, kind="stable")
+        componentIndptr = np.zeros(numComponents + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(components, minlength=numComponents), out=componentIndptr[1:]
+        )
+
+        if self.workers > 1 and numComponents > 1:
+            results = self.assembleComponentsInParallel(componentNodes, componentIndptr)
         else:
-            return False, []
-
-    # Input: node that has children from original path, original path
-    # Output: a continuation of the original path (can yeild more than one possible path)
-    def followSubPath(self, startNode, originalPath):
-        stack = deque([(startNode, originalPath + [startNode])])
-        # continuation of modified DFS, creating a new path everytime a split occurs (2 or more outgoing edges from a single node)
-        while stack:
-            currentNode, path = stack.pop()
-            if self.checkIfLastNode(currentNode=currentNode):
-                yield path  # pause followSubPath execution, redirect control to followPath for consumption of yielded path
+            results = (
+                (component, *self.componentPaths(componentNodes[start:stop].tolist()))
+                for component, (start, stop) in enumerate(
+                    zip(componentIndptr[:-1].tolist(), componentIndptr[1:].tolist())
+                )
+            )
+
+        cappedStarts = 0
+        timedOutComponents = 0
+        for component, componentPaths, capped, timedOut in results:
+            cappedStarts += capped
+            timedOutComponents += timedOut
+            yield from componentPaths
+        logging.info(f"\tWeakly connected components: {numComponents}")
+        if self.mode == "paths":
+            logging.info(
+                f"\tStart nodes that reached {self.maxPathsPerStart} paths: {cappedStarts}"
+            )
+            logging.info(
+                f"\tComponents that spent their {self.componentTimeBudget}s budget: {timedOutComponents}"
+            )
+
+    # Input: contigs
+    # Output: indices of the contigs that are neither a copy nor a substring of another contig
+    #         (first copy kept, in contig order). Copies are found by hashing. Contigs are then
+    #         checked longest first against the ones kept so far, which are indexed by seeds
+    #         (seedLength bases, at most the shortest contig) taken every `step` bases: every
+    #         contig at least step + seedLength - 1 long shares an indexed seed with a contig
+    #         that contains it.
+    def nonRedundantContigs(self, contigs, seedLength=32):
+        firstCopy = {}
+        for index, contig in enumerate(contigs):
+            firstCopy.setdefault(contig, index)
+        distinct = sorted(firstCopy.values(), key=lambda index: -len(contigs[index]))
+        if not distinct:
+            return []
+        shortest = len(contigs[distinct[-1]])
+        seedLength = max(1, min(seedLength, shortest))
+        step = max(1, shortest - seedLength + 1)
+
+        seeds = defaultdict(list)
+        kept = []
+        for index in distinct:
+            contig = contigs[index]
+            contained = any(
+                contigs[other][position - offset : position - offset + len(contig)]
+                == contig
+                for offset in range(min(step, len(contig) - seedLength + 1))
+                for other, position in seeds.get(
+                    contig[offset : offset + seedLength], []
+                )
+                if position >= offset
+            )
+            if contained:
                 continue
+            kept.append(index)
+            for position in range(0, len(contig) - seedLength + 1, step):
+                seeds[contig[position : position + seedLength]].append((index, position))
+        return sorted(kept)
 
-            children = self.graph.get(currentNode, [])
-
-            for child in children:
-                """
-                - The uncommented code block below is not covering: loops (a path that starts and stops on the same node with n nodes in between), bubble (self repeating loop).
-                - To handle one loop, replace the existing if statement with the commented if statement below.
-                """
-                # if path.count(child) < 2: #handles one loop
-                if child not in path:  # collapses loop
-                    newPath = path + [
-                        child
-                    ]  # create a new copy of path inside the loop
-                    if self.checkIfLastNode(currentNode=child):
-                        yield newPath  # pause followSubPath execution, redirect control to followPath for consumption of yielded newPath
-                    else:
-                        stack.append((child, newPath))
-
-    # Input: start node and graph (edge list)
-    # Output: allPaths object that contains all possible paths through the graph
-    def followPath(self, startNode, visited=None):
-        if visited is None:  # handle first iteration
-            visited = deque([])
-        unfinishedPaths = deque([])
-        stack = deque([startNode])  # deque used to simulate a doubly linked list
-
-        """
-        This is a modified depth-first search (DFS). In this method, everytime a split is visited (one node having two or more outgoing edges), the current state of that path is added to unfinishedPaths. The followSubPath method consumes the unfinished paths by extending the modified DFS until all possible paths (excluding cases addressed above) are visited and completed.
-        """
-        while stack:
-            currentNode = stack.pop()
-            if type(currentNode) == list:  # handling case of second iteration on.
-                currentNode = currentNode[0]
-
-            if currentNode not in visited:  # see doc string comment for handling cases
-                visited.append(currentNode)
-                isLastNode = self.checkIfLastNode(currentNode=currentNode)
-                if isLastNode == True:
-                    yield visited
-                else:
-                    hasChildren, children = self.lookForChildren(
-                        currentNode=currentNode
-                    )
-                    if hasChildren == False:
-                        if self.graph[currentNode][0] not in visited:
-                            stack.extend(self.graph[currentNode])
-                    if hasChildren:
-                        unfinishedPaths.append((visited, children))
-
-        for path, children in unfinishedPaths:
-            originalPath = list(path)
-            for child in children:
-                for finishedPath in self.followSubPath(
-                    child, originalPath=originalPath
-                ):
-                    yield finishedPath
+    # Input: path of node ids
+    # Output: contig sequence of the path, mean coverage of the path (None without node coverage)
+    def pathContig(self, path):
+        graph = self.graph
+        path = np.fromiter(path, dtype=np.int64, count=len(path))
+        sequences = graph.sequences(path)
+        coverage = None
+        if graph.nodeCoverage is not None:
+            # coverage of the nodes weighted by the bases each adds to the contig
+            nodeBases = np.array(list(map(len, sequences)), dtype=np.float64)
+            if self.overlap is None:
+                nodeBases[1:] = 1
+            else:
+                nodeBases[1:] -= self.overlap
+            coverage = float(np.average(graph.nodeCoverage[path], weights=nodeBases))
+        # concatenate the nodes by taking the bases each node adds after the previous one and
+        # appending them to the first full node
+        contig = []
+        for node in sequences:
+            if len(contig) == 0:
+                contig.append(node)
+            elif self.overlap is None:
+                contig.append(node[-1])
+            else:
+                contig.append(node[self.overlap :])
+        return "".join(contig), coverage
 
-    # Input: graph (edge list)
-    # Output: contiguous sequences
-    def createContigs(self):
-        edgesCount, startNodes = self.findStartNodes()
-        incoming = sum(1 for counts in edgesCount.values() if counts[0] == 0)
-        outgoing = sum(1 for counts in edgesCount.values() if counts[1] == 0)
+    # Output: (path, contig, coverage) of every contig as its component is assembled. The paths
+    #         mode waits for all of its contigs, since redundant ones are removed across them.
+    def contigRecords(self):
+        records = ((path, *self.pathContig(path)) for path in self.assemblePaths())
+        if self.mode != "paths":
+            yield from records
+            return
+        # enumerated paths repeat each other; drop copies and contigs inside other contigs
+        records = list(records)
+        kept = self.nonRedundantContigs([contig for _, contig, _ in records])
+        logging.info(f"\tRedundant contigs removed: {len(records) - len(kept)}")
+        for index in kept:
+            yield records[index]
+
+    # Input: whether to keep the paths, contigs and coverage in memory (allPaths, contigs and
+    #        contigCoverage)
+    # Output: FASTA file of the contigs at least minContigLength long, written as they are
+    #         created
+    def writeContigs(self, keepContigs=False):
+        graph = self.graph
+        startNodes = np.flatnonzero(graph.inDegree == 0).tolist()
+        incoming = len(startNodes)
+        outgoing = int(np.count_nonzero(graph.outDegree == 0))
 
         # file creation added for logging purposes
         edgesCountFile = os.path.join(self.logsDataDir, "edgesCount.json")
         try:
             with open(edgesCountFile, "w") as file:
-                json.dump(edgesCount, file)
+                json.dump(
+                    {
+                        "inDegree": graph.inDegree.tolist(),
+                        "outDegree": graph.outDegree.tolist(),
+                    },
+                    file,
+                )
         except FileNotFoundError:
             print("File or directory not found")
         logging.info(f"\nCreate Contigs: ")
         logging.info(f"\tNumber of start nodes: {incoming}")
         logging.info(f"\tNumber of end nodes: {outgoing}")
+        logging.info(f"\tContig mode: {self.mode}")
 
-        # given the list of startNodes, explore all possible paths from each start node
-        contigs = []
-        for index, node in enumerate(startNodes):
-            for id, path in enumerate(self.followPath(node)):
-                self.allPaths.append(path)
-            # logging.info(f"There were {id+1} paths for node: {index+1}")
-
-        # for each of the paths visited, concatentate all nodes by taking the last base from the end of each node and appending it to the ongoing list of characters (initialized with the first full node)
-        for path in self.allPaths:
-            contig = []
-            contigStr = ""
-            for node in path:
-                if len(contig) == 0:
-                    contig.append(node)
-                else:
-                    contig.append(node[-1])
-            contigStr = "".join(contig)
-            contigs.append(contigStr)
-
-        contigsFile = os.path.join(self.outputDataDir, "contigs.txt")
-        with open(contigsFile, "w") as file:
-            for contig in contigs:
-                file.write(contig + "\n")
+        self.allPaths = []
+        self.contigs = []
+        self.contigCoverage = []
+        with ContigWriter(self.contigsFile, self.minContigLength) as writer:
+            for path, contig, coverage in self.contigRecords():
+                if writer.write(contig, coverage) and keepContigs:
+                    self.allPaths.append(path)
+                    self.contigs.append(contig)
+                    if coverage is not None:
+                        self.contigCoverage.append(coverage)
+        contigFile = writer.close()
 
+        stats = contigFile.stats
+        if self.minContigLength:
+            logging.info(
+                f"\tContigs shorter than {self.minContigLength} bases dropped: {stats['filtered']}"
+            )
         try:
-            avgLen = sum(len(contig) for contig in contigs) / len(contigs)
+            avgLen = stats["totalLength"] / stats["count"]
             logging.info(f"\tAverage contig length: {avgLen}")
-            logging.info(f"\tMinimum contig length: {len(min(contigs, key=len))}")
-            logging.info(f"\tMaximum contig length: {len(max(contigs, key=len))}")
-            logging.info(f"\tTotal number of contigs: {[len(contigs)]}")
+            logging.info(f"\tMinimum contig length: {stats['minLength']}")
+            logging.info(f"\tMaximum contig length: {stats['maxLength']}")
+            logging.info(f"\tTotal contig length: {stats['totalLength']}")
+            logging.info(f"\tN50: {stats['n50']}, L50: {stats['l50']}")
+            logging.info(f"\tTotal number of contigs: {[stats['count']]}")
         except ZeroDivisionError:
             print("Length of contigs is 0, cannot calculate avg length of contig")
-            print(f"len contigs: {len(contigs)}. startnodes: {startNodes}")
+            print(
+                f"len contigs: {stats['count']}. startnodes: {graph.sequences(startNodes)}"
+            )
+
+        return contigFile
 
-        return contigs
+    # Input: graph (edge list)
+    # Output: contiguous sequences (also written to the contigs file)
+    def createContigs(self):
+        self.writeContigs(keepContigs=True)
+        return self.contigs
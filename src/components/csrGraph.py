@@ -0,0 +1,297 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from components import kmerCodes
+from components.kmerIndex import paddingTo8
+from components.readStore import CODE_BASES
+
+# graph arrays placed in shared memory for worker processes
+SHARED_ARRAYS = [
+    "outIndices",
+    "edgeWeights",
+    "outDegree",
+    "outIndptr",
+    "inIndices",
+    "inEdges",
+    "inDegree",
+    "inIndptr",
+]
+
+
+class CsrGraph:
+    """
+    Directed graph over dense integer node ids. Out-edges of node v are
+    outIndices[outIndptr[v]:outIndptr[v + 1]] (edge ids in the same range index edgeWeights),
+    in-edges are inIndices[inIndptr[v]:inIndptr[v + 1]] and inEdges maps them back to edge ids.
+
+    Node sequences are either (k-1)-mer codes (nodeCodes, decoded on demand) or strings
+    (nodeSequences, e.g. unitigs). nodeCoverage holds the mean k-mer count of each node when known.
+    """
+
+    def __init__(
+        self,
+        numNodes,
+        sources,
+        targets,
+        edgeWeights=None,
+        nodeCodes=None,
+        nodeLength=None,
+        nodeSequences=None,
+        nodeCoverage=None,
+    ):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if edgeWeights is None:
+            edgeWeights = np.ones(len(sources), dtype=np.uint32)
+
+        # out-edges grouped by source (stable, so each node keeps its input edge order)
+        order = np.argsort(sources, kind="stable")
+        edgeSources = sources[order]
+        self.outIndices = targets[order].astype(np.uint32)
+        self.edgeWeights = np.asarray(edgeWeights)[order].astype(np.uint32)
+        self.outDegree = np.bincount(sources, minlength=numNodes).astype(np.uint32)
+        self.outIndptr = np.zeros(numNodes + 1, dtype=np.int64)
+        np.cumsum(self.outDegree, out=self.outIndptr[1:])
+
+        inOrder = np.argsort(self.outIndices, kind="stable")
+        self.inIndices = edgeSources[inOrder].astype(np.uint32)
+        self.inEdges = inOrder.astype(np.uint32)
+        self.inDegree = np.bincount(targets, minlength=numNodes).astype(np.uint32)
+        self.inIndptr = np.zeros(numNodes + 1, dtype=np.int64)
+        np.cumsum(self.inDegree, out=self.inIndptr[1:])
+
+        self.nodeCodes = nodeCodes
+        self.nodeLength = nodeLength
+        self.nodeSequences = nodeSequences
+        self.nodeCoverage = nodeCoverage
+
+    # Input: distinct k-mer codes, size of k, count of each k-mer
+    # Output: De Bruijn graph with the (k-1)-mers as nodes (ids in code order) and the k-mers as edges
+    @classmethod
+    def fromKmerCodes(cls, codes, k, counts=None):
+        codes = np.asarray(codes, dtype=np.uint64)
+        prefixes = codes >> np.uint64(2)
+        suffixes = codes & kmerCodes.kmerMask(k - 1)
+        nodeCodes = np.unique(np.concatenate([prefixes, suffixes]))
+        return cls(
+            len(nodeCodes),
+            np.searchsorted(nodeCodes, prefixes),
+            np.searchsorted(nodeCodes, suffixes),
+            edgeWeights=counts,
+            nodeCodes=nodeCodes,
+            nodeLength=k - 1,
+        )
+
+    # Input: edge dictionary (node -> list of nodes), edge counts keyed by (node, node)
+    # Output: graph with node ids in order of first appearance in the dictionary
+    @classmethod
+    def fromEdgeDict(cls, edges, edgeCounts=None):
+        nodeIds = {}
+        sources = []
+        targets = []
+        for node, children in edges.items():
+            source = nodeIds.setdefault(node, len(nodeIds))
+            for child in children:
+                sources.append(source)
+                targets.append(nodeIds.setdefault(child, len(nodeIds)))
+        edgeWeights = None
+        if edgeCounts is not None:
+            edgeWeights = [
+                edgeCounts.get((node, child), 1)
+                for node, children in edges.items()
+                for child in children
+            ]
+        return cls(
+            len(nodeIds),
+            sources,
+            targets,
+            edgeWeights=edgeWeights,
+            nodeSequences=list(nodeIds),
+        )
+
+    @property
+    def numNodes(self):
+        return len(self.outDegree)
+
+    @property
+    def numEdges(self):
+        return len(self.outIndices)
+
+    # Output: bytes held by the graph arrays
+    @property
+    def nbytes(self):
+        arrays = [
+            self.outIndices,
+            self.edgeWeights,
+            self.outDegree,
+            self.outIndptr,
+            self.inIndices,
+            self.inEdges,
+            self.inDegree,
+            self.inIndptr,
+        ]
+        if self.nodeCodes is not None:
+            arrays.append(self.nodeCodes)
+        return sum(array.nbytes for array in arrays)
+
+    # Output: mean weight of the edges entering or leaving each node (0 for isolated nodes)
+    def incidentCoverage(self):
+        numNodes = self.numNodes
+        weights = self.edgeWeights.astype(np.float64)
+        incidentWeights = np.bincount(
+            self.edgeSources(), weights=weights, minlength=numNodes
+        ) + np.bincount(self.outIndices, weights=weights, minlength=numNodes)
+        incidentCounts = self.inDegree.astype(np.int64) + self.outDegree
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(incidentCounts > 0, incidentWeights / incidentCounts, 0.0)
+
+    # Input: node id
+    # Output: ids of the nodes the node has an edge to
+    def outNeighbors(self, node):
+        return self.outIndices[self.outIndptr[node] : self.outIndptr[node + 1]]
+
+    # Input: node id
+    # Output: weights of the node's out-edges (same order as outNeighbors)
+    def outWeights(self, node):
+        return self.edgeWeights[self.outIndptr[node] : self.outIndptr[node + 1]]
+
+    # Input: node id
+    # Output: ids of the nodes that have an edge to the node
+    def inNeighbors(self, node):
+        return self.inIndices[self.inIndptr[node] : self.inIndptr[node + 1]]
+
+    # Input: node id
+    # Output: node sequence
+    def sequence(self, node):
+        if self.nodeSequences is not None:
+            return self.nodeSequences[node]
+        return kmerCodes.decodeKmers(self.nodeCodes[node : node + 1], self.nodeLength)[0]
+
+    # Input: node ids (all nodes by default)
+    # Output: list of node sequences
+    def sequences(self, nodes=None):
+        if nodes is None:
+            nodes = np.arange(self.numNodes)
+        if self.nodeSequences is not None:
+            return [self.nodeSequences[node] for node in np.asarray(nodes).tolist()]
+        return kmerCodes.decodeKmers(self.nodeCodes[nodes], self.nodeLength)
+
+    # Output: length of every node sequence
+    def nodeLengths(self):
+        if self.nodeSequences is not None:
+            return np.fromiter(
+                map(len, self.nodeSequences), dtype=np.int64, count=self.numNodes
+            )
+        return np.full(self.numNodes, self.nodeLength, dtype=np.int64)
+
+    # Input: node ids, number of bases each node shares with its predecessor on a path
+    # Output: the bases each node adds after its predecessor, concatenated
+    def extensions(self, nodes, overlap):
+        if self.nodeSequences is not None:
+            return "".join(
+                self.nodeSequences[node][overlap:] for node in nodes.tolist()
+            )
+        # (k-1)-mer nodes share k - 2 bases, so each adds its last base
+        return (
+            CODE_BASES[(self.nodeCodes[nodes] & np.uint64(3)).astype(np.uint8)]
+            .tobytes()
+            .decode("ascii")
+        )
+
+    # Output: source node of every edge (same order as outIndices)
+    def edgeSources(self):
+        return np.repeat(np.arange(self.numNodes), self.outDegree)
+
+    # Output: weakly connected component of every node, numbered in order of each
+    #         component's smallest node id
+    def weaklyConnectedComponents(self):
+        # union-find over the edges, all edges at once: every pass hooks the root of each
+        # endpoint onto the smaller root, then flattens the trees by pointer jumping
+        parent = np.arange(self.numNodes, dtype=np.int64)
+        sources = self.edgeSources()
+        targets = self.outIndices.astype(np.int64)
+        while True:
+            sourceRoots = parent[sources]
+            targetRoots = parent[targets]
+            smaller = np.minimum(sourceRoots, targetRoots)
+            previous = parent.copy()
+            np.minimum.at(parent, sourceRoots, smaller)
+            np.minimum.at(parent, targetRoots, smaller)
+            while True:
+                grandparent = parent[parent]
+                if np.array_equal(grandparent, parent):
+                    break
+                parent = grandparent
+            if np.array_equal(parent, previous):
+                break
+        return np.unique(parent, return_inverse=True)[1].astype(np.int64)
+
+    # Input: boolean mask of the nodes to keep
+    # Output: graph of the kept nodes and the edges between them (node ids renumbered in order)
+    def subgraph(self, keep):
+        newIds = np.cumsum(keep) - 1
+        sources = self.edgeSources()
+        targets = self.outIndices.astype(np.int64)
+        keptEdges = keep[sources] & keep[targets]
+        return CsrGraph(
+            int(np.count_nonzero(keep)),
+            newIds[sources[keptEdges]],
+            newIds[targets[keptEdges]],
+            edgeWeights=self.edgeWeights[keptEdges],
+            nodeCodes=None if self.nodeCodes is None else self.nodeCodes[keep],
+            nodeLength=self.nodeLength,
+            nodeSequences=None
+            if self.nodeSequences is None
+            else [sequence for sequence, kept in zip(self.nodeSequences, keep.tolist()) if kept],
+            nodeCoverage=None if self.nodeCoverage is None else self.nodeCoverage[keep],
+        )
+
+    # Input: other arrays to share with the graph (name -> array)
+    # Output: shared memory block holding the graph arrays (and node coverage), descriptor
+    #         used by fromSharedMemory to attach to it. The caller closes and unlinks the block.
+    def toSharedMemory(self, extraArrays=None):
+        arrays = {name: getattr(self, name) for name in SHARED_ARRAYS}
+        if self.nodeCoverage is not None:
+            arrays["nodeCoverage"] = np.asarray(self.nodeCoverage, dtype=np.float64)
+        arrays.update(extraArrays or {})
+
+        layout = []
+        size = 0
+        for name, array in arrays.items():
+            layout.append((name, array.dtype.str, size, len(array)))
+            size += array.nbytes + paddingTo8(array.nbytes)
+        sharedMemory = SharedMemory(create=True, size=max(size, 1))
+        for (name, dtype, offset, length), array in zip(layout, arrays.values()):
+            np.ndarray(length, dtype=dtype, buffer=sharedMemory.buf, offset=offset)[:] = array
+        return sharedMemory, {"name": sharedMemory.name, "arrays": layout}
+
+    # Input: descriptor from toSharedMemory
+    # Output: read-only graph over the shared arrays (node sequences are not shared), the
+    #         extra arrays shared with it
+    @classmethod
+    def fromSharedMemory(cls, descriptor):
+        sharedMemory = SharedMemory(name=descriptor["name"])
+        arrays = {}
+        for name, dtype, offset, length in descriptor["arrays"]:
+            array = np.ndarray(length, dtype=dtype, buffer=sharedMemory.buf, offset=offset)
+            array.flags.writeable = False
+            arrays[name] = array
+
+        graph = cls.__new__(cls)
+        for name in SHARED_ARRAYS:
+            setattr(graph, name, arrays.pop(name))
+        graph.nodeCoverage = arrays.pop("nodeCoverage", None)
+        graph.nodeCodes = None
+        graph.nodeLength = None
+        graph.nodeSequences = None
+        # keeps the block mapped for as long as the graph is used
+        graph.sharedMemory = sharedMemory
+        return graph, arrays
+
+    # Output: edge dictionary (node sequence -> list of node sequences), every node is a key
+    def toEdgeDict(self):
+        sequences = self.sequences()
+        return {
+            sequences[node]: [sequences[child] for child in self.outNeighbors(node).tolist()]
+            for node in range(self.numNodes)
+        }
@@ -1,11 +1,19 @@
+import numpy as np
 import pandas as pd
 from collections import defaultdict
+from components import kmerCodes
+from components.csrGraph import CsrGraph
+from components.kmerIndex import KmerIndex
+from components.readStore import gatherRanges
 
 
 class DeBruijnGraph:
     def __init__(self, kmerPool, k):
+        # kmerPool: KmerIndex, dictionary keyed by k-mer strings, or an array of distinct k-mer codes
         self.kmerPool = kmerPool
         self.k = k
+        # number of times each k-mer (edge) was seen, keyed by (prefix, suffix)
+        self.edgeCounts = {}
 
     # Input: individual kmer
     # Output: prefix and suffix of kmer
@@ -18,6 +26,26 @@ class DeBruijnGraph:
         suffix = kmer[-length:]
         return prefix, suffix
 
+    # Input: array of k-mer codes
+    # Output: prefix and suffix (k-1)-mer codes of each k-mer
+    def getPrefixSuffixCodes(self, codes):
+        codes = np.asarray(codes, dtype=np.uint64)
+        return codes >> np.uint64(2), codes & kmerCodes.kmerMask(self.k - 1)
+
+    # Input: array of distinct k-mer codes
+    # Output: prefix and suffix strings of each k-mer, each (k-1)-mer decoded once
+    def prefixSuffixFromCodes(self, codes):
+        prefixes, suffixes = self.getPrefixSuffixCodes(codes)
+        nodeCodes, nodeIndex = kmerCodes.firstSeenUnique(
+            np.concatenate([prefixes, suffixes])
+        )
+        nodes = kmerCodes.decodeKmers(nodeCodes, self.k - 1)
+        numKmers = len(prefixes)
+        return zip(
+            [nodes[index] for index in nodeIndex[:numKmers].tolist()],
+            [nodes[index] for index in nodeIndex[numKmers:].tolist()],
+        )
+
     # Input: kmerPool (contains all unique kmers found in the reads, the read id's where each kmer exists, and the position of each kmer in each read)
     # Output: nodes (a set containing all unique nodes), edges (a list containing tuples of source->target nodes)
     def constructGraph(self):
@@ -27,9 +55,22 @@ class DeBruijnGraph:
 
         lengthOfPool = len(kmerPool)
 
+        if isinstance(kmerPool, KmerIndex):
+            kmerCounts = kmerPool.counts.tolist()
+            prefixSuffixPairs = self.prefixSuffixFromCodes(kmerPool.codes)
+        elif isinstance(kmerPool, np.ndarray):
+            kmerCounts = [1] * lengthOfPool
+            prefixSuffixPairs = self.prefixSuffixFromCodes(kmerPool)
+        else:
+            kmerCounts = [
+                sum(len(positions) for positions in kmerPool[kmer].values())
+                for kmer in kmerPool
+            ]
+            prefixSuffixPairs = (self.getPrefixSuffix(kmer) for kmer in kmerPool)
+
         # get the prefix and suffix of each kmer and add to the nodes and edges data structures
-        for kmer in kmerPool:
-            prefix, suffix = self.getPrefixSuffix(kmer)
+        for (prefix, suffix), count in zip(prefixSuffixPairs, kmerCounts):
+            self.edgeCounts[(prefix, suffix)] = count
             if not edges.get(prefix):
                 edges[prefix] = [suffix]
             else:
@@ -38,3 +79,130 @@ class DeBruijnGraph:
             nodes.add(suffix)
 
         return nodes, edges
+
+    # Output: CSR graph with (k-1)-mer node ids, the k-mer counts as edge weights and node coverage
+    def constructCsrGraph(self):
+        kmerPool = self.kmerPool
+        if isinstance(kmerPool, KmerIndex):
+            graph = CsrGraph.fromKmerCodes(kmerPool.codes, self.k, kmerPool.counts)
+        elif isinstance(kmerPool, np.ndarray):
+            graph = CsrGraph.fromKmerCodes(kmerPool, self.k)
+        else:
+            nodes, edges = self.constructGraph()
+            graph = CsrGraph.fromEdgeDict(edges, self.edgeCounts)
+        # node coverage: mean count of the k-mers entering or leaving each (k-1)-mer
+        graph.nodeCoverage = graph.incidentCoverage()
+        return graph
+
+    # Input: node ids of the graph, whether each node is merged into its single predecessor,
+    #        predecessor of each node
+    # Output: first node of the chain of each node, position of each node in its chain
+    def rankChains(self, nodes, isInternal, predecessor):
+        # pointer jumping: every pass doubles the distance each node has looked back,
+        # so log2(n) passes reach the first node of every chain
+        pointer = np.where(isInternal, predecessor, nodes)
+        rank = isInternal.astype(np.int64)
+        for iteration in range(max(len(nodes), 1).bit_length() + 1):
+            rank = rank + rank[pointer]
+            pointer = pointer[pointer]
+        return pointer, rank
+
+    # Input: CSR graph of (k-1)-mers or unitigs (or edges dictionary from constructGraph)
+    # Output: compacted CSR graph. Every maximal non-branching chain of nodes is one unitig node
+    #         holding its sequence and mean k-mer coverage; unitig ids follow their first node's id.
+    def compactGraph(self, graph):
+        if not isinstance(graph, CsrGraph):
+            graph = CsrGraph.fromEdgeDict(graph, self.edgeCounts)
+        numNodes = graph.numNodes
+        nodes = np.arange(numNodes, dtype=np.int64)
+        inDegree = graph.inDegree.astype(np.int64)
+        outDegree = graph.outDegree.astype(np.int64)
+
+        # a node is merged into its predecessor when it has one incoming edge and the
+        # predecessor has one outgoing edge
+        hasOneParent = inDegree == 1
+        predecessor = nodes.copy()
+        predecessor[hasOneParent] = graph.inIndices[graph.inIndptr[:-1][hasOneParent]]
+        isInternal = hasOneParent & (outDegree[predecessor] == 1)
+
+        head, rank = self.rankChains(nodes, isInternal, predecessor)
+        # nodes whose chain never reaches a non-internal node lie on isolated cycles,
+        # which are broken at their smallest node id
+        onCycle = isInternal[head]
+        if onCycle.any():
+            for node in np.flatnonzero(onCycle).tolist():
+                if not isInternal[node] or not onCycle[node]:
+                    continue
+                cycle = [node]
+                child = int(graph.outIndices[graph.outIndptr[node]])
+                while child != node:
+                    cycle.append(child)
+                    child = int(graph.outIndices[graph.outIndptr[child]])
+                onCycle[cycle] = False
+                isInternal[min(cycle)] = False
+            head, rank = self.rankChains(nodes, isInternal, predecessor)
+
+        # unitig of each node, nodes ordered by unitig then position in the chain
+        heads = np.flatnonzero(~isInternal)
+        unitigOf = np.searchsorted(heads, head)
+        order = np.lexsort((rank, unitigOf))
+        chainLengths = np.bincount(unitigOf, minlength=len(heads))
+        tails = order[np.cumsum(chainLengths) - 1]
+
+        # unitig sequence: the first node, then the bases every following node adds
+        # (consecutive nodes share k - 2 bases)
+        overlap = self.k - 2
+        nodeLengths = graph.nodeLengths()
+        extensionNodes = order[rank[order] > 0]
+        extensions = graph.extensions(extensionNodes, overlap)
+        extensionLengths = np.bincount(
+            unitigOf[extensionNodes],
+            weights=nodeLengths[extensionNodes] - overlap,
+            minlength=len(heads),
+        ).astype(np.int64)
+        extensionStarts = np.zeros(len(heads) + 1, dtype=np.int64)
+        np.cumsum(extensionLengths, out=extensionStarts[1:])
+        unitigSequences = [
+            headSequence + extensions[start:stop]
+            for headSequence, start, stop in zip(
+                graph.sequences(heads),
+                extensionStarts[:-1].tolist(),
+                extensionStarts[1:].tolist(),
+            )
+        ]
+
+        # mean count of the k-mers in each unitig: the k-mers inside its nodes (a (k-1)-mer
+        # node has none) and the k-mers joining them. A unitig without any k-mer gets the
+        # mean count of the k-mers entering or leaving it.
+        nodeKmers = nodeLengths - (self.k - 1)
+        nodeCoverage = (
+            graph.nodeCoverage if graph.nodeCoverage is not None else np.zeros(numNodes)
+        )
+        internalNodes = np.flatnonzero(isInternal)
+        internalWeights = graph.edgeWeights[
+            graph.inEdges[graph.inIndptr[:-1][internalNodes]]
+        ].astype(np.float64)
+        kmerCounts = np.bincount(
+            unitigOf, weights=nodeKmers * nodeCoverage, minlength=len(heads)
+        ) + np.bincount(
+            unitigOf[internalNodes], weights=internalWeights, minlength=len(heads)
+        )
+        numKmers = np.bincount(unitigOf, weights=nodeKmers, minlength=len(heads)) + (
+            chainLengths - 1
+        )
+        coverage = np.where(
+            numKmers > 0,
+            kmerCounts / np.maximum(numKmers, 1),
+            graph.incidentCoverage()[heads],
+        )
+
+        # unitig edges are the out-edges of each unitig's last node
+        tailEdges = gatherRanges(graph.outIndptr[tails], graph.outIndptr[tails + 1])
+        return CsrGraph(
+            len(heads),
+            np.repeat(np.arange(len(heads)), outDegree[tails]),
+            unitigOf[graph.outIndices[tailEdges].astype(np.int64)],
+            edgeWeights=graph.edgeWeights[tailEdges],
+            nodeSequences=unitigSequences,
+            nodeCoverage=coverage,
+        )
@@ -0,0 +1,348 @@
+import mmap
+import struct
+import numpy as np
+from components import kmerCodes
+from components.kmerIndex import paddingTo8, writeIndexSection
+from components.readStore import AMBIGUOUS_CODE, gatherRanges
+
+# Text symbols: 0 separates the viruses (and stands for any non-ACGT base), 1-4 are ACGT.
+SEPARATOR = 0
+NUM_SYMBOLS = 5
+# rows of the BWT summarized by one occurrence checkpoint
+BLOCK_SIZE = 64
+# symbol that pads the last BWT block, never counted
+PADDING_SYMBOL = 255
+
+# Binary FM-index file, laid out like the k-mer index file: a fixed header, the index arrays
+# (little endian, each section padded to 8 bytes so it can be viewed in place from a memory
+# map) and the newline-joined virus ids.
+# Header: magic, format version, suffix array sample rate, text length, number of suffix
+#         array samples, number of viruses, size of the virus id section
+FM_MAGIC = b"VFMIDX\0\0"
+FM_VERSION = 1
+FM_HEADER = struct.Struct("<8sIIQQQQ")
+FM_SECTIONS = [
+    ("symbolStarts", "<i8", "numSymbolStarts"),
+    ("occ", "<u4", "numOcc"),
+    ("bwt", "u1", "numBwt"),
+    ("sampleRows", "<i8", "numSamples"),
+    ("samplePositions", "<i8", "numSamples"),
+    ("virusStarts", "<i8", "numVirusStarts"),
+]
+
+
+# Input: sequence
+# Output: text symbols of the sequence
+def sequenceToSymbols(sequence):
+    codes = kmerCodes.sequenceToCodes(sequence)
+    return np.where(codes == AMBIGUOUS_CODE, SEPARATOR, codes + 1).astype(np.uint8)
+
+
+# Input: text symbols
+# Output: suffix array of the text (the end of the text sorts before every symbol), built by
+#         prefix doubling: suffixes are ranked by their first 2h symbols from the ranks of
+#         their first h symbols until every rank is distinct
+def suffixArray(text):
+    length = len(text)
+    # dense ranks, so a pair of ranks fits in one key
+    rank = np.unique(np.asarray(text), return_inverse=True)[1].ravel().astype(np.int64)
+    step = 1
+    while length:
+        nextRank = np.full(length, -1, dtype=np.int64)
+        if step < length:
+            nextRank[: length - step] = rank[step:]
+        keys = rank * (length + 1) + nextRank + 1
+        distinct, rank = np.unique(keys, return_inverse=True)
+        rank = rank.ravel()
+        if len(distinct) == length or step >= length:
+            break
+        step *= 2
+    suffixes = np.empty(length, dtype=np.int64)
+    suffixes[rank] = np.arange(length, dtype=np.int64)
+    return suffixes
+
+
+# Input: text symbols, its suffix array
+# Output: BWT padded to whole blocks, occurrence checkpoint of every block (symbol counts in
+#         the BWT before the block)
+def bwtBlocks(text, suffixes):
+    numBlocks = len(text) // BLOCK_SIZE + 1
+    bwt = np.full(numBlocks * BLOCK_SIZE, PADDING_SYMBOL, dtype=np.uint8)
+    # the row of the whole text has no preceding symbol
+    bwt[: len(text)] = np.where(suffixes > 0, text[suffixes - 1], SEPARATOR)
+    occ = np.zeros((numBlocks, NUM_SYMBOLS), dtype=np.uint32)
+    blockCounts = np.stack(
+        [
+            (bwt.reshape(numBlocks, BLOCK_SIZE) == symbol).sum(axis=1)
+            for symbol in range(NUM_SYMBOLS)
+        ],
+        axis=1,
+    )
+    np.cumsum(blockCounts[:-1], axis=0, out=occ[1:])
+    return bwt, occ
+
+
+class FmIndex:
+    """
+    FM-index of a reference panel: the viruses are concatenated with separators, and the
+    Burrows-Wheeler transform of the text is kept with occurrence checkpoints every 64 rows,
+    together with every sampleRate-th suffix array entry. Unlike a k-mer index its size does
+    not depend on k (under 2 bytes per reference base), and a substring of any length is
+    found by backward search, so matches of any minimum length are searched without
+    rebuilding. Matches are reported as maximal exact matches (MEMs) with their virus and
+    position.
+    """
+
+    def __init__(
+        self,
+        virusIds,
+        virusStarts,
+        symbolStarts,
+        bwt,
+        occ,
+        sampleRows,
+        samplePositions,
+        sampleRate,
+    ):
+        self.virusIds = list(virusIds)
+        # first text position of every virus, and the end of the text
+        self.virusStarts = np.asarray(virusStarts, dtype=np.int64)
+        # first suffix array row of the suffixes starting with every symbol (and the end)
+        self.symbolStarts = np.asarray(symbolStarts, dtype=np.int64)
+        self.bwt = bwt
+        self.occ = occ.reshape(-1, NUM_SYMBOLS)
+        # suffix array rows (ascending) whose text position is kept
+        self.sampleRows = sampleRows
+        self.samplePositions = samplePositions
+        self.sampleRate = sampleRate
+
+    # Input: virus ids and sequences, suffix array sample rate
+    # Output: index of the sequences
+    @classmethod
+    def fromSequences(cls, virusIds, sequences, sampleRate=32):
+        parts = []
+        virusStarts = [0]
+        for sequence in sequences:
+            parts.append(sequenceToSymbols(sequence))
+            parts.append(np.zeros(1, dtype=np.uint8))
+            virusStarts.append(virusStarts[-1] + len(sequence) + 1)
+        text = np.concatenate([np.zeros(0, dtype=np.uint8)] + parts)
+        symbolStarts = np.zeros(NUM_SYMBOLS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(text, minlength=NUM_SYMBOLS), out=symbolStarts[1:])
+
+        suffixes = suffixArray(text)
+        bwt, occ = bwtBlocks(text, suffixes)
+        # positions after a separator are sampled too, so locating never steps over one
+        sampled = suffixes % sampleRate == 0
+        sampled[suffixes > 0] |= text[suffixes[suffixes > 0] - 1] == SEPARATOR
+        sampleRows = np.flatnonzero(sampled).astype(np.int64)
+        samplePositions = suffixes[sampleRows]
+        return cls(
+            virusIds,
+            virusStarts,
+            symbolStarts,
+            bwt,
+            occ,
+            sampleRows,
+            samplePositions,
+            sampleRate,
+        )
+
+    # Output: length of the indexed text (viruses and separators)
+    @property
+    def textLength(self):
+        return int(self.symbolStarts[-1])
+
+    # Output: bytes held by the index arrays
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes
+            for array in (
+                self.bwt,
+                self.occ,
+                self.sampleRows,
+                self.samplePositions,
+            )
+        )
+
+    # Input: file location
+    # Output: index written to the file, to be opened with open
+    def save(self, fileLocation):
+        idBytes = "\n".join(self.virusIds).encode("utf-8")
+        with open(fileLocation, "wb") as file:
+            file.write(
+                FM_HEADER.pack(
+                    FM_MAGIC,
+                    FM_VERSION,
+                    self.sampleRate,
+                    self.textLength,
+                    len(self.sampleRows),
+                    len(self.virusIds),
+                    len(idBytes),
+                )
+            )
+            for name, dtype, sizeKey in FM_SECTIONS:
+                writeIndexSection(file, getattr(self, name), dtype)
+            file.write(idBytes)
+
+    # Input: file location of an index written by save
+    # Output: FmIndex whose arrays are views of a read-only memory map of the file (no copy)
+    @classmethod
+    def open(cls, fileLocation):
+        with open(fileLocation, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) < FM_HEADER.size:
+            raise ValueError(f"{fileLocation} is not an FM-index file")
+        (
+            magic,
+            version,
+            sampleRate,
+            textLength,
+            numSamples,
+            numViruses,
+            idBytesLength,
+        ) = FM_HEADER.unpack_from(buffer)
+        if magic != FM_MAGIC:
+            raise ValueError(f"{fileLocation} is not an FM-index file")
+        if version != FM_VERSION:
+            raise ValueError(f"{fileLocation} has unsupported FM-index version {version}")
+
+        numBlocks = textLength // BLOCK_SIZE + 1
+        sizes = {
+            "numSymbolStarts": NUM_SYMBOLS + 1,
+            "numOcc": numBlocks * NUM_SYMBOLS,
+            "numBwt": numBlocks * BLOCK_SIZE,
+            "numSamples": numSamples,
+            "numVirusStarts": numViruses + 1,
+        }
+        arrays = {}
+        offset = FM_HEADER.size
+        for name, dtype, sizeKey in FM_SECTIONS:
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=sizes[sizeKey], offset=offset
+            )
+            offset += arrays[name].nbytes + paddingTo8(arrays[name].nbytes)
+        if offset + idBytesLength != len(buffer):
+            raise ValueError(f"{fileLocation} is a truncated FM-index file")
+        idText = bytes(buffer[offset : offset + idBytesLength]).decode("utf-8")
+
+        index = cls(
+            virusIds=idText.split("\n") if numViruses else [],
+            sampleRate=sampleRate,
+            **arrays,
+        )
+        index.buffer = buffer
+        return index
+
+    # Input: symbols, rows
+    # Output: occurrences of each symbol in the BWT before each row
+    def rankSymbols(self, symbols, rows):
+        blocks = rows // BLOCK_SIZE
+        blockSymbols = self.bwt.reshape(-1, BLOCK_SIZE)[blocks]
+        before = np.arange(BLOCK_SIZE) < (rows % BLOCK_SIZE)[:, None]
+        inBlock = ((blockSymbols == symbols[:, None]) & before).sum(axis=1)
+        return self.occ[blocks, symbols].astype(np.int64) + inBlock
+
+    # Input: suffix array intervals [lows, highs) of patterns, symbols
+    # Output: intervals of the patterns with the symbols put in front (empty for the separator)
+    def extend(self, lows, highs, symbols):
+        symbols = np.asarray(symbols, dtype=np.int64)
+        starts = self.symbolStarts[symbols]
+        newLows = starts + self.rankSymbols(symbols, lows)
+        newHighs = starts + self.rankSymbols(symbols, highs)
+        separator = symbols == SEPARATOR
+        newHighs[separator] = newLows[separator]
+        return newLows, newHighs
+
+    # Input: pattern sequence
+    # Output: suffix array interval [low, high) of the pattern's occurrences
+    def findInterval(self, pattern):
+        low, high = np.zeros(1, dtype=np.int64), np.full(1, self.textLength, dtype=np.int64)
+        for symbol in sequenceToSymbols(pattern)[::-1].tolist():
+            low, high = self.extend(low, high, np.full(1, symbol))
+            if high[0] <= low[0]:
+                break
+        return int(low[0]), max(int(low[0]), int(high[0]))
+
+    # Input: suffix array rows
+    # Output: text positions of the rows, by LF-mapping every row back to a sampled one
+    def locate(self, rows):
+        rows = np.array(rows, dtype=np.int64)
+        positions = np.zeros(len(rows), dtype=np.int64)
+        steps = np.zeros(len(rows), dtype=np.int64)
+        pending = np.arange(len(rows))
+        while len(pending):
+            current = rows[pending]
+            sample = np.searchsorted(self.sampleRows, current)
+            found = sample < len(self.sampleRows)
+            found[found] = self.sampleRows[sample[found]] == current[found]
+            positions[pending[found]] = (
+                self.samplePositions[sample[found]] + steps[pending[found]]
+            )
+            pending = pending[~found]
+            current = current[~found]
+            symbols = self.bwt[current].astype(np.int64)
+            rows[pending] = self.symbolStarts[symbols] + self.rankSymbols(symbols, current)
+            steps[pending] += 1
+        return positions
+
+    # Input: text positions
+    # Output: virus of every position and the position in the virus
+    def virusPositions(self, positions):
+        virus = np.searchsorted(self.virusStarts, positions, "right") - 1
+        return virus, positions - self.virusStarts[virus]
+
+    # Input: query symbols, seed length
+    # Output: suffix array interval [low, high) of every seed of the query (the seedLength
+    #         bases from each query position), all seeds searched backwards side by side
+    def seedIntervals(self, query, seedLength):
+        query = np.asarray(query, dtype=np.int64)
+        numSeeds = max(len(query) - seedLength + 1, 0)
+        lows = np.zeros(numSeeds, dtype=np.int64)
+        highs = np.full(numSeeds, self.textLength, dtype=np.int64)
+        active = np.arange(numSeeds)
+        for offset in range(seedLength - 1, -1, -1):
+            lows[active], highs[active] = self.extend(
+                lows[active], highs[active], query[active + offset]
+            )
+            active = active[highs[active] > lows[active]]
+        highs = np.maximum(highs, lows)
+        return lows, highs
+
+    # Input: query symbols (queries joined by separators), shortest match to report, most
+    #        occurrences of one seed located
+    # Output: query start, length, virus and position in the virus of every maximal exact
+    #         match of at least minLength bases (ordered by query start, virus and position),
+    #         and the number of seeds with more than maxOccurrences occurrences. A match of at least minLength bases
+    #         is a run of seeds of minLength bases found at consecutive query and text
+    #         positions; the run cannot be extended at either end, so it is a MEM.
+    def maximalMatches(self, query, minLength, maxOccurrences=500):
+        lows, highs = self.seedIntervals(query, minLength)
+        truncated = int(np.count_nonzero(highs - lows > maxOccurrences))
+        highs = np.minimum(highs, lows + maxOccurrences)
+        seedStarts = np.repeat(np.arange(len(lows)), highs - lows)
+        positions = self.locate(gatherRanges(lows, highs))
+
+        # runs of seeds on one diagonal (text position - query position) of the match matrix
+        diagonals = positions - seedStarts
+        order = np.lexsort((seedStarts, diagonals))
+        seedStarts, diagonals = seedStarts[order], diagonals[order]
+        runBreaks = np.ones(len(seedStarts), dtype=bool)
+        runBreaks[1:] = (diagonals[1:] != diagonals[:-1]) | (
+            seedStarts[1:] != seedStarts[:-1] + 1
+        )
+        runEnds = np.ones(len(seedStarts), dtype=bool)
+        runEnds[:-1] = runBreaks[1:]
+        runStarts = np.flatnonzero(runBreaks)
+        queryStarts = seedStarts[runStarts]
+        lengths = seedStarts[runEnds] - queryStarts + minLength
+        virus, virusPositions = self.virusPositions(diagonals[runStarts] + queryStarts)
+        order = np.lexsort((virusPositions, virus, queryStarts))
+        return (
+            queryStarts[order],
+            lengths[order],
+            virus[order],
+            virusPositions[order],
+            truncated,
+        )
@@ -0,0 +1,240 @@
+import logging
+import numpy as np
+from components.readStore import gatherRanges
+
+
+# Input: two sequences
+# Output: edit distance between them (substitutions, insertions and deletions)
+def editDistance(first, second):
+    previous = list(range(len(second) + 1))
+    for i, firstBase in enumerate(first, 1):
+        current = [i]
+        for j, secondBase in enumerate(second, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (firstBase != secondBase),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+class GraphSimplifier:
+    """
+    Removes the branches sequencing errors add to a compacted De Bruijn graph. Tip clipping
+    drops short dead-end unitigs hanging off a branching node; bubble popping drops the weaker
+    of two short parallel paths whose sequences differ by a few bases. The graph is compacted
+    again after every pass, and passes repeat until nothing more is removed.
+    """
+
+    def __init__(
+        self,
+        deBruijnGraph,
+        maxTipLength=None,
+        maxBubbleLength=None,
+        maxBubbleDifference=3,
+        bubbleCoverageRatio=0.5,
+        maxRounds=10,
+    ):
+        k = deBruijnGraph.k
+        # used to compact the graph after each pass
+        self.deBruijnGraph = deBruijnGraph
+        # tips shorter than this many bases are clipped (default 2k)
+        self.maxTipLength = 2 * k if maxTipLength is None else maxTipLength
+        # bubble branches at most this many bases long are compared (default 3k,
+        # a single base error makes a branch of 2k - 3 bases)
+        self.maxBubbleLength = 3 * k if maxBubbleLength is None else maxBubbleLength
+        # branches differing by at most this many bases are the same sequence
+        self.maxBubbleDifference = maxBubbleDifference
+        # a branch is popped when its coverage is at most this fraction of the strongest branch
+        self.bubbleCoverageRatio = bubbleCoverageRatio
+        self.maxRounds = maxRounds
+        # paths explored from a branching node when looking for the other side of a bubble
+        self.maxBubblePaths = 100
+        # nodes and edges removed by each pass
+        self.report = []
+
+    # Input: compacted CSR graph
+    # Output: coverage of each node (0 when unknown)
+    def coverage(self, graph):
+        if graph.nodeCoverage is None:
+            return np.zeros(graph.numNodes)
+        return np.asarray(graph.nodeCoverage, dtype=np.float64)
+
+    # Input: compacted CSR graph, junction node of each branch, branch nodes
+    # Output: whether each branch is the strongest at its junction (highest coverage,
+    #         then longest, then smallest id)
+    def strongestBranches(self, graph, junctions, branches):
+        order = np.lexsort(
+            (
+                -branches,
+                graph.nodeLengths()[branches],
+                self.coverage(graph)[branches],
+                junctions,
+            )
+        )
+        isLast = np.ones(len(order), dtype=bool)
+        isLast[:-1] = junctions[order][1:] != junctions[order][:-1]
+        strongest = np.zeros(len(branches), dtype=bool)
+        strongest[order[isLast]] = True
+        return strongest
+
+    # Input: compacted CSR graph
+    # Output: boolean mask of the tips: short unitigs that start (or end) the graph and join a
+    #         node with another branch on the same side. The strongest branch of every
+    #         junction is kept, so a junction never loses all of its branches.
+    def findTips(self, graph):
+        inDegree = graph.inDegree.astype(np.int64)
+        outDegree = graph.outDegree.astype(np.int64)
+        isShort = graph.nodeLengths() < self.maxTipLength
+        isTip = np.zeros(graph.numNodes, dtype=bool)
+
+        # a tip with no in-edges joins the in-edges of its child, a tip with no out-edges
+        # joins the out-edges of its parent
+        sides = [
+            (inDegree, outDegree, graph.outIndices, graph.outIndptr, graph.inIndices, graph.inIndptr),
+            (outDegree, inDegree, graph.inIndices, graph.inIndptr, graph.outIndices, graph.outIndptr),
+        ]  # fmt: skip
+        for degree, otherDegree, neighbors, neighborIndptr, branches, branchIndptr in sides:
+            candidates = np.flatnonzero(isShort & (degree == 0) & (otherDegree == 1))
+            junctions = neighbors[neighborIndptr[candidates]].astype(np.int64)
+            candidates = candidates[degree[junctions] > 1]
+            if not len(candidates):
+                continue
+            junctions = np.unique(neighbors[neighborIndptr[candidates]].astype(np.int64))
+            branchNodes = branches[
+                gatherRanges(branchIndptr[junctions], branchIndptr[junctions + 1])
+            ].astype(np.int64)
+            branchJunctions = np.repeat(junctions, degree[junctions])
+            sideTips = np.zeros(graph.numNodes, dtype=bool)
+            sideTips[candidates] = True
+            strongest = self.strongestBranches(graph, branchJunctions, branchNodes)
+            sideTips[branchNodes[strongest]] = False
+            isTip |= sideTips
+        return isTip
+
+    # Input: compacted CSR graph, branching node, branch to leave out, merging node
+    # Output: highest-coverage path of nodes from the branching node to the merging node
+    #         (both excluded) that avoids the branch and is at most maxBubbleLength +
+    #         maxBubbleDifference bases long, or None. Coverage of a path is its weakest node.
+    def alternativePath(self, graph, source, branch, target, nodeLengths, coverage):
+        overlap = self.deBruijnGraph.k - 2
+        maxLength = self.maxBubbleLength + self.maxBubbleDifference
+        bestPath, bestCoverage = None, -1.0
+        stack = [
+            ([child], int(nodeLengths[child]))
+            for child in graph.outNeighbors(source).tolist()
+            if child not in (branch, target)
+        ]
+        explored = 0
+        while stack and explored < self.maxBubblePaths:
+            path, length = stack.pop()
+            explored += 1
+            if length > maxLength:
+                continue
+            for child in graph.outNeighbors(path[-1]).tolist():
+                if child == target:
+                    pathCoverage = coverage[path].min()
+                    if pathCoverage > bestCoverage:
+                        bestPath, bestCoverage = path, pathCoverage
+                elif child not in path and child not in (source, branch):
+                    stack.append(
+                        (path + [child], length + int(nodeLengths[child]) - overlap)
+                    )
+        return bestPath
+
+    # Input: compacted CSR graph
+    # Output: boolean mask of the bubble branches to pop. A branch is a short unitig with a
+    #         single parent that branches and a single child that merges; it is popped when
+    #         another path joins the same two nodes, differs from it by at most
+    #         maxBubbleDifference edits and has at least 1 / bubbleCoverageRatio times its
+    #         coverage.
+    def findBubbles(self, graph):
+        inDegree = graph.inDegree.astype(np.int64)
+        outDegree = graph.outDegree.astype(np.int64)
+        nodeLengths = graph.nodeLengths()
+        coverage = self.coverage(graph)
+        overlap = self.deBruijnGraph.k - 2
+        isBubble = np.zeros(graph.numNodes, dtype=bool)
+
+        candidates = np.flatnonzero(
+            (inDegree == 1) & (outDegree == 1) & (nodeLengths <= self.maxBubbleLength)
+        )
+        parents = graph.inIndices[graph.inIndptr[candidates]].astype(np.int64)
+        children = graph.outIndices[graph.outIndptr[candidates]].astype(np.int64)
+        parallel = (outDegree[parents] > 1) & (inDegree[children] > 1)
+
+        # weakest branches first, so a bubble keeps its strongest path
+        candidates, parents, children = (
+            candidates[parallel],
+            parents[parallel],
+            children[parallel],
+        )
+        order = np.argsort(coverage[candidates], kind="stable")
+        for branch, parent, child in zip(
+            candidates[order].tolist(),
+            parents[order].tolist(),
+            children[order].tolist(),
+        ):
+            path = self.alternativePath(
+                graph, parent, branch, child, nodeLengths, coverage
+            )
+            if path is None or isBubble[path].any():
+                continue
+            if coverage[branch] > self.bubbleCoverageRatio * coverage[path].min():
+                continue
+            pathSequence = graph.sequence(path[0]) + graph.extensions(
+                np.array(path[1:], dtype=np.int64), overlap
+            )
+            branchSequence = graph.sequence(branch)
+            if abs(len(pathSequence) - len(branchSequence)) > self.maxBubbleDifference:
+                continue
+            if editDistance(branchSequence, pathSequence) <= self.maxBubbleDifference:
+                isBubble[branch] = True
+        return isBubble
+
+    # Input: compacted CSR graph, simplification round, name of the pass, boolean mask of the
+    #        nodes to remove
+    # Output: graph without the nodes, compacted again; the pass is added to the report
+    def removeNodes(self, graph, roundNumber, passName, remove):
+        simplified = self.deBruijnGraph.compactGraph(graph.subgraph(~remove))
+        removedEdges = int(
+            np.count_nonzero(remove[graph.edgeSources()] | remove[graph.outIndices])
+        )
+        self.report.append(
+            {
+                "round": roundNumber,
+                "pass": passName,
+                "nodesRemoved": int(np.count_nonzero(remove)),
+                "edgesRemoved": removedEdges,
+                "nodesAfter": simplified.numNodes,
+                "edgesAfter": simplified.numEdges,
+            }
+        )
+        logging.info(
+            f"\tRound {roundNumber}, {passName}: removed {self.report[-1]['nodesRemoved']} nodes and {removedEdges} edges, "
+            f"{simplified.numNodes} nodes and {simplified.numEdges} edges after compaction"
+        )
+        return simplified
+
+    # Input: compacted CSR graph
+    # Output: simplified compacted CSR graph (tips clipped, bubbles popped)
+    def simplify(self, graph):
+        logging.info(f"\nGraph Simplification: ")
+        logging.info(f"\tBefore: {graph.numNodes} nodes, {graph.numEdges} edges")
+        for iteration in range(self.maxRounds):
+            changed = False
+            for passName, findNodes in [
+                ("Tip clipping", self.findTips),
+                ("Bubble popping", self.findBubbles),
+            ]:
+                remove = findNodes(graph)
+                if remove.any():
+                    graph = self.removeNodes(graph, iteration + 1, passName, remove)
+                    changed = True
+            if not changed:
+                break
+        logging.info(f"\tAfter: {graph.numNodes} nodes, {graph.numEdges} edges")
+        return graph
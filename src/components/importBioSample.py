@@ -1,15 +1,17 @@
 import pandas as pd
 import os
+import gzip
 
 
 class ImportBioSample:
-    def __init__(self, biosampleFile):
+    def __init__(self, biosampleFile, batchSize=100000):
         self.biosampleFile = biosampleFile
+        self.batchSize = batchSize
         self.biosample = {}
 
-    # Input: biosample file
-    # Output: biosample in dictionary
-    def importBioSample(self):
+    # Input: biosample file name (or path to an existing .fastq/.fastq.gz file)
+    # Output: location of the biosample file
+    def getBiosampleFileLocation(self):
         # file path management
         scriptDir = os.path.dirname(os.path.dirname(__file__))
         dataDir = "data"
@@ -17,10 +19,13 @@ class ImportBioSample:
         self.logsDataDir = os.path.join(dataDir, "logs")
         self.outputDataDir = os.path.join(dataDir, "output_data")
         biosample_dataDir = os.path.join(dataDir, "biosample_data")
-        biosample = self.biosample
         biosampleFile = self.biosampleFile
         biosampleDataDir = ""
 
+        # full (non-subset) samples can be passed directly as a path
+        if os.path.isfile(biosampleFile):
+            return biosampleFile
+
         # check for different metagenomic sample file paths
         if "biofilm" in biosampleFile:
             biosampleDataDir = os.path.join(biosample_dataDir, "biofilm/small_subsets")
@@ -37,23 +42,52 @@ class ImportBioSample:
 
         # used in unit tests
         if biosampleDataDir == "":
-            biosampleFileLocation = "test_data/testbiosample.fastq"
+            biosampleFileLocation = os.path.join("test_data", biosampleFile)
         else:
             biosampleFileLocation = os.path.join(biosampleDataDir, biosampleFile)
 
-        # write sample dict to file
-        with open(biosampleFileLocation, "r") as biosampleFile:
+        return biosampleFileLocation
+
+    # Input: location of a .fastq or .fastq.gz file
+    # Output: text mode file handle
+    def openBiosampleFile(self, biosampleFileLocation):
+        if biosampleFileLocation.endswith(".gz"):
+            return gzip.open(biosampleFileLocation, "rt")
+        return open(biosampleFileLocation, "r")
+
+    # Input: biosample file
+    # Output: generator of biosample batches, each a dictionary of at most batchSize reads
+    def streamBioSample(self, batchSize=None):
+        if batchSize is None:
+            batchSize = self.batchSize
+        biosampleFileLocation = self.getBiosampleFileLocation()
+
+        batch = {}
+        with self.openBiosampleFile(biosampleFileLocation) as biosampleFile:
             while True:
                 idline = biosampleFile.readline().split(" ")
                 if not idline[0]:
                     break
-                id = idline[0]
+                id = idline[0].rstrip("\n")
                 seq = biosampleFile.readline().strip()
                 plus = biosampleFile.readline().strip()
                 quality = biosampleFile.readline().strip()
 
-                biosample[id] = {"sequence": seq, "quality": quality}
+                batch[id] = {"sequence": seq, "quality": quality}
+                if len(batch) >= batchSize:
+                    yield batch
+                    batch = {}
+
+        if batch:
+            yield batch
+
+    # Input: biosample file
+    # Output: biosample in dictionary
+    def importBioSample(self):
+        biosample = self.biosample
+        biosampleFileLocation = self.getBiosampleFileLocation()
 
-        biosampleList = [{"id": id, **data} for id, data in biosample.items()]
+        for batch in self.streamBioSample():
+            biosample.update(batch)
 
         return biosample, biosampleFileLocation
@@ -0,0 +1,150 @@
+import numpy as np
+from components.readStore import AMBIGUOUS_CODE, BASE_CODES, CODE_BASES
+
+# k-mers are encoded 2 bits per base (A=0, C=1, G=2, T=3), first base in the high bits,
+# so a k-mer fits in one uint64 for k <= 32
+MAX_K = 32
+
+# number of differing bases for every byte of an XOR of two codes (used for Hamming distances)
+BASE_DIFFERENCES = np.array(
+    [sum(1 for shift in range(0, 8, 2) if (byte >> shift) & 3) for byte in range(256)],
+    dtype=np.uint8,
+)
+
+
+# Input: size of k
+# Output: mask covering the 2k low bits of a code
+def kmerMask(k):
+    return np.uint64((1 << (2 * k)) - 1)
+
+
+# Input: size of k
+# Output: ValueError if k cannot be encoded in a uint64
+def checkK(k):
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"K must be between 1 and {MAX_K} for 2-bit k-mer codes")
+
+
+# Input: sequence string
+# Output: base codes (uint8), AMBIGUOUS_CODE for non-ACGT bases
+def sequenceToCodes(sequence):
+    return BASE_CODES[np.frombuffer(sequence.encode("ascii"), np.uint8)]
+
+
+# Input: k-mer string
+# Output: k-mer code
+def encodeKmer(kmer):
+    code = 0
+    for base in sequenceToCodes(kmer).tolist():
+        if base == AMBIGUOUS_CODE:
+            raise ValueError(f"K-mer {kmer} contains a non-ACGT base")
+        code = (code << 2) | base
+    return code
+
+
+# Input: k-mer codes, size of k
+# Output: list of k-mer strings
+def decodeKmers(codes, k):
+    codes = np.asarray(codes, dtype=np.uint64)
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    bases = CODE_BASES[((codes[:, None] >> shifts) & np.uint64(3)).astype(np.uint8)]
+    return bases.view(f"S{k}").ravel().astype(str).tolist() if len(codes) else []
+
+
+# Input: base codes, size of k
+# Output: code of the window starting at every position (len(codes) - k + 1 values)
+def windowCodes(codes, k):
+    # windows are built by doubling: window(2b)[i] = window(b)[i] << 2b | window(b)[i + b],
+    # and the binary digits of k are combined the same way, so only log2(k) passes are needed
+    length = len(codes)
+    block = codes.astype(np.uint64)
+    blockLength = 1
+    result = None
+    resultLength = 0
+    while blockLength <= k:
+        if k & blockLength:
+            if result is None:
+                result, resultLength = block, blockLength
+            else:
+                count = length - resultLength - blockLength + 1
+                result = (result[:count] << np.uint64(2 * blockLength)) | block[
+                    resultLength : resultLength + count
+                ]
+                resultLength += blockLength
+        if 2 * blockLength <= k:
+            block = (block[:-blockLength] << np.uint64(2 * blockLength)) | block[
+                blockLength:
+            ]
+        blockLength *= 2
+    return result[: length - k + 1]
+
+
+# Input: unpacked base codes, start of each read in the codes, read lengths, size of k
+# Output: k-mer codes (uint64), read index and position in the read of every k-mer.
+#         K-mers overlapping an ambiguous base are skipped.
+def kmerCodes(codes, readStarts, lengths, k):
+    checkK(k)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    counts = np.maximum(lengths - k + 1, 0)
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return np.zeros(0, dtype=np.uint64), empty, empty
+
+    readIndex = np.repeat(np.arange(len(lengths), dtype=np.int64), counts)
+    countStarts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=countStarts[1:])
+    positions = np.arange(total, dtype=np.int64) - countStarts[readIndex]
+    windowStarts = np.asarray(readStarts, dtype=np.int64)[readIndex] + positions
+
+    ambiguous = codes == AMBIGUOUS_CODE
+    ambiguousBefore = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(ambiguous, out=ambiguousBefore[1:])
+    valid = ambiguousBefore[windowStarts + k] == ambiguousBefore[windowStarts]
+
+    windows = windowCodes(np.where(ambiguous, 0, codes), k)
+    return windows[windowStarts[valid]], readIndex[valid], positions[valid]
+
+
+# Input: ReadStore, size of k, number of reads per chunk
+# Output: generator of (k-mer codes, read index, positions) for each chunk of reads
+def readStoreKmerCodes(readStore, k, chunkSize=100000):
+    for start in range(0, len(readStore), chunkSize):
+        stop = min(start + chunkSize, len(readStore))
+        codes, readStarts, lengths = readStore.unpack(start, stop)
+        kmers, readIndex, positions = kmerCodes(codes, readStarts, lengths, k)
+        yield kmers, readIndex + start, positions
+
+
+# Input: sequence string, size of k
+# Output: k-mer codes and their positions in the sequence
+def sequenceKmerCodes(sequence, k):
+    codes = sequenceToCodes(sequence)
+    kmers, readIndex, positions = kmerCodes(codes, [0], [len(codes)], k)
+    return kmers, positions
+
+
+# Input: k-mer codes
+# Output: distinct codes in order of first appearance, index of each occurrence in the distinct codes
+def firstSeenUnique(codes):
+    unique, firstIndex, inverse = np.unique(
+        codes, return_index=True, return_inverse=True
+    )
+    order = np.argsort(firstIndex, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return unique[order], rank[inverse.ravel()]
+
+
+# Input: two arrays of k-mer codes (broadcastable)
+# Output: number of differing bases between each pair of codes
+def hammingDistances(codesA, codesB):
+    difference = np.bitwise_xor(
+        np.asarray(codesA, dtype=np.uint64), np.asarray(codesB, dtype=np.uint64)
+    )
+    differenceBytes = np.ascontiguousarray(difference).view(np.uint8)
+    return (
+        BASE_DIFFERENCES[differenceBytes]
+        .reshape(difference.shape + (8,))
+        .sum(axis=-1, dtype=np.int64)
+    )
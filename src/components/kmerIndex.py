@@ -0,0 +1,283 @@
+import sys
+import mmap
+import struct
+import numpy as np
+from collections import defaultdict
+from components import kmerCodes
+from components.readStore import gatherRanges
+
+# Binary index file: a fixed header followed by the index arrays (little endian, each
+# section padded to 8 bytes so it can be viewed in place from a memory map) and the
+# newline-joined read ids.
+# Header: magic, format version, k, k-mer encoding, number of distinct k-mers,
+#         number of occurrences, number of reads, size of the read id section
+INDEX_MAGIC = b"VKMERIDX"
+INDEX_VERSION = 1
+ENCODING_2BIT = 0
+INDEX_HEADER = struct.Struct("<8sIIIxxxxQQQQ")
+INDEX_SECTIONS = [
+    ("codes", "<u8", "numCodes"),
+    ("offsets", "<i8", "numOffsets"),
+    ("counts", "<u4", "numCodes"),
+    ("readIndex", "<u4", "numOccurrences"),
+    ("positions", "<u4", "numOccurrences"),
+]
+
+
+# Input: section size in bytes
+# Output: number of padding bytes up to the next 8 byte boundary
+def paddingTo8(size):
+    return -size % 8
+
+
+# Input: list of read ids
+# Output: read id section of an index file
+def encodeReadIds(readIds):
+    return "\n".join(readIds).encode("utf-8")
+
+
+# Input: open index file, size of k, number of distinct k-mers, occurrences and reads,
+#        size of the read id section
+# Output: header written to the file
+def writeIndexHeader(file, k, numCodes, numOccurrences, numReads, idBytesLength):
+    file.write(
+        INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            INDEX_VERSION,
+            k,
+            ENCODING_2BIT,
+            numCodes,
+            numOccurrences,
+            numReads,
+            idBytesLength,
+        )
+    )
+
+
+# Input: open index file, array, section dtype
+# Output: array written to the file, padded to 8 bytes
+def writeIndexSection(file, array, dtype):
+    array = np.ascontiguousarray(array, dtype=dtype)
+    file.write(array.tobytes())
+    file.write(bytes(paddingTo8(array.nbytes)))
+
+
+class KmerIndex:
+    """
+    K-mer occurrence index in CSR form. codes holds the distinct k-mer codes in sorted
+    order; the occurrences of codes[i] are readIndex/positions[offsets[i]:offsets[i + 1]]
+    (in read order), and counts[i] is their number.
+
+    An index written with save can be opened with open: the arrays are then views of a
+    read-only memory map, and the read ids are only decoded when they are first used.
+    """
+
+    def __init__(self, k, codes, counts, offsets, readIndex, positions, readIds):
+        self.k = k
+        self.codes = codes
+        self.counts = counts
+        self.offsets = offsets
+        self.readIndex = readIndex
+        self.positions = positions
+        # list of read ids, or the encoded id section of a mapped index file
+        self._readIds = readIds
+        self.buffer = None
+
+    # Output: read id of every read index
+    @property
+    def readIds(self):
+        if not isinstance(self._readIds, list):
+            idBytes = bytes(self._readIds).decode("utf-8")
+            self._readIds = (
+                [sys.intern(id) for id in idBytes.split("\n")] if idBytes else []
+            )
+        return self._readIds
+
+    # Input: size of k, k-mer code/read index/position of every occurrence (in read order), read ids
+    # Output: KmerIndex
+    @classmethod
+    def fromOccurrences(cls, k, codes, readIndex, positions, readIds):
+        codes = np.asarray(codes, dtype=np.uint64)
+        # a stable sort groups occurrences by k-mer and keeps read order inside each group
+        order = np.argsort(codes, kind="stable")
+        sortedCodes = codes[order]
+        isGroupStart = np.ones(len(sortedCodes), dtype=bool)
+        isGroupStart[1:] = sortedCodes[1:] != sortedCodes[:-1]
+        groupStarts = np.flatnonzero(isGroupStart)
+        offsets = np.append(groupStarts, len(codes)).astype(np.int64)
+        return cls(
+            k=k,
+            codes=sortedCodes[groupStarts],
+            counts=np.diff(offsets).astype(np.uint32),
+            offsets=offsets,
+            readIndex=np.asarray(readIndex)[order].astype(np.uint32),
+            positions=np.asarray(positions)[order].astype(np.uint32),
+            readIds=readIds,
+        )
+
+    # Input: file location
+    # Output: index written to the file in the binary index format
+    def save(self, fileLocation):
+        readIds = self._readIds
+        idBytes = encodeReadIds(readIds) if isinstance(readIds, list) else bytes(readIds)
+        with open(fileLocation, "wb") as file:
+            writeIndexHeader(
+                file,
+                self.k,
+                len(self.codes),
+                self.numOccurrences,
+                len(self.readIds),
+                len(idBytes),
+            )
+            for name, dtype, sizeKey in INDEX_SECTIONS:
+                writeIndexSection(file, getattr(self, name), dtype)
+            file.write(idBytes)
+
+    # Input: file location of an index written by save
+    # Output: KmerIndex whose arrays are views of a read-only memory map of the file (no copy)
+    @classmethod
+    def open(cls, fileLocation):
+        with open(fileLocation, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) < INDEX_HEADER.size:
+            raise ValueError(f"{fileLocation} is not a k-mer index file")
+        (
+            magic,
+            version,
+            k,
+            encoding,
+            numCodes,
+            numOccurrences,
+            numReads,
+            idBytesLength,
+        ) = INDEX_HEADER.unpack_from(buffer)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{fileLocation} is not a k-mer index file")
+        if version != INDEX_VERSION or encoding != ENCODING_2BIT:
+            raise ValueError(
+                f"{fileLocation} has unsupported k-mer index version {version}, encoding {encoding}"
+            )
+
+        sizes = {
+            "numCodes": numCodes,
+            "numOffsets": numCodes + 1,
+            "numOccurrences": numOccurrences,
+        }
+        arrays = {}
+        offset = INDEX_HEADER.size
+        for name, dtype, sizeKey in INDEX_SECTIONS:
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=sizes[sizeKey], offset=offset
+            )
+            offset += arrays[name].nbytes + paddingTo8(arrays[name].nbytes)
+        if offset + idBytesLength != len(buffer):
+            raise ValueError(f"{fileLocation} is a truncated k-mer index file")
+
+        index = cls(
+            k=k,
+            readIds=memoryview(buffer)[offset : offset + idBytesLength],
+            **arrays,
+        )
+        index.buffer = buffer
+        return index
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, kmer):
+        return self.find(kmer) >= 0
+
+    # Output: total number of k-mer occurrences
+    @property
+    def numOccurrences(self):
+        return int(self.offsets[-1])
+
+    # Output: bytes held by the index arrays
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes
+            for array in [
+                self.codes,
+                self.counts,
+                self.offsets,
+                self.readIndex,
+                self.positions,
+            ]
+        )
+
+    # Output: number of distinct k-mers seen exactly c times, for every count c
+    def countHistogram(self):
+        return np.bincount(self.counts, minlength=2)
+
+    # Input: minimum count
+    # Output: KmerIndex of the k-mers seen at least minCount times (with all their occurrences)
+    def filterCounts(self, minCount):
+        keep = self.counts >= minCount
+        occurrences = gatherRanges(self.offsets[:-1][keep], self.offsets[1:][keep])
+        counts = self.counts[keep]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return KmerIndex(
+            k=self.k,
+            codes=self.codes[keep],
+            counts=counts,
+            offsets=offsets,
+            readIndex=self.readIndex[occurrences],
+            positions=self.positions[occurrences],
+            readIds=self._readIds,
+        )
+
+    # Input: k-mer string or code
+    # Output: slot of the k-mer in codes, -1 if it is not in the index (binary search, O(log n))
+    def find(self, kmer):
+        if isinstance(kmer, str):
+            kmer = kmerCodes.encodeKmer(kmer)
+        slots = self.findCodes(np.array([kmer], dtype=np.uint64))
+        return int(slots[0])
+
+    # Input: array of k-mer codes
+    # Output: slot of each code in codes, -1 for codes that are not in the index
+    def findCodes(self, codes):
+        codes = np.asarray(codes, dtype=np.uint64)
+        slots = np.searchsorted(self.codes, codes)
+        inRange = slots < len(self.codes)
+        found = np.zeros(len(codes), dtype=bool)
+        found[inRange] = self.codes[slots[inRange]] == codes[inRange]
+        return np.where(found, slots, -1)
+
+    # Input: k-mer string or code
+    # Output: number of occurrences of the k-mer
+    def count(self, kmer):
+        slot = self.find(kmer)
+        return int(self.counts[slot]) if slot >= 0 else 0
+
+    # Input: k-mer string or code
+    # Output: read index and position arrays of every occurrence of the k-mer
+    def lookup(self, kmer):
+        slot = self.find(kmer)
+        if slot < 0:
+            return self.readIndex[:0], self.positions[:0]
+        start, stop = self.offsets[slot], self.offsets[slot + 1]
+        return self.readIndex[start:stop], self.positions[start:stop]
+
+    # Input: k-mer string or code
+    # Output: list of (read id, position) of every occurrence of the k-mer
+    def occurrences(self, kmer):
+        readIndex, positions = self.lookup(kmer)
+        return [
+            (self.readIds[index], position)
+            for index, position in zip(readIndex.tolist(), positions.tolist())
+        ]
+
+    # Output: k-mer pool in the ReadsToKmers dictionary format ({kmer: {readId: [{start: end}]}})
+    def toKmerPool(self):
+        kmerPool = defaultdict(lambda: defaultdict(list))
+        k = self.k
+        kmers = kmerCodes.decodeKmers(self.codes, k)
+        slotOfOccurrence = np.repeat(np.arange(len(self.codes)), self.counts)
+        for slot, index, position in zip(
+            slotOfOccurrence.tolist(), self.readIndex.tolist(), self.positions.tolist()
+        ):
+            kmerPool[kmers[slot]][self.readIds[index]].append({position: position + k})
+        return kmerPool
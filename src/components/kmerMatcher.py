@@ -0,0 +1,133 @@
+from itertools import combinations
+import numpy as np
+from components import kmerCodes
+from components.readStore import gatherRanges
+
+
+class KmerMatcher:
+    """
+    Mismatch-tolerant index of reference k-mer codes. By the pigeonhole principle, two k-mers
+    within d = maxHammingDistance substitutions of each other agree exactly on at least s - d of
+    s disjoint segments of the k-mer. Every choice of s - d segments is a spaced seed, and the
+    reference k-mers masked by each seed are kept in a sorted array, so a query is only
+    compared with the reference k-mers that share a seed with it; the candidates are then
+    verified by Hamming distance. s is picked from the number of reference k-mers: more
+    segments mean more seeds but longer ones, with fewer chance candidates.
+    """
+
+    def __init__(
+        self, referenceCodes, k, maxHammingDistance=2, numSegments=None, seedIndex=None
+    ):
+        kmerCodes.checkK(k)
+        if not 0 <= maxHammingDistance < k:
+            raise ValueError("The Hamming distance must be at least 0 and less than k")
+        if numSegments is not None and not maxHammingDistance < numSegments <= k:
+            raise ValueError("The number of segments must be more than the Hamming distance and at most k")
+        self.referenceCodes = np.asarray(referenceCodes, dtype=np.uint64)
+        self.k = k
+        self.maxHammingDistance = maxHammingDistance
+        # at most this many segments more than the d + 1 the pigeonhole principle needs
+        self.maxExtraSegments = 3
+        # number of segments the k-mers are split into (None: picked by chooseSegments)
+        self.segments = (
+            self.chooseSegments(len(self.referenceCodes))
+            if numSegments is None
+            else self.splitSegments(numSegments)
+        )
+        # segments of every seed, and the mask of the seed's bases
+        self.seeds = list(
+            combinations(
+                range(len(self.segments)), len(self.segments) - maxHammingDistance
+            )
+        )
+        self.seedMasks = [
+            np.bitwise_or.reduce(
+                [self.segmentMask(self.segments[segment]) for segment in seed]
+            )
+            for seed in self.seeds
+        ]
+        # masked reference k-mers in ascending order, position of each in referenceCodes
+        # (one pair of arrays per seed; given when the index was saved)
+        if seedIndex is None:
+            seedIndex = []
+            for mask in self.seedMasks:
+                values = self.referenceCodes & mask
+                order = np.argsort(values, kind="stable")
+                seedIndex.append((values[order], order))
+        self.seedIndex = seedIndex
+        # number of queries looked up at once
+        self.chunkSize = 1 << 16
+
+    # Input: number of segments
+    # Output: (first base, number of bases) of each segment, as even as possible
+    def splitSegments(self, numSegments):
+        bounds = np.linspace(0, self.k, numSegments + 1).round().astype(int).tolist()
+        return [(start, stop - start) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    # Input: number of reference k-mers
+    # Output: segments with the lowest estimated lookup cost per query: one binary search per
+    #         seed plus the reference k-mers expected to share each seed by chance
+    def chooseSegments(self, numReferences):
+        best, bestCost = None, None
+        maxSegments = min(self.k, self.maxHammingDistance + 1 + self.maxExtraSegments)
+        for numSegments in range(self.maxHammingDistance + 1, maxSegments + 1):
+            segments = self.splitSegments(numSegments)
+            cost = sum(
+                1 + numReferences / 4.0 ** sum(segments[segment][1] for segment in seed)
+                for seed in combinations(
+                    range(numSegments), numSegments - self.maxHammingDistance
+                )
+            )
+            if bestCost is None or cost < bestCost:
+                best, bestCost = segments, cost
+        return best
+
+    # Input: segment (first base, number of bases)
+    # Output: mask of the segment's bits in a k-mer code
+    def segmentMask(self, segment):
+        start, length = segment
+        return kmerCodes.kmerMask(length) << np.uint64(2 * (self.k - start - length))
+
+    # Input: query codes
+    # Output: (query index, reference index) of every reference k-mer sharing at least one
+    #         seed with a query k-mer, each pair once
+    def candidates(self, queryCodes):
+        queryIndices, referenceIndices = [], []
+        for mask, (sortedValues, order) in zip(self.seedMasks, self.seedIndex):
+            values = queryCodes & mask
+            starts = np.searchsorted(sortedValues, values, "left")
+            stops = np.searchsorted(sortedValues, values, "right")
+            queryIndices.append(
+                np.repeat(np.arange(len(queryCodes), dtype=np.int64), stops - starts)
+            )
+            referenceIndices.append(order[gatherRanges(starts, stops)])
+        pairs = np.unique(
+            np.concatenate(queryIndices) * len(self.referenceCodes)
+            + np.concatenate(referenceIndices)
+        )
+        return pairs // len(self.referenceCodes), pairs % len(self.referenceCodes)
+
+    # Input: query codes
+    # Output: query index, reference index and Hamming distance of every reference k-mer within
+    #         maxHammingDistance of a query k-mer, ordered by reference index, then query index
+    def matches(self, queryCodes):
+        queryCodes = np.asarray(queryCodes, dtype=np.uint64)
+        queryIndices, referenceIndices, distances = [], [], []
+        if len(self.referenceCodes):
+            for start in range(0, len(queryCodes), self.chunkSize):
+                chunk = queryCodes[start : start + self.chunkSize]
+                queryIndex, referenceIndex = self.candidates(chunk)
+                distance = kmerCodes.hammingDistances(
+                    chunk[queryIndex], self.referenceCodes[referenceIndex]
+                )
+                close = distance <= self.maxHammingDistance
+                queryIndices.append(queryIndex[close] + start)
+                referenceIndices.append(referenceIndex[close])
+                distances.append(distance[close])
+        if not queryIndices:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        queryIndex = np.concatenate(queryIndices)
+        referenceIndex = np.concatenate(referenceIndices)
+        order = np.lexsort((queryIndex, referenceIndex))
+        return queryIndex[order], referenceIndex[order], np.concatenate(distances)[order]
@@ -0,0 +1,130 @@
+import logging
+import numpy as np
+from components import kmerCodes
+from components.readStore import AMBIGUOUS_CODE, gatherRanges
+from components.readsToKmers import histogramValley
+
+
+class KmerSizeSelector:
+    """
+    Picks k before the assembly from a sample of the cleaned reads, in the manner of KmerGenie:
+    for every candidate k the k-mer count histogram of the sample is split at its first valley
+    into error k-mers and solid k-mers, and the number of distinct solid k-mers estimates the
+    genome size seen at that k. Small k collapses repeats into fewer k-mers and large k leaves
+    each k-mer fewer reads to be seen in, so the k with the most solid k-mers is chosen.
+    """
+
+    def __init__(
+        self,
+        readStore,
+        minimumReadLength,
+        candidates=None,
+        sampleFraction=0.1,
+        minSampleReads=1000,
+        seed=0,
+    ):
+        self.readStore = readStore
+        # k must stay below the shortest read (k <= minimumReadLength - 2)
+        self.maxK = min(kmerCodes.MAX_K, minimumReadLength - 2)
+        if self.maxK < 2:
+            raise ValueError(
+                f"Reads of {minimumReadLength} bases are too short for any k"
+            )
+        # odd k from 11 to 31 by default (odd k-mers cannot be their own reverse complement)
+        if candidates is None:
+            candidates = range(11, kmerCodes.MAX_K + 1, 2)
+        self.candidates = sorted(
+            {int(k) for k in candidates if 2 <= k <= self.maxK}
+        ) or [self.maxK]
+        # share of the reads the histograms are computed from (at least minSampleReads reads)
+        self.sampleFraction = sampleFraction
+        self.minSampleReads = minSampleReads
+        self.seed = seed
+        # histogram summary of every candidate k
+        self.report = []
+
+    # Output: indices of the sampled reads (ascending)
+    def sampleReads(self):
+        numReads = len(self.readStore)
+        sampleSize = min(
+            numReads,
+            max(self.minSampleReads, int(round(numReads * self.sampleFraction))),
+        )
+        rng = np.random.default_rng(self.seed)
+        return np.sort(rng.choice(numReads, size=sampleSize, replace=False))
+
+    # Input: indices of the reads to count
+    # Output: k-mer count histogram of every candidate k (candidate -> histogram). The reads
+    #         are unpacked once; the k-mer codes of each candidate extend the codes of the
+    #         previous candidate by the codes of the bases between them.
+    def countHistograms(self, reads):
+        codes, readStarts, lengths = self.readStore.subset(reads).unpack()
+        numCodes = len(codes)
+        # end of the read every base belongs to, -1 for the padding between reads
+        readEnds = np.full(numCodes, -1, dtype=np.int64)
+        readEnds[gatherRanges(readStarts, readStarts + lengths)] = np.repeat(
+            readStarts + lengths, lengths
+        )
+        ambiguous = codes == AMBIGUOUS_CODE
+        ambiguousBefore = np.zeros(numCodes + 1, dtype=np.int64)
+        np.cumsum(ambiguous, out=ambiguousBefore[1:])
+        baseCodes = np.where(ambiguous, 0, codes)
+
+        histograms = {}
+        stepWindows = {}
+        windows = None
+        windowK = 0
+        for k in self.candidates:
+            count = numCodes - k + 1
+            if count <= 0:
+                histograms[k] = np.zeros(2, dtype=np.int64)
+                continue
+            if windows is None:
+                windows = kmerCodes.windowCodes(baseCodes, k)
+            else:
+                step = k - windowK
+                if step not in stepWindows:
+                    stepWindows[step] = kmerCodes.windowCodes(baseCodes, step)
+                windows = (windows[:count] << np.uint64(2 * step)) | stepWindows[step][
+                    windowK : windowK + count
+                ]
+            windowK = k
+            starts = np.arange(count, dtype=np.int64)
+            valid = (starts + k <= readEnds[:count]) & (
+                ambiguousBefore[starts + k] == ambiguousBefore[starts]
+            )
+            kmerCounts = np.unique(windows[valid], return_counts=True)[1]
+            histograms[k] = np.bincount(kmerCounts, minlength=2)
+        return histograms
+
+    # Output: chosen k. Every candidate's histogram summary is added to the report and logged.
+    def selectK(self):
+        reads = self.sampleReads()
+        histograms = self.countHistograms(reads)
+        self.report = []
+        for k, histogram in histograms.items():
+            minKmerCount = histogramValley(histogram)
+            self.report.append(
+                {
+                    "k": k,
+                    "distinctKmers": int(histogram[1:].sum()),
+                    "minKmerCount": minKmerCount,
+                    "solidKmers": int(histogram[minKmerCount:].sum()),
+                }
+            )
+        # most solid k-mers, the larger k on a tie
+        best = max(self.report, key=lambda entry: (entry["solidKmers"], entry["k"]))
+
+        logging.info(f"\nK Selection: ")
+        logging.info(
+            f"\tSampled {len(reads)} of {len(self.readStore)} reads, candidates {self.candidates} (at most {self.maxK})"
+        )
+        for entry in self.report:
+            logging.info(
+                f"\tk = {entry['k']}: {entry['distinctKmers']} distinct k-mers, "
+                f"histogram valley at {entry['minKmerCount']}, {entry['solidKmers']} solid k-mers"
+            )
+        logging.info(
+            f"\tChosen k = {best['k']}: most solid k-mers ({best['solidKmers']}), the largest estimate of the genome size"
+        )
+        return best["k"]
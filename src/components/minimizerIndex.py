@@ -0,0 +1,191 @@
+import mmap
+import struct
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from components import kmerCodes
+from components.kmerIndex import paddingTo8, writeIndexSection
+from components.readStore import gatherRanges
+
+# hash of the slots without a k-mer (ambiguous bases, gaps between sequences)
+NO_KMER = np.uint64(np.iinfo(np.uint64).max)
+
+# Binary minimizer index file, laid out like the k-mer index file: a fixed header, the index
+# arrays (little endian, each section padded to 8 bytes so it can be viewed in place from a
+# memory map) and the newline-joined virus ids.
+# Header: magic, format version, minimizer length, window, number of viruses, number of
+#         (minimizer, virus) entries, size of the virus id section
+MINIMIZER_MAGIC = b"VMINIDX\0"
+MINIMIZER_VERSION = 1
+MINIMIZER_HEADER = struct.Struct("<8sIIIxxxxQQQ")
+MINIMIZER_SECTIONS = [
+    ("hashes", "<u8", "numEntries"),
+    ("entryVirus", "<i8", "numEntries"),
+    ("sketchSizes", "<i8", "numViruses"),
+]
+
+
+# Input: k-mer codes
+# Output: hashes of the codes (an invertible mix, so minimizers are not biased towards
+#         k-mers starting with A)
+def minimizerHashes(codes):
+    hashes = np.asarray(codes, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    hashes ^= hashes >> np.uint64(29)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(32)
+    # NO_KMER stays reserved
+    return np.minimum(hashes, NO_KMER - np.uint64(1))
+
+
+# Input: sequences, minimizer length, window (consecutive k-mers)
+# Output: distinct (minimizer hash, sequence index) pairs of the (w,k)-minimizer sketches of
+#         the sequences, ordered by sequence then hash. The smallest hash of every window of
+#         w consecutive k-mers is a minimizer; the sequences are laid out with w - 1 empty
+#         slots around them, so no window mixes the k-mers of two sequences and the shorter
+#         windows at the ends of a sequence are kept.
+def sequenceMinimizers(sequences, minimizerLength, window):
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    readStarts = np.zeros(len(sequences), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=readStarts[1:])
+    codes, sequenceIndex, positions = kmerCodes.kmerCodes(
+        kmerCodes.sequenceToCodes("".join(sequences)),
+        readStarts,
+        lengths,
+        minimizerLength,
+    )
+    slotCounts = np.maximum(lengths - minimizerLength + 1, 0) + window - 1
+    slotStarts = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(slotCounts, out=slotStarts[1:])
+    # w - 1 empty slots before the first sequence too, so its first windows are kept as well
+    slots = np.full(int(slotStarts[-1]) + window - 1, NO_KMER, dtype=np.uint64)
+    slots[slotStarts[sequenceIndex] + positions + window - 1] = minimizerHashes(codes)
+
+    windowMinimums = sliding_window_view(slots, window).min(axis=1)
+    found = np.flatnonzero(windowMinimums != NO_KMER)
+    # the last slot of a window is in the sequence (or the gap after it) its k-mers are from
+    windowSequence = np.searchsorted(slotStarts, found, "right") - 1
+    hashes = windowMinimums[found]
+    order = np.lexsort((hashes, windowSequence))
+    hashes, windowSequence = hashes[order], windowSequence[order]
+    distinct = np.ones(len(hashes), dtype=bool)
+    distinct[1:] = (hashes[1:] != hashes[:-1]) | (windowSequence[1:] != windowSequence[:-1])
+    return hashes[distinct], windowSequence[distinct]
+
+
+class MinimizerIndex:
+    """
+    Inverted index of the (w,k)-minimizer sketches of a reference panel: every minimizer
+    hash maps to the viruses whose sketch holds it. Looking up the sketch of a contig counts
+    the minimizers it shares with each virus, so the contig is only searched in full
+    against the viruses it shares enough minimizers with.
+    """
+
+    def __init__(self, virusIds, hashes, entryVirus, sketchSizes, minimizerLength, window):
+        self.virusIds = list(virusIds)
+        self.minimizerLength = minimizerLength
+        self.window = window
+        # (minimizer hash, virus) entries ordered by hash
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.entryVirus = np.asarray(entryVirus, dtype=np.int64)
+        # number of minimizers of every virus
+        self.sketchSizes = np.asarray(sketchSizes, dtype=np.int64)
+
+    # Input: virus ids and sequences, minimizer length, window
+    # Output: index of the minimizer sketches of the sequences
+    @classmethod
+    def fromSequences(cls, virusIds, sequences, minimizerLength, window):
+        kmerCodes.checkK(minimizerLength)
+        if window < 1:
+            raise ValueError("The minimizer window must hold at least one k-mer")
+        hashes, virus = sequenceMinimizers(list(sequences), minimizerLength, window)
+        order = np.argsort(hashes, kind="stable")
+        return cls(
+            virusIds,
+            hashes[order],
+            virus[order],
+            np.bincount(virus, minlength=len(virusIds)),
+            minimizerLength,
+            window,
+        )
+
+    # Input: file location
+    # Output: index written to the file, to be opened with open
+    def save(self, fileLocation):
+        idBytes = "\n".join(self.virusIds).encode("utf-8")
+        with open(fileLocation, "wb") as file:
+            file.write(
+                MINIMIZER_HEADER.pack(
+                    MINIMIZER_MAGIC,
+                    MINIMIZER_VERSION,
+                    self.minimizerLength,
+                    self.window,
+                    len(self.virusIds),
+                    len(self.hashes),
+                    len(idBytes),
+                )
+            )
+            for name, dtype, sizeKey in MINIMIZER_SECTIONS:
+                writeIndexSection(file, getattr(self, name), dtype)
+            file.write(idBytes)
+
+    # Input: file location of an index written by save
+    # Output: MinimizerIndex whose arrays are views of a read-only memory map of the file
+    @classmethod
+    def open(cls, fileLocation):
+        with open(fileLocation, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) < MINIMIZER_HEADER.size:
+            raise ValueError(f"{fileLocation} is not a minimizer index file")
+        (
+            magic,
+            version,
+            minimizerLength,
+            window,
+            numViruses,
+            numEntries,
+            idBytesLength,
+        ) = MINIMIZER_HEADER.unpack_from(buffer)
+        if magic != MINIMIZER_MAGIC:
+            raise ValueError(f"{fileLocation} is not a minimizer index file")
+        if version != MINIMIZER_VERSION:
+            raise ValueError(
+                f"{fileLocation} has unsupported minimizer index version {version}"
+            )
+
+        sizes = {"numEntries": numEntries, "numViruses": numViruses}
+        arrays = {}
+        offset = MINIMIZER_HEADER.size
+        for name, dtype, sizeKey in MINIMIZER_SECTIONS:
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=sizes[sizeKey], offset=offset
+            )
+            offset += arrays[name].nbytes + paddingTo8(arrays[name].nbytes)
+        if offset + idBytesLength != len(buffer):
+            raise ValueError(f"{fileLocation} is a truncated minimizer index file")
+        idText = bytes(buffer[offset : offset + idBytesLength]).decode("utf-8")
+
+        index = cls(
+            virusIds=idText.split("\n") if numViruses else [],
+            minimizerLength=minimizerLength,
+            window=window,
+            **arrays,
+        )
+        index.buffer = buffer
+        return index
+
+    # Input: contigs
+    # Output: contig index, virus and number of shared minimizers of every (contig, virus)
+    #         pair sharing at least one minimizer, and the sketch size of every contig
+    def sharedMinimizers(self, contigs):
+        hashes, contig = sequenceMinimizers(list(contigs), self.minimizerLength, self.window)
+        starts = np.searchsorted(self.hashes, hashes, "left")
+        stops = np.searchsorted(self.hashes, hashes, "right")
+        pairs = np.repeat(contig, stops - starts) * len(self.virusIds) + self.entryVirus[
+            gatherRanges(starts, stops)
+        ]
+        pairs, counts = np.unique(pairs, return_counts=True)
+        return (
+            pairs // max(len(self.virusIds), 1),
+            pairs % max(len(self.virusIds), 1),
+            counts,
+            np.bincount(contig, minlength=len(contigs)),
+        )
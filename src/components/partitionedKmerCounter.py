@@ -0,0 +1,203 @@
+import os
+import shutil
+import logging
+
+import numpy as np
+
+from components import kmerCodes
+from components.kmerIndex import (
+    KmerIndex,
+    encodeReadIds,
+    paddingTo8,
+    writeIndexHeader,
+)
+from components.qc import QualityControl
+from components.readsToKmers import ReadsToKmers
+from components.readStore import ReadStore
+
+# one spilled k-mer occurrence
+OCCURRENCE_DTYPE = np.dtype([("code", "<u8"), ("readIndex", "<u4"), ("position", "<u4")])
+# number of values copied at a time when the index file is assembled
+COPY_CHUNK = 1 << 22
+
+
+class PartitionedKmerCounter:
+    """
+    External-memory k-mer counting. Reads are streamed batch by batch through quality
+    control, and their k-mer occurrences are appended to disk partitions by the prefix of
+    the k-mer code. Each partition is then counted on its own, so memory is bounded by the
+    largest partition. Partitions cover consecutive code ranges, so writing them one after
+    the other gives the sorted k-mer index file (same format as KmerIndex.save).
+    """
+
+    def __init__(
+        self, batches, k, numPartitions=64, partitionDir="./data/logs/partitions"
+    ):
+        kmerCodes.checkK(k)
+        if numPartitions < 1 or numPartitions & (numPartitions - 1):
+            raise ValueError("Number of partitions must be a power of 2")
+        self.batches = batches
+        self.k = k
+        self.partitionDir = partitionDir
+        # partitions are numbered by the top bits of the 2k-bit code
+        self.prefixBits = min(numPartitions.bit_length() - 1, 2 * k)
+        self.numPartitions = 1 << self.prefixBits
+        self.partitionSizes = np.zeros(self.numPartitions, dtype=np.int64)
+
+    # Input: partition number
+    # Output: location of the partition's spill file
+    def partitionFile(self, partition):
+        return os.path.join(self.partitionDir, f"partition_{partition}.bin")
+
+    # Input: k-mer codes, read index and position of every k-mer, open partition files
+    # Output: occurrences appended to their partition files (in read order)
+    def spill(self, codes, readIndex, positions, partitionFiles):
+        partitions = codes >> np.uint64(2 * self.k - self.prefixBits)
+        order = np.argsort(partitions, kind="stable")
+        records = np.empty(len(codes), dtype=OCCURRENCE_DTYPE)
+        records["code"] = codes[order]
+        records["readIndex"] = readIndex[order]
+        records["position"] = positions[order]
+        sizes = np.bincount(partitions.astype(np.int64), minlength=self.numPartitions)
+        self.partitionSizes += sizes
+        start = 0
+        for partition in np.flatnonzero(sizes).tolist():
+            stop = start + sizes[partition]
+            partitionFiles[partition].write(records[start:stop].tobytes())
+            start = stop
+
+    # Input: partition number
+    # Output: KmerIndex of the partition (no read ids)
+    def countPartition(self, partition):
+        records = np.fromfile(self.partitionFile(partition), dtype=OCCURRENCE_DTYPE)
+        return KmerIndex.fromOccurrences(
+            self.k,
+            records["code"],
+            records["readIndex"],
+            records["position"],
+            None,
+        )
+
+    # Input: open index file, section spill file
+    # Output: spill file copied into the index file, padded to 8 bytes
+    def copySection(self, file, sectionFile):
+        with open(sectionFile, "rb") as section:
+            shutil.copyfileobj(section, file, COPY_CHUNK)
+        file.write(bytes(paddingTo8(os.path.getsize(sectionFile))))
+
+    # Input: location of the index file, cleaned reads
+    # Output: partitions counted one at a time and written to the index file
+    def writeIndex(self, indexFile, cleanedStore):
+        sectionFiles = {
+            name: os.path.join(self.partitionDir, f"{name}.bin")
+            for name in ["codes", "counts", "readIndex", "positions"]
+        }
+        sections = {name: open(location, "wb") for name, location in sectionFiles.items()}
+        numCodes = 0
+        largestPartition = 0
+        for partition in range(self.numPartitions):
+            if not self.partitionSizes[partition]:
+                continue
+            partitionIndex = self.countPartition(partition)
+            os.remove(self.partitionFile(partition))
+            for name, section in sections.items():
+                section.write(getattr(partitionIndex, name).tobytes())
+            numCodes += len(partitionIndex)
+            largestPartition = max(largestPartition, partitionIndex.nbytes)
+        for section in sections.values():
+            section.close()
+
+        idBytes = encodeReadIds(cleanedStore.ids)
+        with open(indexFile, "wb") as file:
+            writeIndexHeader(
+                file,
+                self.k,
+                numCodes,
+                int(self.partitionSizes.sum()),
+                len(cleanedStore),
+                len(idBytes),
+            )
+            self.copySection(file, sectionFiles["codes"])
+            # offsets are the running total of the counts
+            file.write(np.zeros(1, dtype="<i8").tobytes())
+            total = 0
+            for start in range(0, numCodes, COPY_CHUNK):
+                counts = np.fromfile(
+                    sectionFiles["counts"],
+                    dtype="<u4",
+                    count=COPY_CHUNK,
+                    offset=4 * start,
+                )
+                offsets = np.cumsum(counts, dtype=np.int64) + total
+                file.write(offsets.astype("<i8").tobytes())
+                total = int(offsets[-1])
+            for name in ["counts", "readIndex", "positions"]:
+                self.copySection(file, sectionFiles[name])
+            file.write(idBytes)
+        return largestPartition
+
+    # Input: stream of biosample batches, location of the index file
+    # Output: cleaned reads, memory mapped k-mer index, minimum read length, quality control
+    #         report and metadata (same as QualityControl + ReadsToKmers.buildKmerIndex)
+    def countKmers(self, indexFile):
+        os.makedirs(self.partitionDir, exist_ok=True)
+        qualityControlInstance = QualityControl(biosample=None, asReadStore=True)
+        qualityControlReport = {}
+        cleanedStores = []
+        sequenceLengths = []
+        lengthOriginalBiosample = 0
+        numCleanedReads = 0
+
+        partitionFiles = [
+            open(self.partitionFile(partition), "wb")
+            for partition in range(self.numPartitions)
+        ]
+        try:
+            for batch in self.batches:
+                lengthOriginalBiosample += len(batch)
+                batchReport, cleanedStore, trimmedLengths = (
+                    qualityControlInstance.cleanBatch(batch)
+                )
+                qualityControlReport.update(batchReport)
+                sequenceLengths.append(trimmedLengths)
+                cleanedStores.append(cleanedStore)
+
+                codes, readIndex, positions = ReadsToKmers(
+                    readsData=cleanedStore, k=self.k
+                ).extractKmerCodes()
+                self.spill(codes, readIndex + numCleanedReads, positions, partitionFiles)
+                numCleanedReads += len(cleanedStore)
+        finally:
+            for partitionFile in partitionFiles:
+                partitionFile.close()
+
+        qualityControlInstance.writeReport(qualityControlReport)
+        cleanedStore = ReadStore.concatenate(cleanedStores)
+        cleanedStore.save(
+            os.path.join(qualityControlInstance.outputDataDir, "CleanedBioSample.npz")
+        )
+        qcMetaData = qualityControlInstance.qualityControlMetadata(
+            np.concatenate(sequenceLengths),
+            lengthOriginalBiosample,
+            len(cleanedStore),
+        )
+
+        largestPartition = self.writeIndex(indexFile, cleanedStore)
+        shutil.rmtree(self.partitionDir, ignore_errors=True)
+        kmerIndex = KmerIndex.open(indexFile)
+
+        logging.info(f"\nPartitioned K-mer Counting: ")
+        logging.info(
+            f"\tPartitions: {self.numPartitions}, k-mer occurrences: {kmerIndex.numOccurrences}"
+        )
+        logging.info(
+            f"\tLargest partition: {int(self.partitionSizes.max())} occurrences, {largestPartition} bytes counted in memory"
+        )
+
+        return (
+            cleanedStore,
+            kmerIndex,
+            qcMetaData["minimumReadLength"],
+            qualityControlReport,
+            qcMetaData,
+        )
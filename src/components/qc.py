@@ -1,13 +1,16 @@
-import statistics
 import json
 import os
+import numpy as np
 import pandas as pd
 import logging
+from components.readStore import ReadStore
 
 
 class QualityControl:
-    def __init__(self, biosample):
+    def __init__(self, biosample, asReadStore=False):
         self.biosample = biosample
+        # return the cleaned reads as a 2-bit packed ReadStore instead of a dataframe
+        self.asReadStore = asReadStore
         self.logDataDir = "./data/logs"
         os.makedirs(self.logDataDir, exist_ok=True)
         self.outputDataDir = "./data/output_data"
@@ -24,75 +27,191 @@ class QualityControl:
     def calculatePError(self, q):
         return round(10 ** (-q / 10.0), 5)
 
-    # Input: biosample dictionary
-    # Output: cleaned biosample dictionary, dataframe, and quality control information used in reports and logging
-    def qualityControl(self):
-        biosample = self.biosample
-        cleanedBiosample = {}
-        qualityControlReport = {}
-        qscores = []
-        perrorscores = []
-        sequenceLengths = []
-        lengthOriginalBiosample = len(biosample)
-
-        for id, read in biosample.items():
-            id = id
-            sequence = read["sequence"]
-            quality = read["quality"]
-
-            qscores = [self.asciiToPhred(q) for q in quality]
-
-            trimmedScores = []
-            trimmedSequence = []
-
-            half_index = len(qscores) // 2
-            for index in range(half_index, len(qscores)):
-                if qscores[index] >= 20:
-                    trimmedScores.append(qscores[index])
-                    trimmedSequence.append(sequence[index])
-
-            qscores = qscores[: len(qscores) // 2] + trimmedScores
-            sequence = sequence[: len(sequence) // 2] + "".join(trimmedSequence)
-
-            sequenceLengths.append(len(sequence))
-
-            readMedianQ = statistics.median(qscores)
-            readMeanQ = statistics.mean(qscores)
-            if readMedianQ >= 20:
-                sequence = "".join(sequence)
-                cleanedBiosample[id] = {"sequence": sequence}
-                qscoreLen = len(qscores)
-                qscores = []
+    # Input: biosample dictionary, or an iterable of biosample dictionaries (ImportBioSample.streamBioSample)
+    # Output: generator of biosample batches
+    def batches(self):
+        if isinstance(self.biosample, dict):
+            yield self.biosample
+        else:
+            yield from self.biosample
+
+    # Input: one batch of the biosample
+    # Output: per-read quality control arrays for the batch (see qualityControl for how they are used)
+    def qualityControlBatch(self, batch):
+        ids = list(batch.keys())
+        reads = batch.values()
+        sequences = [read["sequence"] for read in reads]
+        qualities = [read["quality"] for read in reads]
+        numReads = len(ids)
+
+        lengths = np.fromiter(map(len, qualities), dtype=np.int64, count=numReads)
+        if not np.array_equal(
+            lengths, np.fromiter(map(len, sequences), dtype=np.int64, count=numReads)
+        ):
+            raise ValueError("Sequence and quality lengths differ in the biosample")
+
+        # ragged buffers: every base of the batch in one array, reads delimited by their lengths
+        sequenceBytes = np.frombuffer("".join(sequences).encode("ascii"), np.uint8)
+        qualityBytes = np.frombuffer("".join(qualities).encode("ascii"), np.uint8)
+        readStarts = np.zeros(numReads + 1, dtype=np.int64)
+        np.cumsum(lengths, out=readStarts[1:])
+        indexType = np.int32 if len(qualityBytes) < 2**31 else np.int64
+
+        # keep the first half of each read, and bases with Q >= 20 in the second half
+        halves = lengths // 2
+        secondHalf = np.repeat(
+            np.tile([False, True], numReads),
+            np.column_stack([halves, lengths - halves]).ravel(),
+        )
+        keepBase = ~secondHalf | (qualityBytes >= 33 + 20)
+        keptBefore = np.zeros(len(keepBase) + 1, dtype=indexType)
+        np.cumsum(keepBase, out=keptBefore[1:])
+        trimmedLengths = np.diff(keptBefore[readStarts]).astype(np.int64)
+        keptScores = qualityBytes[keepBase] - 33
+        keptReadIndex = np.repeat(np.arange(numReads, dtype=indexType), trimmedLengths)
+
+        # per-read histogram of Phred scores. The mean is the histogram's weighted sum; the
+        # low/high middle elements of the median are found by counting the bins whose
+        # running total is at or below their rank
+        width = int(keptScores.max()) + 1 if len(keptScores) else 1
+        if numReads * width >= 2**31:
+            keptReadIndex = keptReadIndex.astype(np.int64)
+        histogram = np.bincount(
+            keptReadIndex * width + keptScores, minlength=numReads * width
+        ).reshape(numReads, width)
+        cumulative = np.cumsum(histogram, axis=1)
+        lowMiddle = (cumulative <= ((trimmedLengths - 1) // 2)[:, None]).sum(axis=1)
+        highMiddle = (cumulative <= (trimmedLengths // 2)[:, None]).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            meanQ = (histogram @ np.arange(width)) / trimmedLengths
+        medianQ = np.where(trimmedLengths > 0, (lowMiddle + highMiddle) / 2, np.nan)
+
+        keepRead = medianQ >= 20
+        return {
+            "ids": ids,
+            "trimmedSequenceBytes": sequenceBytes[
+                keepBase & np.repeat(keepRead, lengths)
+            ],
+            "trimmedLengths": trimmedLengths,
+            "meanQ": meanQ,
+            "medianQ": medianQ,
+            "keepRead": keepRead,
+        }
 
-            qualityControlReport[id] = {
+    # Input: one batch of the biosample
+    # Output: per-read quality control report, cleaned reads of the batch (dictionary or ReadStore), trimmed read lengths
+    def cleanBatch(self, batch):
+        batchQc = self.qualityControlBatch(batch)
+        ids = batchQc["ids"]
+        trimmedLengths = batchQc["trimmedLengths"]
+        keepRead = batchQc["keepRead"]
+
+        batchReport = {}
+        for id, readMeanQ, readMedianQ, length in zip(
+            ids,
+            batchQc["meanQ"].tolist(),
+            batchQc["medianQ"].tolist(),
+            trimmedLengths.tolist(),
+        ):
+            batchReport[id] = {
                 "meanQ": readMeanQ,
                 "medianQ": readMedianQ,
-                "length": len(sequence),
+                "length": length,
             }
-        avgSeqLength = sum(sequenceLengths) / len(sequenceLengths)
 
+        keptIds = [id for id, keep in zip(ids, keepRead.tolist()) if keep]
+        keptLengths = trimmedLengths[keepRead]
+        if self.asReadStore:
+            cleanedBatch = ReadStore.fromArrays(
+                keptIds, batchQc["trimmedSequenceBytes"], keptLengths
+            )
+        else:
+            cleanedBatch = {}
+            trimmedSequences = batchQc["trimmedSequenceBytes"].tobytes().decode()
+            start = 0
+            for id, length in zip(keptIds, keptLengths.tolist()):
+                cleanedBatch[id] = {"sequence": trimmedSequences[start : start + length]}
+                start += length
+
+        return batchReport, cleanedBatch, trimmedLengths
+
+    # Input: per-read quality control report
+    # Output: report written to the logs directory
+    def writeReport(self, qualityControlReport):
         qcReportFile = os.path.join(self.logDataDir, "QualityControlReport.json")
         with open(qcReportFile, "w") as file:
-            json.dump(qualityControlReport, file)
-
-        cleanedBiosampleFile = os.path.join(self.outputDataDir, "CleanedBioSample.json")
-        with open(cleanedBiosampleFile, "w") as file:
-            json.dump(cleanedBiosample, file)
+            file.write(json.dumps(qualityControlReport))
 
-        biosampleList = [{"id": id, **data} for id, data in cleanedBiosample.items()]
-        biosampleDf = pd.DataFrame(biosampleList)
+    # Input: trimmed length of every read, number of reads before and after quality control
+    # Output: quality control metadata used in reports and logging
+    def qualityControlMetadata(
+        self, sequenceLengths, lengthOriginalBiosample, lengthCleanedBiosample
+    ):
+        avgSeqLength = int(sequenceLengths.sum()) / len(sequenceLengths)
+        minimumReadLength = int(sequenceLengths.min())
+        maximumReadLength = int(sequenceLengths.max())
 
         logging.info("\nQuality Control: ")
-        logging.info(f"\t# of cleaned reads: {len(cleanedBiosample)}")
+        logging.info(f"\t# of cleaned reads: {lengthCleanedBiosample}")
         logging.info(f"\tAverage read length: {avgSeqLength}")
-        logging.info(f"\tMinimum read length: {min(sequenceLengths)}")
-        logging.info(f"\tMaximum read length: {max(sequenceLengths)}")
-        qcMetaData = {
+        logging.info(f"\tMinimum read length: {minimumReadLength}")
+        logging.info(f"\tMaximum read length: {maximumReadLength}")
+        return {
             "lengthOriginalBiosample": lengthOriginalBiosample,
-            "lengthCleanedBiosample": len(cleanedBiosample),
+            "lengthCleanedBiosample": lengthCleanedBiosample,
             "averageReadLength": avgSeqLength,
-            "minimumReadLength": min(sequenceLengths),
-            "maximumReadLength": max(sequenceLengths),
+            "minimumReadLength": minimumReadLength,
+            "maximumReadLength": maximumReadLength,
         }
 
-        return biosampleDf, min(sequenceLengths), qualityControlReport, qcMetaData
+    # Input: biosample dictionary (or stream of biosample batches)
+    # Output: cleaned biosample dataframe (or ReadStore), and quality control information used in reports and logging
+    def qualityControl(self):
+        cleanedBiosample = {}
+        cleanedStores = []
+        qualityControlReport = {}
+        sequenceLengths = []
+        lengthOriginalBiosample = 0
+
+        for batch in self.batches():
+            lengthOriginalBiosample += len(batch)
+            batchReport, cleanedBatch, trimmedLengths = self.cleanBatch(batch)
+            qualityControlReport.update(batchReport)
+            sequenceLengths.append(trimmedLengths)
+            if self.asReadStore:
+                # only the packed form of the cleaned reads is kept between batches
+                cleanedStores.append(cleanedBatch)
+            else:
+                cleanedBiosample.update(cleanedBatch)
+
+        self.writeReport(qualityControlReport)
+
+        if self.asReadStore:
+            cleanedStore = ReadStore.concatenate(cleanedStores)
+            lengthCleanedBiosample = len(cleanedStore)
+            cleanedStore.save(
+                os.path.join(self.outputDataDir, "CleanedBioSample.npz")
+            )
+        else:
+            lengthCleanedBiosample = len(cleanedBiosample)
+            cleanedBiosampleFile = os.path.join(
+                self.outputDataDir, "CleanedBioSample.json"
+            )
+            with open(cleanedBiosampleFile, "w") as file:
+                file.write(json.dumps(cleanedBiosample))
+
+            biosampleList = [
+                {"id": id, **data} for id, data in cleanedBiosample.items()
+            ]
+            biosampleDf = pd.DataFrame(biosampleList)
+
+        qcMetaData = self.qualityControlMetadata(
+            np.concatenate(sequenceLengths),
+            lengthOriginalBiosample,
+            lengthCleanedBiosample,
+        )
+        minimumReadLength = qcMetaData["minimumReadLength"]
+
+        if self.asReadStore:
+            return cleanedStore, minimumReadLength, qualityControlReport, qcMetaData
+        return biosampleDf, minimumReadLength, qualityControlReport, qcMetaData
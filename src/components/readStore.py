@@ -0,0 +1,296 @@
+import sys
+import numpy as np
+
+# 2-bit base codes (A=0, C=1, G=2, T=3). Any other character (N, IUPAC codes) is
+# stored as A in the packed buffer and recorded in the ambiguous base arrays.
+AMBIGUOUS_CODE = 4
+BASE_CODES = np.full(256, AMBIGUOUS_CODE, dtype=np.uint8)
+for code, base in enumerate("ACGT"):
+    BASE_CODES[ord(base)] = code
+    BASE_CODES[ord(base.lower())] = code
+CODE_BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+
+# Input: start and stop offsets of n ranges
+# Output: concatenated indices of all ranges
+def gatherRanges(starts, stops):
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(stops, dtype=np.int64) - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    rangeStarts = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=rangeStarts[1:])
+    return np.arange(total, dtype=np.int64) + np.repeat(starts - rangeStarts, lengths)
+
+
+# Input: unpacked 2-bit codes, length divisible by 4
+# Output: packed buffer, 4 bases per byte (first base in the high bits)
+def packCodes(codes):
+    codes = codes.reshape(-1, 4)
+    return (codes[:, 0] << 6) | (codes[:, 1] << 4) | (codes[:, 2] << 2) | codes[:, 3]
+
+
+# Input: packed buffer
+# Output: unpacked 2-bit codes, 4 per byte
+def unpackCodes(packed):
+    return np.stack(
+        [(packed >> 6) & 3, (packed >> 4) & 3, (packed >> 2) & 3, packed & 3], axis=1
+    ).ravel()
+
+
+class ReadStore:
+    """
+    Compact container for reads. Sequences are 2-bit encoded in one contiguous uint8
+    buffer (every read starts on a byte boundary), qualities are Phred scores in one
+    uint8 buffer, and read ids are interned strings.
+
+    Positions of a read's bases in the unpacked buffer are 4 * seqOffsets[i] + j.
+    """
+
+    def __init__(
+        self,
+        ids,
+        packed,
+        seqOffsets,
+        lengths,
+        ambiguousPositions,
+        ambiguousBases,
+        qualities=None,
+    ):
+        self.ids = ids
+        self.packed = packed
+        self.seqOffsets = seqOffsets
+        self.lengths = lengths
+        self.ambiguousPositions = ambiguousPositions
+        self.ambiguousBases = ambiguousBases
+        self.qualities = qualities
+        self.qualOffsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.qualOffsets[1:])
+
+    # Input: read ids, concatenated ASCII sequences (uint8), read lengths, concatenated ASCII qualities (optional)
+    # Output: ReadStore
+    @classmethod
+    def fromArrays(cls, ids, sequenceBytes, lengths, qualityBytes=None):
+        lengths = np.asarray(lengths, dtype=np.int64)
+        numReads = len(lengths)
+        seqOffsets = np.zeros(numReads + 1, dtype=np.int64)
+        np.cumsum((lengths + 3) // 4, out=seqOffsets[1:])
+        baseStarts = np.zeros(numReads + 1, dtype=np.int64)
+        np.cumsum(lengths, out=baseStarts[1:])
+
+        codes = BASE_CODES[sequenceBytes]
+        ambiguous = codes == AMBIGUOUS_CODE
+        destination = np.arange(len(codes), dtype=np.int64) + np.repeat(
+            4 * seqOffsets[:-1] - baseStarts[:-1], lengths
+        )
+        unpacked = np.zeros(4 * int(seqOffsets[-1]), dtype=np.uint8)
+        unpacked[destination] = np.where(ambiguous, 0, codes)
+
+        qualities = None
+        if qualityBytes is not None:
+            qualities = (np.asarray(qualityBytes, dtype=np.uint8) - 33).astype(np.uint8)
+
+        return cls(
+            ids=[sys.intern(id) for id in ids],
+            packed=packCodes(unpacked),
+            seqOffsets=seqOffsets,
+            lengths=lengths.astype(np.uint32),
+            ambiguousPositions=destination[ambiguous],
+            ambiguousBases=np.asarray(sequenceBytes, dtype=np.uint8)[ambiguous],
+            qualities=qualities,
+        )
+
+    # Input: read ids, sequence strings, quality strings (optional)
+    # Output: ReadStore
+    @classmethod
+    def fromReads(cls, ids, sequences, qualities=None):
+        lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+        sequenceBytes = np.frombuffer("".join(sequences).encode("ascii"), np.uint8)
+        qualityBytes = None
+        if qualities is not None:
+            qualityBytes = np.frombuffer("".join(qualities).encode("ascii"), np.uint8)
+        return cls.fromArrays(ids, sequenceBytes, lengths, qualityBytes)
+
+    # Input: biosample dictionary ({id: {"sequence", "quality" (optional)}})
+    # Output: ReadStore
+    @classmethod
+    def fromBiosample(cls, biosample):
+        reads = biosample.values()
+        sequences = [read["sequence"] for read in reads]
+        qualities = None
+        if reads and all("quality" in read for read in reads):
+            qualities = [read["quality"] for read in reads]
+        return cls.fromReads(list(biosample.keys()), sequences, qualities)
+
+    # Input: list of ReadStores
+    # Output: one ReadStore holding all reads in order
+    @classmethod
+    def concatenate(cls, stores):
+        stores = list(stores)
+        if not stores:
+            return cls.fromReads([], [])
+        ids = []
+        packed, seqOffsets, lengths = [], [np.zeros(1, dtype=np.int64)], []
+        ambiguousPositions, ambiguousBases, qualities = [], [], []
+        byteOffset = 0
+        for store in stores:
+            ids.extend(store.ids)
+            packed.append(store.packed)
+            seqOffsets.append(store.seqOffsets[1:] + byteOffset)
+            lengths.append(store.lengths)
+            ambiguousPositions.append(store.ambiguousPositions + 4 * byteOffset)
+            ambiguousBases.append(store.ambiguousBases)
+            qualities.append(store.qualities)
+            byteOffset += int(store.seqOffsets[-1])
+        hasQualities = all(quality is not None for quality in qualities)
+        return cls(
+            ids=ids,
+            packed=np.concatenate(packed),
+            seqOffsets=np.concatenate(seqOffsets),
+            lengths=np.concatenate(lengths),
+            ambiguousPositions=np.concatenate(ambiguousPositions),
+            ambiguousBases=np.concatenate(ambiguousBases),
+            qualities=np.concatenate(qualities) if hasQualities else None,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Output: bytes held by the sequence, quality and offset buffers
+    @property
+    def nbytes(self):
+        arrays = [
+            self.packed,
+            self.seqOffsets,
+            self.lengths,
+            self.qualOffsets,
+            self.ambiguousPositions,
+            self.ambiguousBases,
+        ]
+        if self.qualities is not None:
+            arrays.append(self.qualities)
+        return sum(array.nbytes for array in arrays)
+
+    # Input: range of reads [start, stop)
+    # Output: unpacked codes (ambiguous bases set to AMBIGUOUS_CODE), start of each read in the codes, read lengths
+    def unpack(self, start=0, stop=None):
+        if stop is None:
+            stop = len(self)
+        firstByte = int(self.seqOffsets[start])
+        lastByte = int(self.seqOffsets[stop])
+        codes = unpackCodes(self.packed[firstByte:lastByte])
+
+        low, high = np.searchsorted(
+            self.ambiguousPositions, [4 * firstByte, 4 * lastByte]
+        )
+        codes[self.ambiguousPositions[low:high] - 4 * firstByte] = AMBIGUOUS_CODE
+
+        readStarts = 4 * (self.seqOffsets[start:stop] - firstByte)
+        return codes, readStarts, self.lengths[start:stop]
+
+    # Input: read index
+    # Output: read sequence as ASCII bytes (uint8)
+    def sequenceBytes(self, index):
+        codes, readStarts, lengths = self.unpack(index, index + 1)
+        codes = codes[: int(lengths[0])]
+        ambiguous = codes == AMBIGUOUS_CODE
+        sequence = CODE_BASES[np.where(ambiguous, 0, codes)]
+        if ambiguous.any():
+            base = 4 * int(self.seqOffsets[index])
+            low, high = np.searchsorted(
+                self.ambiguousPositions, [base, base + int(lengths[0])]
+            )
+            sequence[self.ambiguousPositions[low:high] - base] = self.ambiguousBases[
+                low:high
+            ]
+        return sequence
+
+    # Input: read index
+    # Output: read sequence
+    def sequence(self, index):
+        return self.sequenceBytes(index).tobytes().decode("ascii")
+
+    # Input: read index
+    # Output: Phred scores of the read (uint8)
+    def quality(self, index):
+        return self.qualities[self.qualOffsets[index] : self.qualOffsets[index + 1]]
+
+    # Output: generator of read sequences
+    def sequences(self):
+        for index in range(len(self)):
+            yield self.sequence(index)
+
+    # Input: boolean mask or ascending read indices
+    # Output: ReadStore holding only the selected reads
+    def subset(self, selection):
+        selection = np.asarray(selection)
+        if selection.dtype == bool:
+            selection = np.flatnonzero(selection)
+        byteIndex = gatherRanges(
+            self.seqOffsets[selection], self.seqOffsets[selection + 1]
+        )
+        byteLengths = self.seqOffsets[selection + 1] - self.seqOffsets[selection]
+        seqOffsets = np.zeros(len(selection) + 1, dtype=np.int64)
+        np.cumsum(byteLengths, out=seqOffsets[1:])
+
+        # move ambiguous bases of the kept reads to their new read offsets
+        newIndex = np.full(len(self), -1, dtype=np.int64)
+        newIndex[selection] = np.arange(len(selection))
+        owner = (
+            np.searchsorted(4 * self.seqOffsets, self.ambiguousPositions, "right") - 1
+        )
+        kept = newIndex[owner] >= 0
+        ambiguousPositions = (
+            self.ambiguousPositions[kept]
+            - 4 * self.seqOffsets[owner[kept]]
+            + 4 * seqOffsets[newIndex[owner[kept]]]
+        )
+
+        qualities = None
+        if self.qualities is not None:
+            qualities = self.qualities[
+                gatherRanges(self.qualOffsets[selection], self.qualOffsets[selection + 1])
+            ]
+
+        return ReadStore(
+            ids=[self.ids[index] for index in selection],
+            packed=self.packed[byteIndex],
+            seqOffsets=seqOffsets,
+            lengths=self.lengths[selection],
+            ambiguousPositions=ambiguousPositions,
+            ambiguousBases=self.ambiguousBases[kept],
+            qualities=qualities,
+        )
+
+    # Input: file location (.npz)
+    # Output: ReadStore written to file
+    def save(self, fileLocation):
+        arrays = {
+            "ids": np.frombuffer("\n".join(self.ids).encode("utf-8"), np.uint8),
+            "packed": self.packed,
+            "seqOffsets": self.seqOffsets,
+            "lengths": self.lengths,
+            "ambiguousPositions": self.ambiguousPositions,
+            "ambiguousBases": self.ambiguousBases,
+        }
+        if self.qualities is not None:
+            arrays["qualities"] = self.qualities
+        np.savez(fileLocation, **arrays)
+
+    # Input: file location (.npz) written by save
+    # Output: ReadStore
+    @classmethod
+    def load(cls, fileLocation):
+        with np.load(fileLocation) as arrays:
+            ids = arrays["ids"].tobytes().decode("utf-8")
+            lengths = arrays["lengths"]
+            return cls(
+                ids=[sys.intern(id) for id in ids.split("\n")] if len(lengths) else [],
+                packed=arrays["packed"],
+                seqOffsets=arrays["seqOffsets"],
+                lengths=lengths,
+                ambiguousPositions=arrays["ambiguousPositions"],
+                ambiguousBases=arrays["ambiguousBases"],
+                qualities=arrays["qualities"] if "qualities" in arrays else None,
+            )
@@ -1,26 +1,188 @@
+import logging
+import numpy as np
 import pandas as pd
 from collections import defaultdict
-from components import utils
+from components import kmerCodes
+from components.countMinSketch import CountMinSketch
+from components.kmerIndex import KmerIndex
+from components.readStore import ReadStore
+
+
+# Input: k-mer count histogram (number of distinct k-mers seen c times at index c)
+# Output: first count after which the histogram rises again, 1 when it never does
+def histogramValley(histogram):
+    for count in range(1, len(histogram) - 1):
+        if histogram[count + 1] >= histogram[count]:
+            return count
+    return 1
 
 
 class ReadsToKmers:
-    def __init__(self, readsData, k):
+    def __init__(
+        self,
+        readsData,
+        k,
+        minKmerCount=1,
+        sketchMemory=None,
+        sketchFalsePositiveRate=0.01,
+    ):
+        # reads as a ReadStore, or a dataframe with id and sequence columns
+        if not isinstance(readsData, ReadStore):
+            readsData = ReadStore.fromReads(
+                list(readsData["id"]), list(readsData["sequence"])
+            )
         self.readsData = readsData
         self.k = k
+        # k-mers seen fewer times are treated as sequencing errors ("auto": picked from the k-mer count histogram)
+        self.minKmerCount = minKmerCount
+        # number of histogram bins written to the log
+        self.histogramLogBins = 20
+        # memory budget (bytes) of the count-min sketch used by the two-pass mode, None for the exact path
+        self.sketchMemory = sketchMemory
+        self.sketchFalsePositiveRate = sketchFalsePositiveRate
+        self.sketchReport = None
+
+    # Input: reads from sample
+    # Output: k-mer codes, read index and position of every k-mer (in read order).
+    #         In two-pass mode, only the k-mers the sketch has seen at least twice.
+    def extractKmerCodes(self):
+        if self.sketchMemory:
+            return self.extractKmerCodesTwoPass()
+        chunks = list(kmerCodes.readStoreKmerCodes(self.readsData, self.k))
+        if not chunks:
+            empty = np.zeros(0, dtype=np.int64)
+            return np.zeros(0, dtype=np.uint64), empty, empty
+        codes, readIndex, positions = zip(*chunks)
+        return np.concatenate(codes), np.concatenate(readIndex), np.concatenate(positions)
 
     # Input: reads from sample
+    # Output: k-mer codes, read index and position of the k-mers seen at least twice (plus the
+    #         sketch's false positives, removed later by solidKmerIndex). The first pass counts
+    #         every k-mer in a count-min sketch of fixed size; the second pass keeps only the
+    #         occurrences whose estimated count reaches the threshold.
+    def extractKmerCodesTwoPass(self):
+        threshold = 2 if self.minKmerCount == "auto" else max(2, self.minKmerCount)
+        sketch = CountMinSketch(self.sketchMemory, self.sketchFalsePositiveRate)
+
+        totalOccurrences = 0
+        occurrenceBytes = 0
+        for codes, readIndex, positions in kmerCodes.readStoreKmerCodes(
+            self.readsData, self.k
+        ):
+            sketch.add(codes)
+            totalOccurrences += len(codes)
+            occurrenceBytes = codes.itemsize + readIndex.itemsize + positions.itemsize
+
+        kept = []
+        for codes, readIndex, positions in kmerCodes.readStoreKmerCodes(
+            self.readsData, self.k
+        ):
+            solid = sketch.estimate(codes) >= threshold
+            kept.append((codes[solid], readIndex[solid], positions[solid]))
+
+        if kept:
+            codes, readIndex, positions = (np.concatenate(arrays) for arrays in zip(*kept))
+        else:
+            empty = np.zeros(0, dtype=np.int64)
+            codes, readIndex, positions = np.zeros(0, dtype=np.uint64), empty, empty
+
+        exactBytes = totalOccurrences * occurrenceBytes
+        twoPassBytes = len(codes) * occurrenceBytes + sketch.nbytes
+        self.sketchReport = {
+            "sketchBytes": sketch.nbytes,
+            "sketchDepth": sketch.depth,
+            "sketchWidth": sketch.width,
+            "threshold": threshold,
+            "totalOccurrences": totalOccurrences,
+            "keptOccurrences": len(codes),
+            "estimatedFalsePositiveRate": sketch.estimatedFalsePositiveRate(threshold),
+            "exactBytes": exactBytes,
+            "twoPassBytes": twoPassBytes,
+            "savedBytes": exactBytes - twoPassBytes,
+        }
+
+        logging.info(f"\nTwo-pass K-mer Counting: ")
+        logging.info(
+            f"\tCount-min sketch: {sketch.depth} x {sketch.width} ({sketch.nbytes} bytes)"
+        )
+        logging.info(
+            f"\tEstimated false positive rate: {self.sketchReport['estimatedFalsePositiveRate']:.4f} "
+            f"(target {self.sketchFalsePositiveRate})"
+        )
+        logging.info(
+            f"\tKept occurrences: {len(codes)} of {totalOccurrences} (seen at least {threshold} times)"
+        )
+        logging.info(
+            f"\tMemory: {twoPassBytes} bytes, exact path {exactBytes} bytes, saved {exactBytes - twoPassBytes} bytes"
+        )
+        return codes, readIndex, positions
+
+    # Input: k-mer codes, read index and position of every k-mer
     # Output: k-mers from reads. Each k-mer has an id.
-    def extractKmers(self):
+    def kmerPoolFromCodes(self, codes, readIndex, positions):
         kmerPool = defaultdict(lambda: defaultdict(list))
-        readsData = self.readsData
         k = self.k
+        ids = self.readsData.ids
 
-        for read in readsData.itertuples():
-            id = read.id
-            sequence = read.sequence
-            kmers = utils.toKmers(k, sequence)
+        # every distinct k-mer is decoded to a string once
+        distinctCodes, distinctIndex = kmerCodes.firstSeenUnique(codes)
+        kmers = kmerCodes.decodeKmers(distinctCodes, k)
 
-            for index, kmer in enumerate(kmers):
-                kmerPool[kmer][id].append({index: index + k})
+        for kmerIndex, index, position in zip(
+            distinctIndex.tolist(), readIndex.tolist(), positions.tolist()
+        ):
+            kmerPool[kmers[kmerIndex]][ids[index]].append({position: position + k})
 
         return kmerPool
+
+    # Input: k-mer codes, read index and position of every k-mer
+    # Output: CSR k-mer occurrence index
+    def kmerIndexFromCodes(self, codes, readIndex, positions):
+        return KmerIndex.fromOccurrences(
+            self.k, codes, readIndex, positions, self.readsData.ids
+        )
+
+    # Input: reads from sample
+    # Output: CSR k-mer occurrence index
+    def buildKmerIndex(self):
+        return self.kmerIndexFromCodes(*self.extractKmerCodes())
+
+    # Input: k-mer count histogram (number of distinct k-mers seen c times at index c)
+    # Output: minimum count of a solid k-mer. Error k-mers make a peak at count 1 that falls off
+    #         towards the coverage peak; the threshold is the first valley of the histogram,
+    #         or 1 when the histogram has no valley (low coverage, nothing can be told apart).
+    def autoMinKmerCount(self, histogram):
+        return histogramValley(histogram)
+
+    # Input: CSR k-mer occurrence index
+    # Output: index of the solid k-mers (seen at least minKmerCount times), minimum count used
+    def solidKmerIndex(self, kmerIndex):
+        histogram = kmerIndex.countHistogram()
+        if self.minKmerCount == "auto":
+            minKmerCount = self.autoMinKmerCount(histogram)
+        else:
+            minKmerCount = int(self.minKmerCount)
+        if self.sketchMemory:
+            # drops the k-mers seen once that passed the sketch as false positives
+            minKmerCount = max(minKmerCount, 2)
+        solidIndex = kmerIndex.filterCounts(minKmerCount)
+
+        logging.info(f"\nK-mer Count Histogram: ")
+        for count in range(1, min(len(histogram), self.histogramLogBins + 1)):
+            logging.info(f"\t{count}: {histogram[count]}")
+        if len(histogram) > self.histogramLogBins + 1:
+            logging.info(
+                f"\t>{self.histogramLogBins}: {histogram[self.histogramLogBins + 1 :].sum()}"
+            )
+        logging.info(f"\tMinimum k-mer count: {minKmerCount}")
+        logging.info(
+            f"\tDropped k-mers: {len(kmerIndex) - len(solidIndex)} distinct, "
+            f"{kmerIndex.numOccurrences - solidIndex.numOccurrences} occurrences"
+        )
+        logging.info(f"\tSolid k-mers: {len(solidIndex)}")
+        return solidIndex, minKmerCount
+
+    # Input: reads from sample
+    # Output: k-mers from reads. Each k-mer has an id.
+    def extractKmers(self):
+        return self.kmerPoolFromCodes(*self.extractKmerCodes())
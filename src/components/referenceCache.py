@@ -0,0 +1,155 @@
+import os
+import json
+import glob
+import hashlib
+import logging
+from components.importVirus import ImportVirus
+from components.fmIndex import FmIndex, FM_VERSION
+from components.minimizerIndex import MinimizerIndex, MINIMIZER_VERSION
+from components.referenceIndex import ReferenceIndex, REFERENCE_VERSION
+
+
+class ReferenceCache:
+    """
+    On-disk cache of the indexes of a virus panel. An entry is keyed by a hash of the
+    contents of the reference FASTA files together with the index settings (k and the
+    mismatch settings for the k-mer index, the minimizer settings for the minimizer index;
+    the FM-index has none), so an edited reference file gets a new key and its stale entry
+    is removed when the new one is built. On a hit the index is memory mapped and the FASTA
+    files are not parsed at all.
+    """
+
+    def __init__(self, fileLocations, k, maxHammingDistance=2, cacheDir="data/reference_cache"):
+        self.fileLocations = list(fileLocations)
+        self.k = k
+        self.maxHammingDistance = maxHammingDistance
+        self.cacheDir = cacheDir
+        os.makedirs(self.cacheDir, exist_ok=True)
+        # whether the last load was served from the cache
+        self.hit = False
+
+    # Input: index settings
+    # Output: hash of the file names and the settings (the same for every version of the files)
+    def panelKey(self, settings):
+        digest = hashlib.sha256()
+        digest.update(
+            json.dumps(
+                [
+                    [os.path.basename(fileLocation) for fileLocation in self.fileLocations],
+                    settings,
+                ]
+            ).encode("utf-8")
+        )
+        return digest.hexdigest()[:16]
+
+    # Output: hash of the contents of the reference files, in order
+    def contentKey(self):
+        digest = hashlib.sha256()
+        for fileLocation in self.fileLocations:
+            with open(fileLocation, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            # keep the boundary between files in the hash
+            digest.update(b"\0")
+        return digest.hexdigest()[:32]
+
+    # Input: index settings
+    # Output: location of the index file and of the virus metadata file of the current files
+    def entryLocations(self, settings):
+        prefix = os.path.join(
+            self.cacheDir, f"{self.panelKey(settings)}-{self.contentKey()}"
+        )
+        return f"{prefix}.bin", f"{prefix}.json"
+
+    # Output: virus dictionary (name and length of every virus) and k-mer reference index,
+    #         memory mapped from the cache or built from the reference files and cached
+    def load(self):
+        return self.loadEntry(
+            ["kmer", self.k, self.maxHammingDistance, REFERENCE_VERSION],
+            ReferenceIndex.open,
+            lambda viruses: ReferenceIndex.fromSequences(
+                list(viruses),
+                [virus["sequence"] for virus in viruses.values()],
+                self.k,
+                self.maxHammingDistance,
+            ),
+        )
+
+    # Output: virus dictionary (name and length of every virus) and FM-index of the viruses,
+    #         memory mapped from the cache or built from the reference files and cached
+    def loadFmIndex(self):
+        return self.loadEntry(
+            ["fm", FM_VERSION],
+            FmIndex.open,
+            lambda viruses: FmIndex.fromSequences(
+                list(viruses), [virus["sequence"] for virus in viruses.values()]
+            ),
+        )
+
+    # Input: minimizer length, window
+    # Output: minimizer index of the viruses for the prefilter of the search, memory mapped
+    #         from the cache or built from the reference files and cached
+    def loadMinimizerIndex(self, minimizerLength, window):
+        viruses, index = self.loadEntry(
+            ["minimizer", minimizerLength, window, MINIMIZER_VERSION],
+            MinimizerIndex.open,
+            lambda viruses: MinimizerIndex.fromSequences(
+                list(viruses),
+                [virus["sequence"] for virus in viruses.values()],
+                minimizerLength,
+                window,
+            ),
+        )
+        return index
+
+    # Input: index settings, function opening a saved index, function building the index
+    #        from the virus dictionary
+    # Output: virus dictionary and index
+    def loadEntry(self, settings, openIndex, buildIndex):
+        indexLocation, virusesLocation = self.entryLocations(settings)
+        self.hit = os.path.exists(indexLocation) and os.path.exists(virusesLocation)
+        if self.hit:
+            try:
+                with open(virusesLocation, "r") as file:
+                    viruses = json.load(file)
+                index = openIndex(indexLocation)
+            except ValueError as error:
+                # unreadable entry (e.g. written by another version): built again below
+                logging.info(f"\tIgnoring the cached reference index: {error}")
+                self.hit = False
+            else:
+                logging.info(f"\nReference Cache: ")
+                logging.info(
+                    f"\tLoaded the index of {len(viruses)} viruses from {indexLocation}"
+                )
+                return viruses, index
+
+        viruses = ImportVirus().importVirusData(fileLocations=self.fileLocations)
+        index = buildIndex(viruses)
+        self.removeStaleEntries(settings)
+        # written under a temporary name first, so an interrupted run leaves no partial entry
+        index.save(indexLocation + ".tmp")
+        self.saveViruses(viruses, virusesLocation + ".tmp")
+        os.replace(indexLocation + ".tmp", indexLocation)
+        os.replace(virusesLocation + ".tmp", virusesLocation)
+        logging.info(f"\nReference Cache: ")
+        logging.info(f"\tBuilt and cached the index of {len(viruses)} viruses in {indexLocation}")
+        return viruses, index
+
+    # Input: virus dictionary, file location
+    # Output: name and length of every virus written to the file (the sequences are not kept)
+    def saveViruses(self, viruses, fileLocation):
+        with open(fileLocation, "w") as file:
+            json.dump(
+                {
+                    accession: {"name": virus["name"], "length": virus["length"]}
+                    for accession, virus in viruses.items()
+                },
+                file,
+            )
+
+    # Input: index settings
+    # Output: entries of earlier versions of the same files and settings removed
+    def removeStaleEntries(self, settings):
+        for location in glob.glob(os.path.join(self.cacheDir, f"{self.panelKey(settings)}-*")):
+            os.remove(location)
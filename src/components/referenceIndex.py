@@ -0,0 +1,241 @@
+import mmap
+import struct
+from math import comb
+import numpy as np
+from components import kmerCodes
+from components.kmerIndex import paddingTo8, writeIndexSection
+from components.kmerMatcher import KmerMatcher
+from components.readStore import gatherRanges
+
+# Binary reference index file, laid out like the k-mer index file: a fixed header, the index
+# arrays (little endian, each section padded to 8 bytes so it can be viewed in place from a
+# memory map) and the newline-joined virus ids. The arrays include the derived code groups
+# and the sorted seed arrays of the matcher, so opening a file rebuilds nothing.
+# Header: magic, format version, k, most mismatches of a hit, number of matcher segments,
+#         number of viruses, entries, positions and distinct codes, size of the virus id section
+REFERENCE_MAGIC = b"VREFIDX\0"
+REFERENCE_VERSION = 1
+REFERENCE_HEADER = struct.Struct("<8sIIIIQQQQQ")
+REFERENCE_SECTIONS = [
+    ("entryCodes", "<u8", "numEntries"),
+    ("entryVirus", "<i8", "numEntries"),
+    ("positionIndptr", "<i8", "numIndptr"),
+    ("positions", "<i8", "numPositions"),
+    ("codes", "<u8", "numCodes"),
+    ("codeEntries", "<i8", "numEntries"),
+    ("codeIndptr", "<i8", "numCodeIndptr"),
+]
+# sorted masked codes and their order, once per matcher seed
+SEED_SECTIONS = [("<u8", "numCodes"), ("<i8", "numCodes")]
+
+
+class ReferenceIndex:
+    """
+    Combined k-mer index of a reference panel. Every distinct k-mer of every virus is an entry
+    (virus, rank of the k-mer in the virus's first-seen order); entries are grouped by k-mer
+    code, so a k-mer shared by several viruses is stored and matched once and its hits are
+    routed to each of them. Positions of every entry in its virus are kept in CSR layout.
+    """
+
+    def __init__(
+        self,
+        virusIds,
+        entryCodes,
+        entryVirus,
+        positionIndptr,
+        positions,
+        k,
+        maxHammingDistance=2,
+        codeGroups=None,
+        numSegments=None,
+        seedIndex=None,
+    ):
+        self.virusIds = list(virusIds)
+        self.k = k
+        self.maxHammingDistance = maxHammingDistance
+        # k-mer code and virus of every entry, entries of a virus together in rank order
+        self.entryCodes = np.asarray(entryCodes, dtype=np.uint64)
+        self.entryVirus = np.asarray(entryVirus, dtype=np.int64)
+        self.virusIndptr = np.searchsorted(
+            self.entryVirus, np.arange(len(self.virusIds) + 1)
+        )
+        self.entryRank = np.arange(len(self.entryCodes)) - self.virusIndptr[self.entryVirus]
+        # positions of entry e in its virus: positions[positionIndptr[e]:positionIndptr[e + 1]]
+        self.positionIndptr = np.asarray(positionIndptr, dtype=np.int64)
+        self.positions = np.asarray(positions, dtype=np.int64)
+
+        # distinct codes of the panel, entries of each code in codeEntries[codeIndptr[c]:codeIndptr[c + 1]]
+        # (given with the matcher's segments and seed arrays when the index was saved)
+        if codeGroups is None:
+            codes, codeOfEntry = np.unique(self.entryCodes, return_inverse=True)
+            codeOfEntry = codeOfEntry.ravel()
+            codeIndptr = np.zeros(len(codes) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(codeOfEntry, minlength=len(codes)), out=codeIndptr[1:])
+            codeGroups = (codes, np.argsort(codeOfEntry, kind="stable"), codeIndptr)
+        self.codes, self.codeEntries, self.codeIndptr = codeGroups
+        self.matcher = KmerMatcher(
+            self.codes, k, maxHammingDistance, numSegments=numSegments, seedIndex=seedIndex
+        )
+
+    # Input: virus ids and sequences, size of k, most mismatches of a hit
+    # Output: index of the k-mers of every sequence
+    @classmethod
+    def fromSequences(cls, virusIds, sequences, k, maxHammingDistance=2):
+        entryCodes, entryVirus, positionCounts, positions = [], [], [], []
+        for virus, sequence in enumerate(sequences):
+            codes, codePositions = kmerCodes.sequenceKmerCodes(sequence, k)
+            distinctCodes, distinctIndex = kmerCodes.firstSeenUnique(codes)
+            order = np.argsort(distinctIndex, kind="stable")
+            entryCodes.append(distinctCodes)
+            entryVirus.append(np.full(len(distinctCodes), virus, dtype=np.int64))
+            positionCounts.append(np.bincount(distinctIndex, minlength=len(distinctCodes)))
+            positions.append(codePositions[order])
+        return cls.fromArrays(
+            virusIds, entryCodes, entryVirus, positionCounts, positions, k, maxHammingDistance
+        )
+
+    # Input: virus ids, per virus: distinct k-mer codes (rank order), virus of each, number of
+    #        positions of each and the positions grouped by k-mer; size of k, most mismatches
+    # Output: index of the k-mers
+    @classmethod
+    def fromArrays(
+        cls, virusIds, entryCodes, entryVirus, positionCounts, positions, k, maxHammingDistance=2
+    ):
+        positionCounts = np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [np.asarray(counts) for counts in positionCounts]
+        )
+        positionIndptr = np.zeros(len(positionCounts) + 1, dtype=np.int64)
+        np.cumsum(positionCounts, out=positionIndptr[1:])
+        return cls(
+            virusIds,
+            np.concatenate([np.zeros(0, dtype=np.uint64)] + list(entryCodes)),
+            np.concatenate([np.zeros(0, dtype=np.int64)] + list(entryVirus)),
+            positionIndptr,
+            np.concatenate([np.zeros(0, dtype=np.int64)] + list(positions)),
+            k,
+            maxHammingDistance,
+        )
+
+    # Input: file location
+    # Output: index written to the file, to be opened with open
+    def save(self, fileLocation):
+        idBytes = "\n".join(self.virusIds).encode("utf-8")
+        with open(fileLocation, "wb") as file:
+            file.write(
+                REFERENCE_HEADER.pack(
+                    REFERENCE_MAGIC,
+                    REFERENCE_VERSION,
+                    self.k,
+                    self.maxHammingDistance,
+                    len(self.matcher.segments),
+                    len(self.virusIds),
+                    self.numEntries,
+                    len(self.positions),
+                    len(self.codes),
+                    len(idBytes),
+                )
+            )
+            for name, dtype, sizeKey in REFERENCE_SECTIONS:
+                writeIndexSection(file, getattr(self, name), dtype)
+            for seedArrays in self.matcher.seedIndex:
+                for array, (dtype, sizeKey) in zip(seedArrays, SEED_SECTIONS):
+                    writeIndexSection(file, array, dtype)
+            file.write(idBytes)
+
+    # Input: file location of an index written by save
+    # Output: ReferenceIndex whose arrays are views of a read-only memory map of the file
+    @classmethod
+    def open(cls, fileLocation):
+        with open(fileLocation, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) < REFERENCE_HEADER.size:
+            raise ValueError(f"{fileLocation} is not a reference index file")
+        (
+            magic,
+            version,
+            k,
+            maxHammingDistance,
+            numSegments,
+            numViruses,
+            numEntries,
+            numPositions,
+            numCodes,
+            idBytesLength,
+        ) = REFERENCE_HEADER.unpack_from(buffer)
+        if magic != REFERENCE_MAGIC:
+            raise ValueError(f"{fileLocation} is not a reference index file")
+        if version != REFERENCE_VERSION:
+            raise ValueError(
+                f"{fileLocation} has unsupported reference index version {version}"
+            )
+
+        sizes = {
+            "numEntries": numEntries,
+            "numIndptr": numEntries + 1,
+            "numPositions": numPositions,
+            "numCodes": numCodes,
+            "numCodeIndptr": numCodes + 1,
+        }
+        offset = REFERENCE_HEADER.size
+
+        def readSection(dtype, sizeKey):
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype=dtype, count=sizes[sizeKey], offset=offset)
+            offset += array.nbytes + paddingTo8(array.nbytes)
+            return array
+
+        arrays = {
+            name: readSection(dtype, sizeKey) for name, dtype, sizeKey in REFERENCE_SECTIONS
+        }
+        numSeeds = comb(numSegments, numSegments - maxHammingDistance)
+        seedIndex = [
+            tuple(readSection(dtype, sizeKey) for dtype, sizeKey in SEED_SECTIONS)
+            for _ in range(numSeeds)
+        ]
+        if offset + idBytesLength != len(buffer):
+            raise ValueError(f"{fileLocation} is a truncated reference index file")
+        idText = bytes(buffer[offset : offset + idBytesLength]).decode("utf-8")
+
+        index = cls(
+            idText.split("\n") if numViruses else [],
+            arrays["entryCodes"],
+            arrays["entryVirus"],
+            arrays["positionIndptr"],
+            arrays["positions"],
+            k,
+            maxHammingDistance,
+            codeGroups=(arrays["codes"], arrays["codeEntries"], arrays["codeIndptr"]),
+            numSegments=numSegments,
+            seedIndex=seedIndex,
+        )
+        index.buffer = buffer
+        return index
+
+    @property
+    def numEntries(self):
+        return len(self.entryCodes)
+
+    # Input: entry ids
+    # Output: k-mer strings of the entries
+    def kmers(self, entries):
+        return kmerCodes.decodeKmers(self.entryCodes[entries], self.k)
+
+    # Input: entry id
+    # Output: positions of the entry's k-mer in its virus
+    def entryPositions(self, entry):
+        return self.positions[self.positionIndptr[entry] : self.positionIndptr[entry + 1]]
+
+    # Input: query codes
+    # Output: query index, entry and Hamming distance of every entry within maxHammingDistance
+    #         of a query k-mer
+    def matches(self, queryCodes):
+        queryIndex, codeIndex, distance = self.matcher.matches(queryCodes)
+        entryCounts = self.codeIndptr[codeIndex + 1] - self.codeIndptr[codeIndex]
+        entries = self.codeEntries[
+            gatherRanges(self.codeIndptr[codeIndex], self.codeIndptr[codeIndex + 1])
+        ]
+        return (
+            np.repeat(queryIndex, entryCounts),
+            entries,
+            np.repeat(distance, entryCounts),
+        )
@@ -2,7 +2,15 @@ import json
 import os
 import logging
 import time
-from components import utils
+import numpy as np
+from components import kmerCodes
+from components.fmIndex import FmIndex, sequenceToSymbols
+from components.kmerIndex import KmerIndex
+from components.minimizerIndex import MinimizerIndex
+from components.referenceIndex import ReferenceIndex
+from components.readStore import ReadStore, gatherRanges
+
+SEARCH_MODES = ("kmer", "fm")
 
 logDir = "data/logs"
 os.makedirs(logDir, exist_ok=True)
@@ -19,28 +27,88 @@ search_logger.addHandler(search_handler)
 
 
 class SearchString:
-    def __init__(self, viruses, readsKmerPoolFile, contigs, k):
+    def __init__(
+        self,
+        viruses,
+        readsKmerIndexFile,
+        contigs,
+        k,
+        maxHammingDistance=2,
+        referenceIndex=None,
+        searchMode="kmer",
+        minMemLength=None,
+        maxOccurrences=500,
+        minSharedMinimizers=0,
+        minimizerIndex=None,
+    ):
         self.viruses = viruses
+        # "kmer": contig k-mers matched with mismatches against a ReferenceIndex, "fm": maximal
+        # exact matches of the contigs found in an FmIndex
+        if searchMode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {searchMode}, expected one of {SEARCH_MODES}")
+        self.searchMode = searchMode
+        # index of the viruses for the search mode (e.g. from a ReferenceCache), built from
+        # the virus sequences when not given
+        self.referenceIndex = referenceIndex
+        # contigs can be a list of sequences, a ReadStore (decoded one contig at a time) or a
+        # ContigFile (read from disk one contig at a time)
         self.contigs = contigs
-        with open(readsKmerPoolFile, "r") as file:
-            readsKmerPool = json.load(file)
-        self.readsKmerPool = readsKmerPool
+        # the reads k-mer index is only opened when it is first used
+        self.readsKmerIndexFile = readsKmerIndexFile
+        self._readsKmerIndex = None
         self.k = k
-        self.maxHammingDistance = 2
+        # contig k-mers with at most this many mismatches to a virus k-mer are hits
+        self.maxHammingDistance = maxHammingDistance
+        # contig k-mers matched against the virus k-mers at once
+        self.batchKmers = 1 << 16
+        # fm mode: shortest maximal exact match reported (k by default), and most occurrences
+        # of one seed located in the viruses
+        self.minMemLength = k if minMemLength is None else minMemLength
+        self.maxOccurrences = maxOccurrences
+        # fm mode: contig seeds with more occurrences than maxOccurrences
+        self.truncatedMatches = 0
+        # minimizer prefilter: a (contig, virus) pair is only searched when the contig shares
+        # at least this many minimizers with the virus (0: every pair is searched). The
+        # MinimizerIndex of the viruses is built with minimizerLength (k by default) and
+        # minimizerWindow when not given.
+        self.minSharedMinimizers = minSharedMinimizers
+        self.minimizerIndex = minimizerIndex
+        self.minimizerLength = k
+        self.minimizerWindow = 5
+        # prefilter counts of the last scan: skipped pairs of every virus, contigs searched
+        # against no virus, seconds spent on the sketches
+        self.skippedPairs = np.zeros(0, dtype=np.int64)
+        self.skippedContigs = 0
+        self.prefilterTime = 0.0
+        self.numContigs = 0
+
+    # Output: reads k-mer index (memory mapped KmerIndex, or a k-mer pool from a legacy .json file)
+    @property
+    def readsKmerIndex(self):
+        if self._readsKmerIndex is None:
+            if self.readsKmerIndexFile.endswith(".json"):
+                with open(self.readsKmerIndexFile, "r") as file:
+                    self._readsKmerIndex = json.load(file)
+            else:
+                self._readsKmerIndex = KmerIndex.open(self.readsKmerIndexFile)
+        return self._readsKmerIndex
 
     # Input: virus sequence
     # Output: virus kmer pool
     def virusToKmers(self, sequence):
-        kmerPool = {}
+        codes, positions = kmerCodes.sequenceKmerCodes(sequence, self.k)
+        distinctCodes, distinctIndex = kmerCodes.firstSeenUnique(codes)
 
-        # TODO: refactor to substitute with utils.toKmers()
-        for index in range(len(sequence) - self.k + 1):
-            kmer = sequence[index : index + self.k]
-            if kmer not in kmerPool:
-                kmerPool[kmer] = [index]
-            else:
-                kmerPool[kmer].append(index)
-        return kmerPool
+        # group the positions of each distinct k-mer, keeping first-seen order
+        order = np.argsort(distinctIndex, kind="stable")
+        groupStarts = np.searchsorted(distinctIndex[order], np.arange(len(distinctCodes)))
+        groupedPositions = np.split(positions[order], groupStarts[1:])
+
+        kmers = kmerCodes.decodeKmers(distinctCodes, self.k)
+        return {
+            kmer: kmerPositions.tolist()
+            for kmer, kmerPositions in zip(kmers, groupedPositions)
+        }
 
     # Input: virus kmerpool
     def kmerPoolsToFile(self, virusKmerPool):
@@ -56,73 +124,328 @@ class SearchString:
                 distance += 1
         return distance
 
-    # Input: virus k-mer pool and virus object
+    # Input: k-mer strings
+    # Output: k-mer codes
+    def kmersToCodes(self, kmers):
+        codes = kmerCodes.sequenceToCodes("".join(kmers))
+        return kmerCodes.kmerCodes(
+            codes, np.arange(len(kmers)) * self.k, np.full(len(kmers), self.k), self.k
+        )[0]
+
+    # Input: contigs, id of the first contig, reference index
+    # Output: contig info of each contig for every virus of the index. Every contig k-mer
+    #         within maxHammingDistance of a virus k-mer is a hit for that virus, listed by
+    #         virus k-mer, then by position in the contig. The contig k-mers are looked up once
+    #         for all viruses. When searched (virus x contig) is given, only the pairs it marks
+    #         are searched; the other pairs have no hits.
+    def matchContigs(self, contigs, firstId, referenceIndex, searched=None):
+        # contigs no virus is searched with are left out
+        searchedContigs = (
+            np.ones(len(contigs), dtype=bool) if searched is None else searched.any(axis=0)
+        )
+        codeChunks, positionChunks = zip(
+            *(
+                kmerCodes.sequenceKmerCodes(contig if searchContig else "", self.k)
+                for contig, searchContig in zip(contigs, searchedContigs.tolist())
+            )
+        )
+        codes = np.concatenate(codeChunks)
+        positions = np.concatenate(positionChunks)
+        contigOf = np.repeat(
+            np.arange(len(contigs)), [len(chunk) for chunk in codeChunks]
+        )
+
+        # each distinct contig k-mer is looked up once
+        uniqueCodes, inverse = np.unique(codes, return_inverse=True)
+        inverse = inverse.ravel()
+        queryIndex, entry, distance = referenceIndex.matches(uniqueCodes)
+        occurrences = np.argsort(inverse, kind="stable")
+        occurrenceStarts = np.searchsorted(inverse[occurrences], np.arange(len(uniqueCodes)))
+        occurrenceStops = np.append(occurrenceStarts[1:], len(occurrences))
+        hitCounts = occurrenceStops[queryIndex] - occurrenceStarts[queryIndex]
+        hitOccurrence = occurrences[
+            gatherRanges(occurrenceStarts[queryIndex], occurrenceStops[queryIndex])
+        ]
+        hitEntry = np.repeat(entry, hitCounts)
+        hitDistance = np.repeat(distance, hitCounts)
+        hitVirus = referenceIndex.entryVirus[hitEntry]
+        hitContig = contigOf[hitOccurrence]
+        if searched is not None:
+            keep = searched[hitVirus, hitContig]
+            hitOccurrence, hitEntry, hitDistance = (
+                hitOccurrence[keep],
+                hitEntry[keep],
+                hitDistance[keep],
+            )
+            hitVirus, hitContig = hitVirus[keep], hitContig[keep]
+        order = np.lexsort(
+            (hitOccurrence, referenceIndex.entryRank[hitEntry], hitContig, hitVirus)
+        )
+        hitOccurrence, hitEntry, hitDistance = (
+            hitOccurrence[order],
+            hitEntry[order],
+            hitDistance[order],
+        )
+
+        # a hit is reported at the first position of its k-mer in the contig
+        occurrenceKeys = contigOf * len(uniqueCodes) + inverse
+        firstKeys, firstOccurrence = np.unique(occurrenceKeys, return_index=True)
+        hitPosition = positions[
+            firstOccurrence[np.searchsorted(firstKeys, occurrenceKeys[hitOccurrence])]
+        ]
+        # virus k-mer strings, decoded once per batch
+        hitEntries, hitKmer = np.unique(hitEntry, return_inverse=True)
+        entryKmers = referenceIndex.kmers(hitEntries)
+        # hits of virus v and contig c: groupStarts[v * len(contigs) + c] onwards
+        groupStarts = np.searchsorted(
+            hitVirus[order] * len(contigs) + hitContig[order],
+            np.arange(len(referenceIndex.virusIds) * len(contigs) + 1),
+        ).tolist()
+        hitKmer = hitKmer.ravel().tolist()
+        hitPosition = hitPosition.tolist()
+        hitDistance = hitDistance.tolist()
+
+        virusContigsInfo = []
+        for virus in range(len(referenceIndex.virusIds)):
+            contigsInfo = []
+            for index, contig in enumerate(contigs):
+                start = groupStarts[virus * len(contigs) + index]
+                stop = groupStarts[virus * len(contigs) + index + 1]
+                contigInfo = {
+                    "contigId": firstId + index,
+                    "contig": contig,
+                    "length": len(contig),
+                    "v-kmers": [
+                        {
+                            entryKmers[hitKmer[hit]]: {
+                                "indexOfVKmerInContig": [
+                                    hitPosition[hit],
+                                    hitPosition[hit] + self.k,
+                                ],
+                                "hammingDistance": hitDistance[hit],
+                                "kmerLength": self.k,
+                            }
+                        }
+                        for hit in range(start, stop)
+                    ],
+                }
+                contigInfo["kmerCount"] = stop - start
+                contigsInfo.append(contigInfo)
+            virusContigsInfo.append(contigsInfo)
+        return virusContigsInfo
+
+    # Input: contigs, id of the first contig, FM-index of the viruses
+    # Output: contig info of each contig for every virus of the index. Every maximal exact
+    #         match of a contig and a virus of at least minMemLength bases is a hit, listed by
+    #         position in the contig, then by position in the virus (kmerCount is the number
+    #         of hits). Seeds occurring more than maxOccurrences times are only located that
+    #         many times. searched (virus x contig) restricts the search as in matchContigs.
+    def memContigs(self, contigs, firstId, fmIndex, searched=None):
+        # contigs joined by a non-ACGT base, so no match spans two contigs; contigs no virus
+        # is searched with are left out
+        if searched is not None:
+            query = [
+                contig if searchContig else ""
+                for contig, searchContig in zip(contigs, searched.any(axis=0).tolist())
+            ]
+        else:
+            query = contigs
+        contigStarts = np.cumsum([0] + [len(contig) + 1 for contig in query])
+        queryStarts, hitLength, hitVirus, hitVirusPosition, truncated = (
+            fmIndex.maximalMatches(
+                sequenceToSymbols("N".join(query)), self.minMemLength, self.maxOccurrences
+            )
+        )
+        self.truncatedMatches += truncated
+        hitContig = np.searchsorted(contigStarts, queryStarts, "right") - 1
+        hitStart = queryStarts - contigStarts[hitContig]
+        if searched is not None:
+            keep = searched[hitVirus, hitContig]
+            hitContig, hitStart, hitLength = hitContig[keep], hitStart[keep], hitLength[keep]
+            hitVirus, hitVirusPosition = hitVirus[keep], hitVirusPosition[keep]
+        # stable: hits stay ordered by contig position, then virus position
+        order = np.lexsort((hitContig, hitVirus))
+        # hits of virus v and contig c: groupStarts[v * len(contigs) + c] onwards
+        groupStarts = np.searchsorted(
+            hitVirus[order] * len(contigs) + hitContig[order],
+            np.arange(len(fmIndex.virusIds) * len(contigs) + 1),
+        ).tolist()
+        hitStart = hitStart[order].tolist()
+        hitLength = hitLength[order].tolist()
+        hitVirusPosition = hitVirusPosition[order].tolist()
+
+        virusContigsInfo = []
+        for virus in range(len(fmIndex.virusIds)):
+            contigsInfo = []
+            for index, contig in enumerate(contigs):
+                start = groupStarts[virus * len(contigs) + index]
+                stop = groupStarts[virus * len(contigs) + index + 1]
+                contigInfo = {
+                    "contigId": firstId + index,
+                    "contig": contig,
+                    "length": len(contig),
+                    "mems": [
+                        {
+                            "indexOfMemInContig": [hitStart[hit], hitStart[hit] + hitLength[hit]],
+                            "indexOfMemInVirus": [
+                                hitVirusPosition[hit],
+                                hitVirusPosition[hit] + hitLength[hit],
+                            ],
+                            "memLength": hitLength[hit],
+                        }
+                        for hit in range(start, stop)
+                    ],
+                }
+                contigInfo["kmerCount"] = stop - start
+                contigsInfo.append(contigInfo)
+            virusContigsInfo.append(contigsInfo)
+        return virusContigsInfo
+
+    # Input: contigs, id of the first contig, reference index, contig search method
+    # Output: contig info of each contig for every virus of the index. With the minimizer
+    #         prefilter, a contig is only searched against the viruses it shares at least
+    #         minSharedMinimizers minimizers with; the skipped pairs are counted.
+    def searchBatch(self, contigs, firstId, referenceIndex, matchContigs):
+        if self.minimizerIndex is None or self.minSharedMinimizers <= 0:
+            return matchContigs(contigs, firstId, referenceIndex)
+        prefilterStart = time.time()
+        contig, virus, shared, _ = self.minimizerIndex.sharedMinimizers(contigs)
+        passing = shared >= self.minSharedMinimizers
+        searched = np.zeros((len(referenceIndex.virusIds), len(contigs)), dtype=bool)
+        searched[virus[passing], contig[passing]] = True
+        self.prefilterTime += time.time() - prefilterStart
+        self.skippedPairs += len(contigs) - searched.sum(axis=1)
+        self.skippedContigs += int(np.count_nonzero(~searched.any(axis=0)))
+        return matchContigs(contigs, firstId, referenceIndex, searched)
+
+    # Input: reference index (an FmIndex in fm mode)
+    # Output: contig info of every contig for each virus of the index. Contigs are read once
+    #         and streamed through the index in batches of about batchKmers k-mers.
+    def scanContigs(self, referenceIndex):
+        if isinstance(referenceIndex, FmIndex):
+            matchContigs = self.memContigs
+        else:
+            matchContigs = self.matchContigs
+        if self.minimizerIndex is not None and (
+            self.minimizerIndex.virusIds != referenceIndex.virusIds
+        ):
+            raise ValueError("The minimizer index and the reference index have different viruses")
+        virusContigsInfo = [[] for _ in referenceIndex.virusIds]
+        self.skippedPairs = np.zeros(len(referenceIndex.virusIds), dtype=np.int64)
+        self.skippedContigs = 0
+        self.prefilterTime = 0.0
+        contigs = self.contigs
+        if isinstance(contigs, ReadStore):
+            contigs = contigs.sequences()
+
+        batch = []
+        batchKmers = 0
+        numContigs = 0
+        for contig in contigs:
+            batch.append(contig)
+            batchKmers += max(len(contig) - self.k + 1, 0)
+            if batchKmers >= self.batchKmers:
+                for contigsInfo, batchInfo in zip(
+                    virusContigsInfo,
+                    self.searchBatch(batch, numContigs + 1, referenceIndex, matchContigs),
+                ):
+                    contigsInfo.extend(batchInfo)
+                numContigs += len(batch)
+                batch = []
+                batchKmers = 0
+        if batch:
+            for contigsInfo, batchInfo in zip(
+                virusContigsInfo,
+                self.searchBatch(batch, numContigs + 1, referenceIndex, matchContigs),
+            ):
+                contigsInfo.extend(batchInfo)
+            numContigs += len(batch)
+        self.numContigs = numContigs
+        return virusContigsInfo
+
+    # Input: virus k-mer pool
     # Output: Contigs info object contain information about each contig k-mer that aligned (or didn't align) with each virus
     def createContigsInfo(self, virusKmerPool):
-        contigsInfo = []
-        for id, contig in enumerate(self.contigs):
-            contigLen = len(contig)
-            contigKmers = utils.toKmers(self.k, contig)
-
-            kmerCount = 0
-            contigInfo = {
-                "contigId": id + 1,
-                "contig": contig,
-                "length": contigLen,
-                "v-kmers": [],
-            }
-
-            for virusKmer in virusKmerPool:
-                for contigKmer in contigKmers:
-                    distance = self.hammingDistance(virusKmer, contigKmer)
-                    if distance <= self.maxHammingDistance:
-                        kmerCount += 1
-                        contigInfo["v-kmers"].append(
-                            {
-                                virusKmer: {
-                                    "indexOfVKmerInContig": [
-                                        contig.index(contigKmer),
-                                        contig.index(contigKmer) + self.k,
-                                    ],
-                                    "hammingDistance": distance,
-                                    "kmerLength": len(contigKmer),
-                                }
-                            }
-                        )
-            contigInfo["kmerCount"] = kmerCount
-            contigsInfo.append(contigInfo)
-        return contigsInfo
+        virusKmers = list(virusKmerPool)
+        referenceIndex = ReferenceIndex.fromArrays(
+            [0],
+            [self.kmersToCodes(virusKmers)],
+            [np.zeros(len(virusKmers), dtype=np.int64)],
+            [[len(positions) for positions in virusKmerPool.values()]],
+            [[position for positions in virusKmerPool.values() for position in positions]],
+            self.k,
+            self.maxHammingDistance,
+        )
+        return self.scanContigs(referenceIndex)[0]
 
     # Input: virus and contig objects
     # Output: information about the contigs that aligned (or didn't align) with each virus
     def searchString(self):
         logging.info("\nSearch For Viruses:\n")
         virusesInBiosample = []
-        # break all viruses into kmers
+        # index all viruses together
         logging.info(f"\tSearch String Logging\n")
         breakKmersStart = time.time()
-        virusKmerPools = {
-            virus_id: self.virusToKmers(virus["sequence"])
-            for virus_id, virus in self.viruses.items()
-        }
+        referenceIndex = self.referenceIndex
+        if referenceIndex is None and self.searchMode == "fm":
+            referenceIndex = FmIndex.fromSequences(
+                list(self.viruses),
+                [virus["sequence"] for virus in self.viruses.values()],
+            )
+        elif referenceIndex is None:
+            referenceIndex = ReferenceIndex.fromSequences(
+                list(self.viruses),
+                [virus["sequence"] for virus in self.viruses.values()],
+                self.k,
+                self.maxHammingDistance,
+            )
         breakKmersEnd = time.time()
-        logging.info(
-            f"\n\tVirus To Kmers: {breakKmersEnd-breakKmersStart}.\n\t\t*Note: This creates kmer pools for all viruses before creating the contigs for each individual virus."
-        )
+        if self.searchMode == "fm":
+            logging.info(
+                f"\n\tVirus FM-Index: {breakKmersEnd-breakKmersStart}.\n\t\t*Note: This indexes all viruses ({referenceIndex.textLength} bases, {referenceIndex.nbytes} bytes) before the contigs are searched for maximal exact matches of at least {self.minMemLength} bases."
+            )
+        else:
+            logging.info(
+                f"\n\tVirus To Kmers: {breakKmersEnd-breakKmersStart}.\n\t\t*Note: This indexes the k-mers of all viruses ({referenceIndex.numEntries} virus k-mers, {len(referenceIndex.codes)} distinct) before the contigs are scanned."
+            )
+
+        if self.minSharedMinimizers > 0 and self.minimizerIndex is None:
+            minimizerStart = time.time()
+            self.minimizerIndex = MinimizerIndex.fromSequences(
+                list(self.viruses),
+                [virus["sequence"] for virus in self.viruses.values()],
+                self.minimizerLength,
+                self.minimizerWindow,
+            )
+            logging.info(
+                f"\n\tVirus Minimizer Sketches: {time.time()-minimizerStart}.\n\t\t*Note: This sketches all viruses ({len(self.minimizerIndex.hashes)} minimizers) for the prefilter."
+            )
+        if self.minSharedMinimizers <= 0:
+            self.minimizerIndex = None
+
+        # scan the contigs once, hits are routed to every virus
+        createContigsStart = time.time()
+        virusContigsInfo = self.scanContigs(referenceIndex)
+        createContigsEnd = time.time()
+        logging.info(f"\n\tCreate Contigs: {createContigsEnd-createContigsStart}")
+        if self.truncatedMatches:
+            logging.info(
+                f"\t\t{self.truncatedMatches} contig seeds occur more than {self.maxOccurrences} times in the viruses, only {self.maxOccurrences} of their occurrences are reported"
+            )
+        if self.minimizerIndex is not None:
+            numPairs = self.numContigs * len(referenceIndex.virusIds)
+            logging.info(
+                f"\t\tMinimizer prefilter ({self.minSharedMinimizers} shared minimizers, k={self.minimizerIndex.minimizerLength}, w={self.minimizerIndex.window}): skipped {int(self.skippedPairs.sum())} of {numPairs} (contig, virus) pairs ({100 * self.skippedPairs.sum() / max(numPairs, 1):.1f}%), {self.skippedContigs} of {self.numContigs} contigs entirely, in {self.prefilterTime}"
+            )
 
-        for virusId, virus in self.viruses.items():
+        for virusIndex, (virus, contigsInfo) in enumerate(
+            zip(self.viruses.values(), virusContigsInfo)
+        ):
             vStart = time.time()
             contigsExistInVirus = []
             contigsTested = []
-            virusKmerPool = virusKmerPools[virusId]
             logging.info(f"\t{virus['name']}:\n")
 
-            createContigsStart = time.time()
-            contigsInfo = self.createContigsInfo(virusKmerPool)
-
-            createContigsEnd = time.time()
-            logging.info(f"\n\tCreate Contigs: {createContigsEnd-createContigsStart}")
-
             for contig in contigsInfo:
                 if contig["kmerCount"] > 0:
                     contigsExistInVirus.append(contig)
@@ -143,13 +466,18 @@ class SearchString:
                 f"\t\t{len(contigsExistInVirus)} contigs align with {virus['name']} "
             )
             logging.info(f"\t\tVirus {virus['name']} split time: {vStop-vStart}")
+            if self.minimizerIndex is not None:
+                logging.info(
+                    f"\t\tPrefilter skipped {self.skippedPairs[virusIndex]} of {self.numContigs} contigs ({100 * self.skippedPairs[virusIndex] / max(self.numContigs, 1):.1f}%)"
+                )
             logging.info(
-                f"\t\tVirus: {virus['name']} length: {len(virus['sequence'])}bp"
+                f"\t\tVirus: {virus['name']} length: {virus['length']}bp"
             )
             if len(contigsExistInVirus) > 0:
                 with open(f"data/logs/{virus['name']}contigsInVirus.json", "w") as file:
-                    contigsExistInVirus[0] = virus["name"]
-                    json.dump(contigsExistInVirus, file)
+                    # the log starts with the virus name in place of the first contig; the
+                    # contigs returned in virusesInBiosample are left untouched
+                    json.dump([virus["name"], *contigsExistInVirus[1:]], file)
 
         with open("data/output_data/virusesInBiosample.json", "w") as file:
             json.dump(virusesInBiosample, file)
@@ -0,0 +1,163 @@
+import os
+import time
+import marshal
+import shutil
+import logging
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from components.qc import QualityControl
+from components.readsToKmers import ReadsToKmers
+from components.readStore import ReadStore
+
+
+# Input: shard index, biosample batch, size of k, directory for spill files
+# Output: shard summary (spill file locations, trimmed read lengths, timings). Runs in a worker process.
+def processShard(shardIndex, batch, k, shardDir):
+    shardStart = time.time()
+    qualityControlInstance = QualityControl(biosample=batch, asReadStore=True)
+    batchReport, cleanedStore, trimmedLengths = qualityControlInstance.cleanBatch(batch)
+    qcStop = time.time()
+
+    codes, readIndex, positions = ReadsToKmers(
+        readsData=cleanedStore, k=k
+    ).extractKmerCodes()
+    kmerStop = time.time()
+
+    # spill the shard's tables to disk instead of returning them through the pool
+    kmerCodesFile = os.path.join(shardDir, f"shard_{shardIndex}.kmers.npz")
+    np.savez(kmerCodesFile, codes=codes, readIndex=readIndex, positions=positions)
+    reportFile = os.path.join(shardDir, f"shard_{shardIndex}.qc")
+    with open(reportFile, "wb") as file:
+        marshal.dump(batchReport, file)
+    storeFile = os.path.join(shardDir, f"shard_{shardIndex}.npz")
+    cleanedStore.save(storeFile)
+
+    return {
+        "shard": shardIndex,
+        "pid": os.getpid(),
+        "reads": len(batch),
+        "cleanedReads": len(cleanedStore),
+        "kmers": len(codes),
+        "trimmedLengths": trimmedLengths,
+        "kmerCodesFile": kmerCodesFile,
+        "reportFile": reportFile,
+        "storeFile": storeFile,
+        "qcTime": qcStop - shardStart,
+        "kmerTime": kmerStop - qcStop,
+        "writeTime": time.time() - kmerStop,
+    }
+
+
+class ShardedReadsToKmers:
+    def __init__(self, batches, k, workers, shardDir="./data/logs/shards"):
+        self.batches = batches
+        self.k = k
+        self.workers = workers
+        self.shardDir = shardDir
+        self.workerTimings = {}
+
+    # Input: shard summary returned by a worker, merged tables
+    # Output: shard tables merged into the k-mer occurrences and quality control report
+    def mergeShard(self, shard, kmerOccurrences, qualityControlReport, cleanedStores):
+        # shards are merged in input order, so k-mers and reads keep the single-process order
+        readOffset = sum(len(store) for store in cleanedStores)
+        with np.load(shard["kmerCodesFile"]) as arrays:
+            kmerOccurrences.append(
+                (arrays["codes"], arrays["readIndex"] + readOffset, arrays["positions"])
+            )
+        with open(shard["reportFile"], "rb") as file:
+            qualityControlReport.update(marshal.load(file))
+        cleanedStores.append(ReadStore.load(shard["storeFile"]))
+
+        timings = self.workerTimings.setdefault(
+            shard["pid"],
+            {"shards": 0, "reads": 0, "qcTime": 0.0, "kmerTime": 0.0, "writeTime": 0.0},
+        )
+        timings["shards"] += 1
+        timings["reads"] += shard["reads"]
+        for key in ["qcTime", "kmerTime", "writeTime"]:
+            timings[key] += shard[key]
+
+    # Input: stream of biosample batches
+    # Output: cleaned reads, k-mer codes/read index/positions, minimum read length, quality control report and metadata
+    #         (same as QualityControl + ReadsToKmers.extractKmerCodes)
+    def extractKmerCodes(self):
+        os.makedirs(self.shardDir, exist_ok=True)
+        kmerOccurrences = []
+        qualityControlReport = {}
+        cleanedStores = []
+        sequenceLengths = []
+        lengthOriginalBiosample = 0
+        lengthCleanedBiosample = 0
+
+        pending = {}
+        finished = {}
+        nextShard = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            shardIndex = 0
+            batches = iter(self.batches)
+            while True:
+                # keep a bounded number of batches in flight
+                while len(pending) < 2 * self.workers:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    future = executor.submit(
+                        processShard, shardIndex, batch, self.k, self.shardDir
+                    )
+                    pending[future] = shardIndex
+                    shardIndex += 1
+                if not pending:
+                    break
+
+                done, notDone = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard = future.result()
+                    del pending[future]
+                    finished[shard["shard"]] = shard
+
+                while nextShard in finished:
+                    shard = finished.pop(nextShard)
+                    self.mergeShard(
+                        shard, kmerOccurrences, qualityControlReport, cleanedStores
+                    )
+                    lengthOriginalBiosample += shard["reads"]
+                    lengthCleanedBiosample += shard["cleanedReads"]
+                    sequenceLengths.append(shard["trimmedLengths"])
+                    nextShard += 1
+
+        shutil.rmtree(self.shardDir, ignore_errors=True)
+
+        qualityControlInstance = QualityControl(biosample=None, asReadStore=True)
+        qualityControlInstance.writeReport(qualityControlReport)
+        cleanedStore = ReadStore.concatenate(cleanedStores)
+        cleanedStore.save(
+            os.path.join(qualityControlInstance.outputDataDir, "CleanedBioSample.npz")
+        )
+        codes, readIndex, positions = (
+            np.concatenate(arrays) for arrays in zip(*kmerOccurrences)
+        )
+        qcMetaData = qualityControlInstance.qualityControlMetadata(
+            np.concatenate(sequenceLengths),
+            lengthOriginalBiosample,
+            lengthCleanedBiosample,
+        )
+
+        logging.info(f"\nSharded Quality Control and Reads to Kmers: ")
+        logging.info(f"\tWorkers: {self.workers}, shards: {nextShard}")
+        for pid, timings in self.workerTimings.items():
+            logging.info(
+                f"\tWorker {pid}: {timings['shards']} shards, {timings['reads']} reads, "
+                f"qc {timings['qcTime']:.3f}s, kmers {timings['kmerTime']:.3f}s, "
+                f"spill {timings['writeTime']:.3f}s"
+            )
+
+        return (
+            cleanedStore,
+            (codes, readIndex, positions),
+            qcMetaData["minimumReadLength"],
+            qualityControlReport,
+            qcMetaData,
+        )
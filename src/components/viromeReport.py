@@ -7,6 +7,7 @@ import json
 import math
 import warnings
 from components import utils
+from components.contigFile import ContigFile
 
 # ignoring deprecated feature in seaborn
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -20,8 +21,15 @@ class ViromeReport:
         biosampleFile,
         biosampleFileLocation,
         qcMetadata,
+        contigCoverage=None,
     ):
+        # contigs: list of sequences, or a ContigFile read lazily
         self.contigs = contigs
+        # mean k-mer coverage of each contig (from CreateContigs, or the contig file headers),
+        # used for coverage-based abundance
+        if contigCoverage is None and isinstance(contigs, ContigFile):
+            contigCoverage = contigs.coverage()
+        self.contigCoverage = contigCoverage
         self.virusesInBiosample = virusesInBiosample  # contains the viruses tested against the biosample (i.e. 4 for bat) ... can access contigsInVirus
         self.biosampleFile = biosampleFile
         self.biosampleFileLocation = biosampleFileLocation
@@ -43,12 +51,24 @@ class ViromeReport:
             return numReads
 
     # Input: viruses, biosample contigs
-    # Output: virusAbundance dictionary,(# of contigs that match parts of virus)/total # of contigs
+    # Output: virusAbundance dictionary,(# of contigs that match parts of virus)/total # of contigs.
+    #         With contig coverage, also the share of the sample's covered bases (length * coverage)
+    #         in contigs that match the virus, and their mean coverage.
     def virusAbundance(self):
         virusAbundance = {}
         contigs = self.contigs
         totalNumContigs = len(contigs)
         virusesInBiosample = self.virusesInBiosample
+        contigCoverage = self.contigCoverage
+        if contigCoverage is not None:
+            if isinstance(contigs, ContigFile):
+                contigLengths = contigs.lengths()
+            else:
+                contigLengths = [len(contig) for contig in contigs]
+            totalCoveredBases = sum(
+                length * coverage
+                for length, coverage in zip(contigLengths, contigCoverage)
+            )
         for virus in virusesInBiosample:
             vName = virus["virus"]
             numContigs = virus["numContigsInVirus"]
@@ -58,6 +78,23 @@ class ViromeReport:
                 "abundance": vProportion * 100,
                 "numContigsInVirus": numContigs,
             }
+            if contigCoverage is not None:
+                contigIndices = [
+                    contig["contigId"] - 1 for contig in virus["contigsInVirus"]
+                ]
+                virusBases = sum(contigLengths[index] for index in contigIndices)
+                virusCoveredBases = sum(
+                    contigLengths[index] * contigCoverage[index]
+                    for index in contigIndices
+                )
+                virusAbundance[vName]["coverageAbundance"] = (
+                    virusCoveredBases / totalCoveredBases * 100
+                    if totalCoveredBases
+                    else 0.0
+                )
+                virusAbundance[vName]["meanCoverage"] = (
+                    virusCoveredBases / virusBases if virusBases else 0.0
+                )
         return virusAbundance
 
     # Input: biosample dataframe (containing qc data), biosample name, pdf file name (for output)
@@ -84,18 +121,32 @@ class ViromeReport:
         virusDf.set_index("virusName", inplace=True)
         virusDf["Relative Viral Abundance"] = np.nan
         virusDf["# Biosample Contigs in Virus"] = np.nan
+        if self.contigCoverage is not None:
+            virusDf["Coverage-weighted Viral Abundance"] = np.nan
+            virusDf["Mean Contig Coverage"] = np.nan
         for virus, abundance in self.virusAbundance().items():
             if virus in virusDf.index:
                 virusDf.loc[virus, "# Biosample Contigs in Virus"] = abundance[
                     "numContigsInVirus"
                 ]
                 virusDf.loc[virus, "Relative Viral Abundance"] = abundance["abundance"]
+                if self.contigCoverage is not None:
+                    virusDf.loc[virus, "Coverage-weighted Viral Abundance"] = abundance[
+                        "coverageAbundance"
+                    ]
+                    virusDf.loc[virus, "Mean Contig Coverage"] = abundance[
+                        "meanCoverage"
+                    ]
 
     # Input: constructor variables
     # Output: report files
     def generateReport(self):
         reportFile = "virome_report.txt"
-        biosampleFileName = self.biosampleFile.replace(".fastq", "")
+        biosampleFileName = (
+            os.path.basename(self.biosampleFile)
+            .replace(".gz", "")
+            .replace(".fastq", "")
+        )
         # QC metadata
         lengthOriginalBiosample = self.qcMetadata["lengthOriginalBiosample"]
         lengthCleanedBiosample = self.qcMetadata["lengthCleanedBiosample"]
@@ -8,16 +8,20 @@ import time
 import os
 import sys
 import cProfile
-import json
 
+from components import kmerCodes
 from components.importBioSample import ImportBioSample
-from components.importVirus import ImportVirus
 from components.qc import QualityControl
 
 from components.readsToKmers import ReadsToKmers
+from components.kmerSizeSelector import KmerSizeSelector
+from components.shardedReadsToKmers import ShardedReadsToKmers
+from components.partitionedKmerCounter import PartitionedKmerCounter
 from components.deBruijnGraph import DeBruijnGraph
-from components.createContigs import CreateContigs
-from components.searchForViruses import SearchString
+from components.graphSimplifier import GraphSimplifier
+from components.createContigs import CONTIG_MODES, CreateContigs
+from components.referenceCache import ReferenceCache
+from components.searchForViruses import SEARCH_MODES, SearchString
 
 from components.viromeReport import ViromeReport
 
@@ -40,6 +44,26 @@ logger.setLevel(logging.INFO)
 logger.addHandler(handler)
 
 
+# Input: --min-kmer-count argument
+# Output: minimum k-mer count (int >= 1) or "auto"
+def minKmerCountArgument(value):
+    if value == "auto":
+        return value
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError("must be a positive integer or 'auto'")
+    return int(value)
+
+
+# Input: -k argument
+# Output: size of k (int) or "auto"
+def kArgument(value):
+    if value == "auto":
+        return value
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError("must be an integer or 'auto'")
+    return int(value)
+
+
 def main():
     logging.info("Main: ")
     scriptDir = os.path.dirname(__file__)
@@ -53,14 +77,218 @@ def main():
     parser.add_argument(
         "-biosample", type=str, help="Fastq biosample file", required=True
     )
-    parser.add_argument("-k", type=int, help="size of kmer", required=True)
+    parser.add_argument(
+        "-k",
+        type=kArgument,
+        help=f"size of kmer (at most {kmerCodes.MAX_K}), or 'auto' to pick it from the k-mer count histograms of a sample of the cleaned reads",
+        required=True,
+    )
+    parser.add_argument(
+        "--k-sample-fraction",
+        type=float,
+        default=0.1,
+        help="share of the cleaned reads sampled to pick k with -k auto",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100000,
+        help="number of reads per batch streamed from the biosample file",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes for quality control and k-mer extraction",
+    )
+
+    parser.add_argument(
+        "--min-kmer-count",
+        type=minKmerCountArgument,
+        default=1,
+        help="minimum number of times a k-mer must be seen to be used in the graph, or 'auto' to pick it from the k-mer count histogram",
+    )
+
+    parser.add_argument(
+        "--sketch-memory",
+        type=float,
+        default=0,
+        help="memory budget (MB) of the count-min sketch for two-pass k-mer counting; k-mers seen once are dropped before the exact table is built (default: 0, exact counting)",
+    )
+    parser.add_argument(
+        "--sketch-fpr",
+        type=float,
+        default=0.01,
+        help="target false positive rate of the count-min sketch",
+    )
+
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=0,
+        help="count k-mers out of memory in this many disk partitions (power of 2; default: 0, in-memory counting)",
+    )
+
+    parser.add_argument(
+        "--max-hamming-distance",
+        type=int,
+        default=2,
+        help="most mismatches a contig k-mer may have to a virus k-mer to count as a hit (less than k)",
+    )
+    parser.add_argument(
+        "--search-mode",
+        choices=SEARCH_MODES,
+        default="kmer",
+        help="kmer: contig k-mers within --max-hamming-distance of a virus k-mer, fm: maximal exact matches of the contigs found in an FM-index of the viruses (any length, no rebuild per k)",
+    )
+    parser.add_argument(
+        "--min-mem-length",
+        type=int,
+        default=None,
+        help="shortest maximal exact match reported by the fm search mode (default: k)",
+    )
+    parser.add_argument(
+        "--min-shared-minimizers",
+        type=int,
+        default=0,
+        help="minimizer prefilter: search a contig only against the viruses it shares at least this many (w,k)-minimizers with (default: 0, every contig is searched against every virus; exact minimizers can miss contigs that only match with mismatches)",
+    )
+    parser.add_argument(
+        "--minimizer-length",
+        type=int,
+        default=None,
+        help=f"length of the minimizers of the prefilter (at most {kmerCodes.MAX_K}, default: k)",
+    )
+    parser.add_argument(
+        "--minimizer-window",
+        type=int,
+        default=5,
+        help="number of consecutive k-mers each minimizer of the prefilter is picked from",
+    )
+
+    parser.add_argument(
+        "--no-simplify",
+        action="store_true",
+        help="skip tip clipping and bubble popping before contigs are created",
+    )
+
+    parser.add_argument(
+        "--contig-mode",
+        choices=CONTIG_MODES,
+        default="greedy",
+        help="greedy: coverage-guided walks, unitigs: maximal non-branching paths (both linear time), paths: every path from each start node (capped by --max-paths-per-start, --max-path-length and --component-time-budget)",
+    )
+    parser.add_argument(
+        "--contig-workers",
+        type=int,
+        default=None,
+        help="number of worker processes contigs are created with, one connected component of the graph at a time (default: --workers)",
+    )
+    parser.add_argument(
+        "--min-contig-length",
+        type=int,
+        default=0,
+        help="contigs shorter than this many bases are not written to the contig file or searched",
+    )
+    parser.add_argument(
+        "--max-paths-per-start",
+        type=int,
+        default=1000,
+        help="maximum number of paths the paths contig mode follows from each start node",
+    )
+    parser.add_argument(
+        "--max-path-length",
+        type=int,
+        default=10000,
+        help="maximum number of nodes in a path of the paths contig mode",
+    )
+    parser.add_argument(
+        "--component-time-budget",
+        type=float,
+        default=60.0,
+        help="seconds the paths contig mode may spend on each connected component of the graph",
+    )
 
     args = parser.parse_args()
 
     biosampleFile = args.biosample
     k = args.k
+    kSampleFraction = args.k_sample_fraction
+    batchSize = args.batch_size
+    workers = args.workers
+    minKmerCount = args.min_kmer_count
+    sketchMemory = int(args.sketch_memory * 1024 * 1024)
+    sketchFalsePositiveRate = args.sketch_fpr
+    numPartitions = args.partitions
+    maxHammingDistance = args.max_hamming_distance
+    searchMode = args.search_mode
+    minMemLength = args.min_mem_length
+    minSharedMinimizers = args.min_shared_minimizers
+    minimizerLength = args.minimizer_length
+    minimizerWindow = args.minimizer_window
+    simplifyGraph = not args.no_simplify
+    contigMode = args.contig_mode
+    contigWorkers = workers if args.contig_workers is None else args.contig_workers
+    minContigLength = args.min_contig_length
+    maxPathsPerStart = args.max_paths_per_start
+    maxPathLength = args.max_path_length
+    componentTimeBudget = args.component_time_budget
+    if k == "auto":
+        if workers > 1 or numPartitions:
+            parser.error(
+                "-k auto needs the cleaned reads before k-mers are counted, so it cannot be combined with --workers or --partitions"
+            )
+        if not 0 < kSampleFraction <= 1:
+            parser.error("--k-sample-fraction must be between 0 and 1")
+    elif not 2 <= k <= kmerCodes.MAX_K:
+        parser.error(f"-k must be between 2 and {kmerCodes.MAX_K}")
+    elif maxHammingDistance >= k:
+        parser.error("--max-hamming-distance must be less than k")
+    if maxHammingDistance < 0:
+        parser.error("--max-hamming-distance must not be negative")
+    if minMemLength is not None and minMemLength < 1:
+        parser.error("--min-mem-length must be positive")
+    if minSharedMinimizers < 0:
+        parser.error("--min-shared-minimizers must not be negative")
+    if minimizerLength is not None and not 1 <= minimizerLength <= kmerCodes.MAX_K:
+        parser.error(f"--minimizer-length must be between 1 and {kmerCodes.MAX_K}")
+    if minimizerWindow < 1:
+        parser.error("--minimizer-window must be positive")
+    if not 0 < sketchFalsePositiveRate < 1:
+        parser.error("--sketch-fpr must be between 0 and 1")
+    if sketchMemory and workers > 1:
+        parser.error("--sketch-memory is only supported with a single worker")
+    if numPartitions < 0 or numPartitions & (numPartitions - 1):
+        parser.error("--partitions must be a power of 2")
+    if numPartitions and (workers > 1 or sketchMemory):
+        parser.error("--partitions cannot be combined with --workers or --sketch-memory")
+    if contigWorkers < 1:
+        parser.error("--contig-workers must be positive")
+    if minContigLength < 0:
+        parser.error("--min-contig-length must not be negative")
+    if maxPathsPerStart < 1 or maxPathLength < 1 or componentTimeBudget <= 0:
+        parser.error(
+            "--max-paths-per-start, --max-path-length and --component-time-budget must be positive"
+        )
     logging.info(f"\tBioSample File: {biosampleFile}")
     logging.info(f"\tSize of K = {k}")
+    logging.info(f"\tBatch size = {batchSize}")
+    logging.info(f"\tWorkers = {workers}")
+    if numPartitions:
+        logging.info(f"\tK-mer partitions = {numPartitions}")
+    logging.info(f"\tMinimum k-mer count = {minKmerCount}")
+    logging.info(f"\tMaximum Hamming distance = {maxHammingDistance}")
+    logging.info(f"\tSearch mode = {searchMode}")
+    if minSharedMinimizers:
+        logging.info(
+            f"\tMinimizer prefilter = {minSharedMinimizers} shared minimizers, window {minimizerWindow}"
+        )
+    logging.info(f"\tContig mode = {contigMode}, contig workers = {contigWorkers}")
+    if sketchMemory:
+        logging.info(
+            f"\tCount-min sketch = {sketchMemory} bytes, target false positive rate {sketchFalsePositiveRate}"
+        )
 
     componentRunTimes = {}
 
@@ -168,56 +396,179 @@ def main():
 
     #### Main ####
 
-    # Import Biosample
+    # Import Biosample (streamed in batches, consumed by Quality Control)
     bioStart = time.time()
-    importBioSampleInstance = ImportBioSample(biosampleFile=biosampleFile)
-    biosample, biosampleFileLocation = importBioSampleInstance.importBioSample()
+    importBioSampleInstance = ImportBioSample(
+        biosampleFile=biosampleFile, batchSize=batchSize
+    )
+    biosampleFileLocation = importBioSampleInstance.getBiosampleFileLocation()
+    biosample = importBioSampleInstance.streamBioSample()
     bioStop = time.time()
     bioTotal = bioStop - bioStart
     componentRunTimes["importBioSample"] = bioTotal
 
-    # Import Viruses
-    virusStart = time.time()
-    importVirusInstance = ImportVirus()
-    viruses = importVirusInstance.importVirusData(fileLocations=virusDataFileLocations)
-    virusStop = time.time()
-    virusTotal = virusStop - virusStart
-    componentRunTimes["importVirus"] = virusTotal
-
-    # Quality Control
-    qcStart = time.time()
-    qualityControlInstance = QualityControl(biosample=biosample)
-    cleanedBiosample, minimumReadLength, qualityControlReport, qcMetadata = (
-        qualityControlInstance.qualityControl()
-    )
-    qcStop = time.time()
-    qcTotal = qcStop - qcStart
-    componentRunTimes["qc"] = qcTotal
+    # Do not delete - used in search for viruses (memory mapped there when needed)
+    readsKmerIndexFile = "data/logs/r-kmerIndex.bin"
 
-    # Reads to K-mers
-    if k > (minimumReadLength - 2):
-        print(
-            f"\nK must be at least one less than the size of the smallest read.\nMinimum read length for this sample is: {minimumReadLength}"
+    if numPartitions:
+        # Quality Control and Reads to K-mers, counted out of memory in disk partitions
+        partitionStart = time.time()
+        partitionedInstance = PartitionedKmerCounter(
+            batches=biosample, k=k, numPartitions=numPartitions
         )
-        sys.exit(1)
-
-    rtkStart = time.time()
-    readsToKmersInstance = ReadsToKmers(readsData=cleanedBiosample, k=k)
-    kmerPool = readsToKmersInstance.extractKmers()
-    rtkStop = time.time()
-    rtkTotal = rtkStop - rtkStart
-    componentRunTimes["readsToKmers"] = rtkTotal
-    logging.info(f"Time Stamp: Reads to Kmers finished in {rtkTotal}")
-    print(f"Time Stamp: Reads to Kmers finished in {rtkTotal}")
-
-    # Do not delete - used in search for viruses, added to managing logging with parallel processing
-    with open("data/logs/r-kmerPool.json", "w") as file:
-        json.dump(kmerPool, file)
+        (
+            cleanedBiosample,
+            kmerIndex,
+            minimumReadLength,
+            qualityControlReport,
+            qcMetadata,
+        ) = partitionedInstance.countKmers(readsKmerIndexFile)
+        readsToKmersInstance = ReadsToKmers(
+            readsData=cleanedBiosample, k=k, minKmerCount=minKmerCount
+        )
+        partitionStop = time.time()
+        partitionTotal = partitionStop - partitionStart
+        componentRunTimes["qcAndReadsToKmers"] = partitionTotal
+        logging.info(f"Time Stamp: QC and Reads to Kmers finished in {partitionTotal}")
+        print(f"Time Stamp: QC and Reads to Kmers finished in {partitionTotal}")
+
+        if k > (minimumReadLength - 2):
+            print(
+                f"\nK must be at least one less than the size of the smallest read.\nMinimum read length for this sample is: {minimumReadLength}"
+            )
+            sys.exit(1)
+    elif workers > 1:
+        # Quality Control and Reads to K-mers, sharded over a process pool
+        shardStart = time.time()
+        shardedInstance = ShardedReadsToKmers(batches=biosample, k=k, workers=workers)
+        (
+            cleanedBiosample,
+            (readKmerCodes, readIndex, positions),
+            minimumReadLength,
+            qualityControlReport,
+            qcMetadata,
+        ) = shardedInstance.extractKmerCodes()
+        readsToKmersInstance = ReadsToKmers(
+            readsData=cleanedBiosample, k=k, minKmerCount=minKmerCount
+        )
+        kmerIndex = readsToKmersInstance.kmerIndexFromCodes(
+            readKmerCodes, readIndex, positions
+        )
+        shardStop = time.time()
+        shardTotal = shardStop - shardStart
+        componentRunTimes["qcAndReadsToKmers"] = shardTotal
+        for pid, timings in shardedInstance.workerTimings.items():
+            print(
+                f"\tWorker {pid}: {timings['shards']} shards, qc {timings['qcTime']:.3f}s, kmers {timings['kmerTime']:.3f}s"
+            )
+        logging.info(f"Time Stamp: QC and Reads to Kmers finished in {shardTotal}")
+        print(f"Time Stamp: QC and Reads to Kmers finished in {shardTotal}")
+
+        if k > (minimumReadLength - 2):
+            print(
+                f"\nK must be at least one less than the size of the smallest read.\nMinimum read length for this sample is: {minimumReadLength}"
+            )
+            sys.exit(1)
+    else:
+        # Quality Control (reads each batch as it is imported)
+        qcStart = time.time()
+        qualityControlInstance = QualityControl(biosample=biosample, asReadStore=True)
+        cleanedBiosample, minimumReadLength, qualityControlReport, qcMetadata = (
+            qualityControlInstance.qualityControl()
+        )
+        qcStop = time.time()
+        qcTotal = qcStop - qcStart
+        componentRunTimes["qc"] = qcTotal
+
+        if k == "auto":
+            # K Selection (from a sample of the cleaned reads)
+            ksStart = time.time()
+            if minimumReadLength - 2 < 2:
+                print(
+                    f"\nThe reads are too short to pick k.\nMinimum read length for this sample is: {minimumReadLength}"
+                )
+                sys.exit(1)
+            kSizeSelectorInstance = KmerSizeSelector(
+                readStore=cleanedBiosample,
+                minimumReadLength=minimumReadLength,
+                sampleFraction=kSampleFraction,
+            )
+            k = kSizeSelectorInstance.selectK()
+            ksStop = time.time()
+            componentRunTimes["kSelection"] = ksStop - ksStart
+            for entry in kSizeSelectorInstance.report:
+                print(
+                    f"\tk = {entry['k']}: {entry['solidKmers']} solid of {entry['distinctKmers']} distinct k-mers"
+                )
+            print(f"Chosen k = {k} (most solid k-mers in the sample)")
+            if maxHammingDistance >= k:
+                print(f"\n--max-hamming-distance must be less than the chosen k ({k})")
+                sys.exit(1)
+            logging.info(f"Time Stamp: K Selection finished in {ksStop - ksStart}")
+
+        # Reads to K-mers
+        if k > (minimumReadLength - 2):
+            print(
+                f"\nK must be at least one less than the size of the smallest read.\nMinimum read length for this sample is: {minimumReadLength}"
+            )
+            sys.exit(1)
+
+        rtkStart = time.time()
+        readsToKmersInstance = ReadsToKmers(
+            readsData=cleanedBiosample,
+            k=k,
+            minKmerCount=minKmerCount,
+            sketchMemory=sketchMemory,
+            sketchFalsePositiveRate=sketchFalsePositiveRate,
+        )
+        readKmerCodes, readIndex, positions = readsToKmersInstance.extractKmerCodes()
+        kmerIndex = readsToKmersInstance.kmerIndexFromCodes(
+            readKmerCodes, readIndex, positions
+        )
+        rtkStop = time.time()
+        if readsToKmersInstance.sketchReport:
+            sketchReport = readsToKmersInstance.sketchReport
+            print(
+                f"\tTwo-pass counting kept {sketchReport['keptOccurrences']} of {sketchReport['totalOccurrences']} k-mer occurrences, saved {sketchReport['savedBytes']} bytes"
+            )
+        rtkTotal = rtkStop - rtkStart
+        componentRunTimes["readsToKmers"] = rtkTotal
+        logging.info(f"Time Stamp: Reads to Kmers finished in {rtkTotal}")
+        print(f"Time Stamp: Reads to Kmers finished in {rtkTotal}")
+
+    logging.info(f"\nReads to Kmers: ")
+    logging.info(f"\tDistinct k-mers: {len(kmerIndex)}")
+    logging.info(f"\tK-mer occurrences: {kmerIndex.numOccurrences}")
+    logging.info(f"\tK-mer index size: {kmerIndex.nbytes} bytes")
+
+    if not numPartitions:
+        # the partitioned counter writes the index file itself
+        kmerIndex.save(readsKmerIndexFile)
+
+    # Only solid k-mers reach the graph
+    solidKmerIndex, minKmerCount = readsToKmersInstance.solidKmerIndex(kmerIndex)
+    print(
+        f"\tMinimum k-mer count {minKmerCount}: {len(kmerIndex) - len(solidKmerIndex)} of {len(kmerIndex)} distinct k-mers dropped"
+    )
 
     # De Bruijn Graph
     dbgStart = time.time()
-    debruijnGraphInstance = DeBruijnGraph(kmerPool=kmerPool, k=k)
-    nodes, edges = debruijnGraphInstance.constructGraph()
+    debruijnGraphInstance = DeBruijnGraph(kmerPool=solidKmerIndex, k=k)
+    graph = debruijnGraphInstance.constructCsrGraph()
+    compactedGraph = debruijnGraphInstance.compactGraph(graph)
+    logging.info(f"\nDe Bruijn Graph: ")
+    logging.info(
+        f"\tNodes: {graph.numNodes}, edges: {graph.numEdges}, size: {graph.nbytes} bytes"
+    )
+    logging.info(f"\tUnitigs after compaction: {compactedGraph.numNodes}")
+    if simplifyGraph:
+        # Graph Simplification (error tips and bubbles)
+        graphSimplifierInstance = GraphSimplifier(deBruijnGraph=debruijnGraphInstance)
+        compactedGraph = graphSimplifierInstance.simplify(compactedGraph)
+        for simplificationPass in graphSimplifierInstance.report:
+            print(
+                f"\tRound {simplificationPass['round']}, {simplificationPass['pass']}: removed {simplificationPass['nodesRemoved']} nodes and {simplificationPass['edgesRemoved']} edges"
+            )
     dbgStop = time.time()
     dbgTotal = dbgStop - dbgStart
     componentRunTimes["deBruijnGraph"] = dbgTotal
@@ -226,18 +577,66 @@ def main():
 
     # Create Contigs
     ccStart = time.time()
-    createContigsInstance = CreateContigs(graph=edges)
-    contigs = createContigsInstance.createContigs()
+    createContigsInstance = CreateContigs(
+        graph=compactedGraph,
+        overlap=k - 2,
+        mode=contigMode,
+        maxPathsPerStart=maxPathsPerStart,
+        maxPathLength=maxPathLength,
+        componentTimeBudget=componentTimeBudget,
+        workers=contigWorkers,
+        minContigLength=minContigLength,
+    )
+    # contigs are streamed to a FASTA file and read back from it lazily
+    contigs = createContigsInstance.writeContigs()
+    contigStats = contigs.stats
+    print(
+        f"\t{contigStats['count']} contigs, {contigStats['totalLength']} bases, N50 {contigStats['n50']}, L50 {contigStats['l50']}"
+    )
     ccStop = time.time()
     ccTotal = ccStop - ccStart
     componentRunTimes["createContigs"] = ccTotal
     logging.info(f"Time Stamp: Create Contigs finished in {ccTotal}")
     print(f"Time Stamp: Create Contigs finished in {ccTotal}")
 
+    # Import Viruses (reference index memory mapped from the cache, built on first use)
+    virusStart = time.time()
+    referenceCacheInstance = ReferenceCache(
+        virusDataFileLocations, k, maxHammingDistance=maxHammingDistance
+    )
+    if searchMode == "fm":
+        viruses, referenceIndex = referenceCacheInstance.loadFmIndex()
+    else:
+        viruses, referenceIndex = referenceCacheInstance.load()
+    virusStop = time.time()
+    virusTotal = virusStop - virusStart
+    componentRunTimes["importVirus"] = virusTotal
+    cacheState = "hit" if referenceCacheInstance.hit else "miss"
+    logging.info(
+        f"Time Stamp: Import Viruses finished in {virusTotal} (reference cache {cacheState})"
+    )
+    print(
+        f"Time Stamp: Import Viruses finished in {virusTotal} (reference cache {cacheState})"
+    )
+    minimizerIndex = None
+    if minSharedMinimizers:
+        minimizerIndex = referenceCacheInstance.loadMinimizerIndex(
+            k if minimizerLength is None else minimizerLength, minimizerWindow
+        )
+
     # Search for Viruses (Virus Alignment)
     sfvStart = time.time()
     searchForVirusesInstance = SearchString(
-        viruses, "data/logs/r-kmerPool.json", contigs, k
+        viruses,
+        readsKmerIndexFile,
+        contigs,
+        k,
+        maxHammingDistance=maxHammingDistance,
+        referenceIndex=referenceIndex,
+        searchMode=searchMode,
+        minMemLength=minMemLength,
+        minSharedMinimizers=minSharedMinimizers,
+        minimizerIndex=minimizerIndex,
     )
     virusesInBiosample = searchForVirusesInstance.searchString()
     sfvStop = time.time()
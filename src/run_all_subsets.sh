@@ -23,7 +23,7 @@ do
     start_time=$(date +%s)
 
     # Run main.py in the background, can change size of k
-    python3 main.py -k 45 -biosample "$file" &
+    python3 main.py -k 31 -biosample "$file" &
     # Get the PID of the background process
     pid=$!
     echo "Current PID: $pid"
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+from components.contigFile import ContigFile
+
+
+class TestContigFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fileLocation = os.path.join(self.directory.name, "contigs.fasta")
+        with open(self.fileLocation, "w") as file:
+            file.write(
+                ">contig_1 length=9 coverage=2.500\nACGT\nACGT\nA\n"
+                ">contig_2 length=3 coverage=1.000\nTTG\n"
+            )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records(self):
+        contigFile = ContigFile(self.fileLocation)
+        self.assertEqual(
+            list(contigFile.records()),
+            [(1, "ACGTACGTA", 9, 2.5), (2, "TTG", 3, 1.0)],
+        )
+        self.assertEqual(list(contigFile), ["ACGTACGTA", "TTG"])
+        self.assertEqual(len(contigFile), 2)
+        self.assertEqual(contigFile.lengths(), [9, 3])
+        self.assertEqual(contigFile.coverage(), [2.5, 1.0])
+
+    def test_withoutCoverage(self):
+        with open(self.fileLocation, "w") as file:
+            file.write(">contig_1 length=4\nACGT\n")
+        contigFile = ContigFile(self.fileLocation)
+        self.assertEqual(list(contigFile.records()), [(1, "ACGT", 4, None)])
+        self.assertIsNone(contigFile.coverage())
+        open(self.fileLocation, "w").close()
+        self.assertEqual(list(contigFile), [])
+        self.assertEqual(len(contigFile), 0)
+        self.assertIsNone(contigFile.coverage())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+from components.contigWriter import ContigWriter
+
+
+class TestContigWriter(unittest.TestCase):
+    # Input: contig lengths
+    # Output: N50 and L50 from the sorted lengths
+    def sortedN50(self, lengths):
+        total = 0
+        for count, length in enumerate(sorted(lengths, reverse=True), 1):
+            total += length
+            if 2 * total >= sum(lengths):
+                return length, count
+        return 0, 0
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileLocation = os.path.join(directory, "contigs.fasta")
+            with ContigWriter(fileLocation, lineWidth=4) as writer:
+                self.assertTrue(writer.write("ACGTACGTA", 2.5))
+                self.assertTrue(writer.write("TTG"))
+            with open(fileLocation) as file:
+                self.assertEqual(
+                    file.read(),
+                    ">contig_1 length=9 coverage=2.500\nACGT\nACGT\nA\n"
+                    ">contig_2 length=3\nTTG\n",
+                )
+
+    def test_minContigLength(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileLocation = os.path.join(directory, "contigs.fasta")
+            with ContigWriter(fileLocation, minContigLength=4) as writer:
+                self.assertFalse(writer.write("ACG", 1.0))
+                self.assertTrue(writer.write("ACGT", 1.0))
+                self.assertFalse(writer.write("", 1.0))
+            stats = writer.close().stats
+            self.assertEqual(stats["count"], 1)
+            self.assertEqual(stats["filtered"], 2)
+            with open(fileLocation) as file:
+                self.assertEqual(file.read(), ">contig_1 length=4 coverage=1.000\nACGT\n")
+
+    def test_stats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileLocation = os.path.join(directory, "contigs.fasta")
+            for lengths in [[5], [2, 2, 2, 2], [10, 1, 1, 1], [3, 8, 8, 1, 4, 4, 4, 7], [1, 2, 3, 4, 5, 6]]:
+                with ContigWriter(fileLocation) as writer:
+                    for length in lengths:
+                        writer.write("A" * length)
+                stats = writer.close().stats
+                n50, l50 = self.sortedN50(lengths)
+                self.assertEqual(
+                    stats,
+                    {
+                        "count": len(lengths),
+                        "totalLength": sum(lengths),
+                        "minLength": min(lengths),
+                        "maxLength": max(lengths),
+                        "n50": n50,
+                        "l50": l50,
+                        "filtered": 0,
+                    },
+                )
+            with ContigWriter(fileLocation) as writer:
+                pass
+            stats = writer.close().stats
+            self.assertEqual((stats["count"], stats["n50"], stats["l50"]), (0, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
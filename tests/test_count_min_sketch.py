@@ -0,0 +1,57 @@
+import sys
+
+sys.path.insert(0, "../src")
+import unittest
+import numpy as np
+from components.countMinSketch import CountMinSketch
+from components.readsToKmers import ReadsToKmers
+from components.readStore import ReadStore
+
+
+class TestCountMinSketch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.codes = rng.integers(0, 4**21, size=5000, dtype=np.uint64)
+        self.occurrences = np.repeat(self.codes, np.arange(5000) % 4 + 1)
+
+    def test_neverUndercounts(self):
+        sketch = CountMinSketch(memoryBudget=2**16, falsePositiveRate=0.01)
+        sketch.add(self.occurrences[:10000])
+        sketch.add(self.occurrences[10000:])
+        estimates = sketch.estimate(self.codes)
+        self.assertTrue(np.all(estimates >= np.arange(5000) % 4 + 1))
+        self.assertEqual(sketch.depth, 5)
+        self.assertLessEqual(sketch.nbytes, 2**16)
+
+    def test_saturates(self):
+        sketch = CountMinSketch(memoryBudget=2**14)
+        sketch.add(np.full(1000, 7, dtype=np.uint64))
+        self.assertEqual(sketch.estimate(np.array([7], dtype=np.uint64)).tolist(), [255])
+
+    def test_budgetTooSmall(self):
+        with self.assertRaises(ValueError):
+            CountMinSketch(memoryBudget=100)
+
+    def test_twoPassMatchesExactCounting(self):
+        rng = np.random.default_rng(2)
+        genome = "".join(rng.choice(list("ACGT"), size=300))
+        sequences = [genome[start : start + 60] for start in range(0, 240, 7)]
+        sequences += ["".join(rng.choice(list("ACGT"), size=60)) for i in range(10)]
+        store = ReadStore.fromReads([f"r{i}" for i in range(len(sequences))], sequences)
+
+        exact = ReadsToKmers(readsData=store, k=15, minKmerCount=2)
+        exactIndex, exactMinCount = exact.solidKmerIndex(exact.buildKmerIndex())
+        twoPass = ReadsToKmers(readsData=store, k=15, sketchMemory=2**16)
+        twoPassIndex, twoPassMinCount = twoPass.solidKmerIndex(twoPass.buildKmerIndex())
+
+        self.assertEqual(twoPassMinCount, 2)
+        self.assertTrue(np.array_equal(twoPassIndex.codes, exactIndex.codes))
+        self.assertTrue(np.array_equal(twoPassIndex.positions, exactIndex.positions))
+        self.assertLess(
+            twoPass.sketchReport["keptOccurrences"],
+            twoPass.sketchReport["totalOccurrences"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,11 @@ import os
 import sys
 
 sys.path.insert(0, "../src/components")
+sys.path.insert(0, "../src")
 import unittest
 from collections import deque
-from createContigs import CreateContigs
+from createContigs import CONTIG_MODES, CreateContigs
+from components.csrGraph import CsrGraph
 
 
 class TestCreateContigs(unittest.TestCase):
@@ -48,6 +50,152 @@ class TestCreateContigs(unittest.TestCase):
         self.assertEqual(contigs, ["ACTGGAT", "TTTAGCTAG"])
         os.chdir(original_cwd)
 
+    def test_createContigsFromUnitigs(self):
+        original_cwd = os.getcwd()
+        os.chdir(os.path.join(original_cwd, "../src"))
+
+        # unitigs of the k = 5 graph, consecutive unitigs share k - 2 bases
+        graph = {
+            "TTTAG": ["TAGC"],
+            "TAGC": ["AGCCTT"],
+            "AGCCTT": ["CTTATC", "CTTCG"],
+            "CTTATC": [],
+            "CTTCG": [],
+        }
+        contigs = CreateContigs(graph, overlap=3, mode="paths").createContigs()
+        self.assertEqual(sorted(contigs), ["TTTAGCCTTATC", "TTTAGCCTTCG"])
+        # one walk takes the shared unitigs, the other branch starts at the branching unitig
+        contigs = CreateContigs(graph, overlap=3).createContigs()
+        self.assertEqual(sorted(contigs), ["AGCCTTCG", "TTTAGCCTTATC"])
+        contigs = CreateContigs(graph, overlap=3, mode="unitigs").createContigs()
+        self.assertEqual(sorted(contigs), ["AGCCTTATC", "AGCCTTCG", "TTTAGCCTT"])
+        os.chdir(original_cwd)
+
+    def test_highCoverageBranchFirst(self):
+        original_cwd = os.getcwd()
+        os.chdir(os.path.join(original_cwd, "../src"))
+
+        # GCTA -> CTAC is seen 9 times, GCTA -> CTAG once
+        edges = {"AGCT": ["GCTA"], "GCTA": ["CTAG", "CTAC"]}
+        edgeCounts = {("AGCT", "GCTA"): 5, ("GCTA", "CTAG"): 1, ("GCTA", "CTAC"): 9}
+        graph = CsrGraph.fromEdgeDict(edges, edgeCounts)
+        graph.nodeCoverage = graph.incidentCoverage()
+        createContigs = CreateContigs(graph, mode="paths")
+        contigs = createContigs.createContigs()
+        self.assertEqual(contigs, ["AGCTAC", "AGCTAG"])
+        self.assertEqual(createContigs.contigCoverage, [(4 * 5 + 5 + 9) / 6, (4 * 5 + 5 + 1) / 6])
+        os.chdir(original_cwd)
+
+    def test_greedyContigs(self):
+        original_cwd = os.getcwd()
+        os.chdir(os.path.join(original_cwd, "../src"))
+
+        edges = {"AGCT": ["GCTA"], "GCTA": ["CTAG", "CTAC"], "TTTT": []}
+        edgeCounts = {("AGCT", "GCTA"): 5, ("GCTA", "CTAG"): 1, ("GCTA", "CTAC"): 9}
+        graph = CsrGraph.fromEdgeDict(edges, edgeCounts)
+        createContigs = CreateContigs(graph)
+        contigs = createContigs.createContigs()
+        # the walk follows the heavier edge, the other edge is a contig of its own
+        self.assertEqual(contigs, ["AGCTAC", "GCTAG", "TTTT"])
+        self.assertEqual(createContigs.allPaths, [[0, 1, 3], [1, 2], [4]])
+        os.chdir(original_cwd)
+
+    def test_linearTimeModesOnCycles(self):
+        original_cwd = os.getcwd()
+        os.chdir(os.path.join(original_cwd, "../src"))
+
+        # ACG -> CGT -> GTA -> TAC -> ACG is a cycle, with GTA -> TAA leaving it
+        edges = {"ACG": ["CGT"], "CGT": ["GTA"], "GTA": ["TAC", "TAA"], "TAC": ["ACG"]}
+        edgeCounts = {("GTA", "TAA"): 2}
+        graph = CsrGraph.fromEdgeDict(edges, edgeCounts)
+        # every edge is used exactly once
+        for mode in ["greedy", "unitigs"]:
+            createContigs = CreateContigs(graph, mode=mode)
+            createContigs.createContigs()
+            usedEdges = sorted(
+                (path[i], path[i + 1])
+                for path in createContigs.allPaths
+                for i in range(len(path) - 1)
+            )
+            self.assertEqual(usedEdges, [(0, 1), (1, 2), (2, 3), (2, 4), (3, 0)])
+        self.assertEqual(
+            CreateContigs(graph, mode="unitigs").createContigs(), ["GTACGTA", "GTAA"]
+        )
+        os.chdir(original_cwd)
+
+    def test_pathLimits(self):
+        original_cwd = os.getcwd()
+        os.chdir(os.path.join(original_cwd, "../src"))
+
+        # AGCT -> GCTA -> CTAG and AGCT -> GCTT
+        graph = {**self.graph, "AGCT": ["GCTA", "GCTT"]}
+        createContigs = CreateContigs(graph, mode="paths")
+        self.assertEqual(createContigs.createContigs(), ["ACTGGAT", "TTTAGCTAG", "TTTAGCTT"])
+        createContigs = CreateContigs(graph, mode="paths", maxPathsPerStart=1)
+        self.assertEqual(createContigs.createContigs(), ["ACTGGAT", "TTTAGCTAG"])
+        # CTAG -> TAGC closes a loop, the path through it is dropped
+        graph["CTAG"] = ["TAGC"]
+        createContigs = CreateContigs(graph, mode="paths")
+        self.assertEqual(createContigs.createContigs(), ["ACTGGAT", "TTTAGCTT"])
+        createContigs = CreateContigs(self.graph, mode="paths", maxPathLength=3)
+        self.assertEqual(createContigs.createContigs(), ["ACTGGA", "TTTAGC"])
+        createContigs = CreateContigs(graph, mode="paths", componentTimeBudget=1e-9)
+        self.assertEqual(createContigs.createContigs(), [])
+        with self.assertRaises(ValueError):
+            CreateContigs(self.graph, mode="all")
+        os.chdir(original_cwd)
+
+    def test_parallelContigs(self):
+        original_cwd = os.getcwd()
+        os.chdir(os.path.join(original_cwd, "../src"))
+
+        # many components of different sizes: chains, branching chains and cycles
+        graph = {}
+        for component in range(30):
+            nodes = [f"N{component}_{i}" for i in range(component % 7 + 1)]
+            for node, child in zip(nodes, nodes[1:]):
+                graph[node] = [child]
+            if component % 3 == 0:
+                graph.setdefault(nodes[0], []).append(f"B{component}")
+            if component % 5 == 0:
+                graph.setdefault(nodes[-1], []).append(nodes[0])
+            graph.setdefault(nodes[-1], [])
+        for mode in CONTIG_MODES:
+            serial = CreateContigs(graph, overlap=0, mode=mode)
+            serialContigs = serial.createContigs()
+            parallel = CreateContigs(graph, overlap=0, mode=mode, workers=3)
+            self.assertEqual(parallel.createContigs(), serialContigs)
+            self.assertEqual(parallel.allPaths, serial.allPaths)
+        os.chdir(original_cwd)
+
+    def test_writeContigs(self):
+        original_cwd = os.getcwd()
+        os.chdir(os.path.join(original_cwd, "../src"))
+
+        graph = CsrGraph.fromEdgeDict(self.graph)
+        graph.nodeCoverage = graph.incidentCoverage()
+        for mode in CONTIG_MODES:
+            createContigs = CreateContigs(graph, mode=mode, minContigLength=8)
+            contigFile = createContigs.writeContigs()
+            self.assertEqual(list(contigFile), ["TTTAGCTAG"])
+            self.assertEqual(createContigs.allPaths, [])
+            self.assertEqual(
+                (contigFile.stats["count"], contigFile.stats["filtered"]), (1, 1)
+            )
+            self.assertEqual(
+                list(contigFile.records()), [(1, "TTTAGCTAG", 9, 1.0)]
+            )
+        createContigs = CreateContigs(graph, minContigLength=8)
+        self.assertEqual(createContigs.createContigs(), ["TTTAGCTAG"])
+        self.assertEqual(createContigs.allPaths, [[4, 5, 6, 7, 8, 9]])
+        self.assertEqual(createContigs.contigCoverage, [1.0])
+        os.chdir(original_cwd)
+
+    def test_nonRedundantContigs(self):
+        contigs = ["ACGTAC", "CGTA", "ACGTAC", "TTTT", "GTACGG", "ACG", "GGA"]
+        self.assertEqual(self.createContigs.nonRedundantContigs(contigs), [0, 3, 4, 6])
+        self.assertEqual(self.createContigs.nonRedundantContigs([]), [])
+
 
 if __name__ == "__main__":
     unittest.main()
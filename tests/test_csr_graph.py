@@ -0,0 +1,83 @@
+import sys
+
+sys.path.insert(0, "../src")
+import unittest
+import numpy as np
+from components import kmerCodes
+from components.csrGraph import CsrGraph
+
+
+class TestCsrGraph(unittest.TestCase):
+    def setUp(self):
+        self.edges = {"ACT": ["CTG", "CTA"], "CTG": ["TGA"], "TTA": ["TAC"], "CTA": []}
+        self.graph = CsrGraph.fromEdgeDict(self.edges, {("ACT", "CTG"): 3})
+
+    def test_fromEdgeDict(self):
+        graph = self.graph
+        self.assertEqual(graph.numNodes, 6)
+        self.assertEqual(graph.numEdges, 4)
+        self.assertEqual(graph.sequences(), ["ACT", "CTG", "CTA", "TGA", "TTA", "TAC"])
+        self.assertEqual(graph.outDegree.tolist(), [2, 1, 0, 0, 1, 0])
+        self.assertEqual(graph.inDegree.tolist(), [0, 1, 1, 1, 0, 1])
+        self.assertEqual(graph.outNeighbors(0).tolist(), [1, 2])
+        self.assertEqual(graph.inNeighbors(3).tolist(), [1])
+        self.assertEqual(graph.edgeWeights.tolist(), [3, 1, 1, 1])
+        self.assertEqual(graph.toEdgeDict(), {**self.edges, "TGA": [], "TAC": []})
+        self.assertEqual(graph.outWeights(0).tolist(), [3, 1])
+        self.assertEqual(graph.incidentCoverage().tolist(), [2, 2, 1, 1, 1, 1])
+
+    def test_fromKmerCodes(self):
+        kmers = ["ACTG", "CTGA", "CTGC", "AACT"]
+        codes = np.array(sorted(map(kmerCodes.encodeKmer, kmers)), dtype=np.uint64)
+        graph = CsrGraph.fromKmerCodes(codes, 4, counts=np.array([1, 2, 3, 4]))
+        self.assertEqual(graph.sequences(), ["AAC", "ACT", "CTG", "TGA", "TGC"])
+        self.assertEqual(graph.outNeighbors(2).tolist(), [3, 4])
+        self.assertEqual(graph.edgeWeights.tolist(), [1, 2, 3, 4])
+        self.assertEqual(graph.extensions(np.array([3, 4]), 2), "AC")
+        # node arrays, and 4 uint32 entries per edge
+        self.assertEqual(graph.nbytes, 5 * (8 + 4 + 4 + 8 + 8) + 16 + 4 * 16)
+
+    def test_subgraph(self):
+        self.graph.nodeCoverage = self.graph.incidentCoverage()
+        keep = np.array([True, False, True, True, True, True])
+        subgraph = self.graph.subgraph(keep)
+        self.assertEqual(subgraph.sequences(), ["ACT", "CTA", "TGA", "TTA", "TAC"])
+        self.assertEqual(
+            subgraph.toEdgeDict(),
+            {"ACT": ["CTA"], "CTA": [], "TGA": [], "TTA": ["TAC"], "TAC": []},
+        )
+        self.assertEqual(subgraph.nodeCoverage.tolist(), [2, 1, 1, 1, 1])
+        self.assertEqual(subgraph.nodeLengths().tolist(), [3, 3, 3, 3, 3])
+
+    def test_weaklyConnectedComponents(self):
+        # ACT -> CTG -> TGA and ACT -> CTA are one component, TTA -> TAC another
+        self.assertEqual(
+            self.graph.weaklyConnectedComponents().tolist(), [0, 0, 0, 0, 1, 1]
+        )
+        # edges point both ways along the chain 5 -> 4 -> ... -> 0, plus an isolated node
+        graph = CsrGraph(7, [5, 4, 3, 2, 1], [4, 3, 2, 1, 0])
+        self.assertEqual(
+            graph.weaklyConnectedComponents().tolist(), [0, 0, 0, 0, 0, 0, 1]
+        )
+
+    def test_sharedMemory(self):
+        self.graph.nodeCoverage = self.graph.incidentCoverage()
+        extra = np.array([5, 6, 7], dtype=np.int64)
+        sharedMemory, descriptor = self.graph.toSharedMemory({"extra": extra})
+        try:
+            shared, arrays = CsrGraph.fromSharedMemory(descriptor)
+            self.assertEqual(shared.numNodes, 6)
+            self.assertEqual(shared.outNeighbors(0).tolist(), [1, 2])
+            self.assertEqual(shared.inNeighbors(3).tolist(), [1])
+            self.assertEqual(shared.outWeights(0).tolist(), [3, 1])
+            self.assertEqual(shared.nodeCoverage.tolist(), [2, 2, 1, 1, 1, 1])
+            self.assertEqual(arrays["extra"].tolist(), [5, 6, 7])
+            self.assertFalse(shared.outIndices.flags.writeable)
+            del shared, arrays
+        finally:
+            sharedMemory.close()
+            sharedMemory.unlink()
+
+
+if __name__ == "__main__":
+    unittest.main()
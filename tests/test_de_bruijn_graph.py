@@ -1,8 +1,11 @@
 import unittest
 import sys
+import numpy as np
 
 sys.path.insert(0, "../src/components")
+sys.path.insert(0, "../src")
 from deBruijnGraph import DeBruijnGraph
+from components import kmerCodes
 
 
 class TestDeBruijnGraph(unittest.TestCase):
@@ -51,6 +54,90 @@ class TestDeBruijnGraph(unittest.TestCase):
                 prefix in edges and suffix in edges[prefix]
             ), "The key-value pair is not in the dictionary."
 
+    def testGraphFromKmerCodes(self):
+        codes = np.array(
+            [kmerCodes.encodeKmer(kmer) for kmer in self.kmerPool], dtype=np.uint64
+        )
+        nodes, edges = DeBruijnGraph(codes, self.k).constructGraph()
+        expectedNodes, expectedEdges = self.dbg.constructGraph()
+        self.assertEqual(nodes, expectedNodes)
+        self.assertEqual(list(edges.items()), list(expectedEdges.items()))
+
+    def testCompactGraph(self):
+        nodes, edges = self.dbg.constructGraph()
+        compacted = self.dbg.compactGraph(edges)
+        unitigs = dict(zip(compacted.nodeSequences, compacted.nodeCoverage.tolist()))
+        self.assertEqual(
+            compacted.toEdgeDict(),
+            {
+                "ACTGGATCTT": ["CTTC"],
+                "CTTC": ["TTCAG", "TTCG"],
+                "TTCAG": [],
+                "TAGC": ["AGCCTT", "AGCTAG"],
+                "AGCCTT": ["CTTATC", "CTTC"],
+                "CTTATC": [],
+                "TTTAG": ["TAGC"],
+                "AGCTAG": ["TAGC"],
+                "TTCG": [],
+            },
+        )
+        self.assertEqual(unitigs["ACTGGATCTT"], 1.0)
+        # AGCCT and GCCTT are seen in two reads
+        self.assertEqual(unitigs["AGCCTT"], 2.0)
+        self.assertLess(len(unitigs), len(nodes))
+
+        # same unitigs from the k-mer codes, with node ids in code order
+        codes = np.array(
+            sorted(kmerCodes.encodeKmer(kmer) for kmer in self.kmerPool), dtype=np.uint64
+        )
+        codesCompacted = DeBruijnGraph(codes, self.k).compactGraph(
+            DeBruijnGraph(codes, self.k).constructCsrGraph()
+        )
+        self.assertEqual(
+            {
+                node: sorted(children)
+                for node, children in codesCompacted.toEdgeDict().items()
+            },
+            {
+                node: sorted(children)
+                for node, children in compacted.toEdgeDict().items()
+            },
+        )
+
+    def testCompactUnitigGraph(self):
+        compacted = self.dbg.compactGraph(self.dbg.constructCsrGraph())
+        # compacting unitigs again changes nothing
+        recompacted = self.dbg.compactGraph(compacted)
+        self.assertEqual(recompacted.toEdgeDict(), compacted.toEdgeDict())
+        self.assertEqual(
+            recompacted.nodeCoverage.tolist(), compacted.nodeCoverage.tolist()
+        )
+
+        # without the TTCG branch, CTTC and TTCAG are one unitig
+        keep = np.array([sequence != "TTCG" for sequence in compacted.sequences()])
+        merged = self.dbg.compactGraph(compacted.subgraph(keep))
+        unitigs = dict(zip(merged.nodeSequences, merged.nodeCoverage.tolist()))
+        self.assertEqual(merged.toEdgeDict()["AGCCTT"], ["CTTATC", "CTTCAG"])
+        self.assertEqual(unitigs["CTTCAG"], 1.0)
+        self.assertEqual(unitigs["AGCCTT"], 2.0)
+
+    def testConstructCsrGraph(self):
+        graph = self.dbg.constructCsrGraph()
+        nodes, edges = self.dbg.constructGraph()
+        self.assertEqual(graph.numNodes, len(nodes))
+        self.assertEqual(graph.numEdges, len(self.kmerPool))
+        node = graph.sequences().index("CCTT")
+        self.assertEqual(graph.outDegree[node], 2)
+        self.assertEqual(graph.sequences(graph.outNeighbors(node)), ["CTTA", "CTTC"])
+        self.assertEqual(graph.sequences(graph.inNeighbors(node)), ["GCCT"])
+        self.assertEqual(graph.edgeWeights[graph.inEdges[graph.inIndptr[node]]], 2)
+
+    def testCompactCycle(self):
+        dbg = DeBruijnGraph({"ACGTA": {}, "CGTAC": {}, "GTACG": {}, "TACGT": {}}, 5)
+        nodes, edges = dbg.constructGraph()
+        compacted = dbg.compactGraph(edges)
+        self.assertEqual(compacted.toEdgeDict(), {"ACGTACG": ["ACGTACG"]})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,100 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+import numpy as np
+from components.fmIndex import FmIndex, sequenceToSymbols, suffixArray
+
+
+class TestFmIndex(unittest.TestCase):
+    def setUp(self):
+        self.sequences = ["ACGTACGGT", "TTACGNACG"]
+        self.index = FmIndex.fromSequences(["virus1", "virus2"], self.sequences, sampleRate=4)
+
+    def test_suffixArray(self):
+        text = "BANANA"
+        suffixes = suffixArray(np.frombuffer(text.encode("ascii"), dtype=np.uint8))
+        self.assertEqual(suffixes.tolist(), sorted(range(6), key=lambda start: text[start:]))
+
+    def test_locate(self):
+        low, high = self.index.findInterval("ACG")
+        self.assertEqual(high - low, 4)
+        virus, positions = self.index.virusPositions(
+            self.index.locate(np.arange(low, high))
+        )
+        self.assertEqual(
+            sorted(zip(virus.tolist(), positions.tolist())), [(0, 0), (0, 4), (1, 2), (1, 6)]
+        )
+        # N is a separator, no match spans it
+        low, high = self.index.findInterval("ACGNA")
+        self.assertEqual(high, low)
+
+    def test_maximalMatches(self):
+        query = sequenceToSymbols("GGTACGGTTN" + "TTACGTA")
+        starts, lengths, virus, positions, truncated = self.index.maximalMatches(query, 4)
+        self.assertEqual(
+            list(zip(starts.tolist(), lengths.tolist(), virus.tolist(), positions.tolist())),
+            # GTACGGT of virus 1 is also a shorter match TACG of virus 2; TTACG of virus 2
+            # is also TACG of virus 1, which overlaps ACGTA of virus 1
+            [(1, 7, 0, 2), (2, 4, 1, 1), (10, 5, 1, 0), (11, 4, 0, 3), (12, 5, 0, 0)],
+        )
+        self.assertEqual(truncated, 0)
+        # longer matches only, without rebuilding
+        starts, lengths, virus, positions, truncated = self.index.maximalMatches(query, 6)
+        self.assertEqual(starts.tolist(), [1])
+        # both TACG seeds occur twice, and are located once
+        truncated = self.index.maximalMatches(query, 4, maxOccurrences=1)[4]
+        self.assertEqual(truncated, 2)
+
+    def test_maximalMatchesBruteForce(self):
+        rng = np.random.default_rng(1)
+        sequences = ["".join(rng.choice(list("ACG"), size=40)) for _ in range(3)]
+        index = FmIndex.fromSequences(["a", "b", "c"], sequences, sampleRate=8)
+        query = sequences[1][5:25] + "TT" + "".join(rng.choice(list("ACG"), size=30))
+        starts, lengths, virus, positions, truncated = index.maximalMatches(
+            sequenceToSymbols(query), 3, maxOccurrences=1000
+        )
+        expected = []
+        for virusIndex, sequence in enumerate(sequences):
+            for start in range(len(query)):
+                for position in range(len(sequence)):
+                    if start and position and query[start - 1] == sequence[position - 1]:
+                        continue
+                    length = 0
+                    while (
+                        start + length < len(query)
+                        and position + length < len(sequence)
+                        and query[start + length] == sequence[position + length]
+                    ):
+                        length += 1
+                    if length >= 3:
+                        expected.append((start, length, virusIndex, position))
+        self.assertEqual(
+            list(zip(starts.tolist(), lengths.tolist(), virus.tolist(), positions.tolist())),
+            sorted(expected, key=lambda match: (match[0], match[2], match[3])),
+        )
+
+    def test_saveOpen(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileLocation = os.path.join(directory, "fm.bin")
+            self.index.save(fileLocation)
+            opened = FmIndex.open(fileLocation)
+            self.assertEqual(opened.virusIds, ["virus1", "virus2"])
+            self.assertEqual(opened.textLength, self.index.textLength)
+            query = sequenceToSymbols("GGTACGGTTNTTACGTA")
+            for openedArray, array in zip(
+                opened.maximalMatches(query, 4)[:4], self.index.maximalMatches(query, 4)[:4]
+            ):
+                self.assertEqual(openedArray.tolist(), array.tolist())
+            del opened
+
+            with open(fileLocation, "r+b") as file:
+                file.truncate(os.path.getsize(fileLocation) - 1)
+            with self.assertRaises(ValueError):
+                FmIndex.open(fileLocation)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import sys
+
+sys.path.insert(0, "../src")
+import random
+import unittest
+from components.deBruijnGraph import DeBruijnGraph
+from components.graphSimplifier import GraphSimplifier, editDistance
+from components.readsToKmers import ReadsToKmers
+from components.readStore import ReadStore
+
+
+class TestGraphSimplifier(unittest.TestCase):
+    def setUp(self):
+        random.seed(1)
+        self.k = 15
+        self.genome = "".join(random.choice("ACGT") for _ in range(300))
+        # every base covered several times, reads end 4 bases before the genome does
+        self.reads = [self.genome[start : start + 60] for start in range(0, 240, 4)] * 3
+
+    # Input: reads
+    # Output: De Bruijn graph instance, compacted graph of the reads
+    def compactedGraph(self, reads):
+        store = ReadStore.fromReads([f"Read{i}" for i in range(len(reads))], reads)
+        deBruijnGraph = DeBruijnGraph(ReadsToKmers(store, self.k).buildKmerIndex(), self.k)
+        return deBruijnGraph, deBruijnGraph.compactGraph(deBruijnGraph.constructCsrGraph())
+
+    # Input: read, position of the base to change
+    # Output: read with a sequencing error at the position
+    def withError(self, read, position):
+        base = "A" if read[position] != "A" else "C"
+        return read[:position] + base + read[position + 1 :]
+
+    def test_editDistance(self):
+        self.assertEqual(editDistance("ACGT", "ACGT"), 0)
+        self.assertEqual(editDistance("ACGT", "AGGT"), 1)
+        self.assertEqual(editDistance("ACGT", "AGT"), 1)
+        self.assertEqual(editDistance("ACGTT", "TACGT"), 2)
+
+    def test_clipTips(self):
+        # an error near the end of a read leaves a short dead end
+        reads = self.reads + [self.withError(self.genome[200:260], 55)]
+        deBruijnGraph, graph = self.compactedGraph(reads)
+        self.assertEqual(graph.numNodes, 3)
+        simplifier = GraphSimplifier(deBruijnGraph)
+        self.assertEqual(simplifier.findTips(graph).sum(), 1)
+        simplified = simplifier.simplify(graph)
+        self.assertEqual(simplified.sequences(), [self.genome[:296]])
+        self.assertEqual(
+            simplifier.report,
+            [
+                {
+                    "round": 1,
+                    "pass": "Tip clipping",
+                    "nodesRemoved": 1,
+                    "edgesRemoved": 1,
+                    "nodesAfter": 1,
+                    "edgesAfter": 0,
+                }
+            ],
+        )
+
+    def test_popBubbles(self):
+        # an error in the middle of a read makes a bubble of 2k - 1 bases
+        reads = self.reads + [self.withError(self.genome[100:160], 30)]
+        deBruijnGraph, graph = self.compactedGraph(reads)
+        self.assertEqual(graph.numNodes, 4)
+        simplifier = GraphSimplifier(deBruijnGraph)
+        bubbles = simplifier.findBubbles(graph)
+        self.assertEqual(bubbles.sum(), 1)
+        self.assertEqual(graph.nodeCoverage[bubbles].tolist(), [1.0])
+        simplified = simplifier.simplify(graph)
+        self.assertEqual(simplified.sequences(), [self.genome[:296]])
+        self.assertEqual(simplifier.report[0]["pass"], "Bubble popping")
+        self.assertEqual(simplifier.report[0]["edgesRemoved"], 2)
+
+    def test_keepsCoveredBranches(self):
+        # both branches are well covered (two haplotypes), nothing is removed
+        variant = self.withError(self.genome, 150)
+        reads = self.reads + [variant[start : start + 60] for start in range(100, 180, 4)] * 3
+        deBruijnGraph, graph = self.compactedGraph(reads)
+        simplifier = GraphSimplifier(deBruijnGraph)
+        simplified = simplifier.simplify(graph)
+        self.assertEqual(sorted(simplified.sequences()), sorted(graph.sequences()))
+        self.assertEqual(simplifier.report, [])
+
+    def test_keepsLongTips(self):
+        reads = self.reads + [self.withError(self.genome[200:260], 55)]
+        deBruijnGraph, graph = self.compactedGraph(reads)
+        simplifier = GraphSimplifier(deBruijnGraph, maxTipLength=self.k)
+        self.assertEqual(simplifier.findTips(graph).sum(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
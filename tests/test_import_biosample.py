@@ -2,6 +2,8 @@ import os
 import sys
 
 sys.path.insert(0, "../src/components")
+import gzip
+import shutil
 import unittest
 import pandas as pd
 from importBioSample import ImportBioSample
@@ -22,6 +24,31 @@ class TestImportBioSample(unittest.TestCase):
             self.assertIn("sequence", resultDict[firstKey])
             self.assertIn("quality", resultDict[firstKey])
 
+    def test_streamBioSample(self):
+        batches = list(self.import_biosample.streamBioSample(batchSize=1))
+        resultDict, fileLocation = ImportBioSample(self.file).importBioSample()
+        self.assertEqual(len(batches), len(resultDict))
+        self.assertTrue(all(len(batch) == 1 for batch in batches))
+        merged = {}
+        for batch in batches:
+            merged.update(batch)
+        self.assertEqual(merged, resultDict)
+
+    def test_streamGzipBioSample(self):
+        gzipFile = "test_data/testbiosample.fastq.gz"
+        with open("test_data/testbiosample.fastq", "rb") as source:
+            with gzip.open(gzipFile, "wb") as target:
+                shutil.copyfileobj(source, target)
+        try:
+            gzipSample, fileLocation = ImportBioSample(
+                "testbiosample.fastq.gz"
+            ).importBioSample()
+            plainSample, plainLocation = self.import_biosample.importBioSample()
+            self.assertEqual(fileLocation, gzipFile)
+            self.assertEqual(gzipSample, plainSample)
+        finally:
+            os.remove(gzipFile)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,51 @@
+import sys
+
+sys.path.insert(0, "../src")
+import unittest
+import numpy as np
+from components import kmerCodes, utils
+from components.readStore import ReadStore
+
+
+class TestKmerCodes(unittest.TestCase):
+    def setUp(self):
+        self.sequences = ["ACTGGATCTTCAG", "CTAGCNTTATC", "AGCCTTCG", "TTTAGCTAG"]
+        self.store = ReadStore.fromReads(["r1", "r2", "r3", "r4"], self.sequences)
+
+    def test_encodeDecode(self):
+        self.assertEqual(kmerCodes.encodeKmer("ACGT"), 0b00011011)
+        self.assertEqual(kmerCodes.decodeKmers([0b00011011], 4), ["ACGT"])
+
+    def test_matchesStringKmers(self):
+        for k in [1, 3, 5, 8]:
+            result = []
+            for codes, readIndex, positions in kmerCodes.readStoreKmerCodes(
+                self.store, k, chunkSize=3
+            ):
+                result.extend(
+                    zip(
+                        kmerCodes.decodeKmers(codes, k),
+                        readIndex.tolist(),
+                        positions.tolist(),
+                    )
+                )
+            # k-mers overlapping an ambiguous base are skipped
+            expected = [
+                (kmer, index, position)
+                for index, sequence in enumerate(self.sequences)
+                for position, kmer in enumerate(utils.toKmers(k, sequence))
+                if "N" not in kmer
+            ]
+            self.assertEqual(result, expected)
+
+    def test_hammingDistances(self):
+        virus = np.array([kmerCodes.encodeKmer("ATCG")], dtype=np.uint64)
+        contig = np.array(
+            [kmerCodes.encodeKmer("ATGC"), kmerCodes.encodeKmer("ATCG")], dtype=np.uint64
+        )
+        distances = kmerCodes.hammingDistances(virus[:, None], contig[None, :])
+        self.assertEqual(distances.tolist(), [[2, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+import numpy as np
+from components.kmerIndex import KmerIndex
+from components.readsToKmers import ReadsToKmers
+from components.readStore import ReadStore
+
+
+class TestKmerIndex(unittest.TestCase):
+    def setUp(self):
+        self.ids = ["r1", "r2", "r3"]
+        self.sequences = ["ACTGGACTG", "CTGNACTGA", "GGACT"]
+        self.readsToKmers = ReadsToKmers(
+            readsData=ReadStore.fromReads(self.ids, self.sequences), k=3
+        )
+        self.index = self.readsToKmers.buildKmerIndex()
+
+    def test_codesAreSortedAndDistinct(self):
+        self.assertTrue(np.all(np.diff(self.index.codes.astype(np.int64)) > 0))
+        self.assertEqual(self.index.numOccurrences, int(self.index.counts.sum()))
+
+    def test_lookup(self):
+        self.assertEqual(self.index.count("CTG"), 4)
+        self.assertEqual(
+            self.index.occurrences("CTG"),
+            [("r1", 1), ("r1", 6), ("r2", 0), ("r2", 5)],
+        )
+        self.assertEqual(
+            self.index.occurrences("ACT"),
+            [("r1", 0), ("r1", 5), ("r2", 4), ("r3", 2)],
+        )
+        self.assertIn("GGA", self.index)
+        self.assertNotIn("TTT", self.index)
+        self.assertEqual(self.index.count("TTT"), 0)
+        self.assertEqual(self.index.occurrences("TTT"), [])
+
+    def test_matchesKmerPool(self):
+        kmerPool = self.readsToKmers.extractKmers()
+        indexPool = self.index.toKmerPool()
+        self.assertEqual(sorted(kmerPool), sorted(indexPool))
+        for kmer in kmerPool:
+            self.assertEqual(dict(kmerPool[kmer]), dict(indexPool[kmer]))
+
+    def test_filterCounts(self):
+        self.assertEqual(self.index.countHistogram().tolist()[:5], [0, 2, 2, 0, 2])
+        solid = self.index.filterCounts(2)
+        self.assertEqual(len(solid), 4)
+        self.assertEqual(solid.numOccurrences, 12)
+        self.assertEqual(solid.occurrences("CTG"), self.index.occurrences("CTG"))
+        self.assertEqual(solid.occurrences("GGA"), self.index.occurrences("GGA"))
+        self.assertNotIn("TGG", solid)
+
+    def test_solidKmerIndex(self):
+        readsToKmers = ReadsToKmers(
+            readsData=ReadStore.fromReads(self.ids, self.sequences),
+            k=3,
+            minKmerCount=4,
+        )
+        solid, minKmerCount = readsToKmers.solidKmerIndex(self.index)
+        self.assertEqual(minKmerCount, 4)
+        self.assertEqual(len(solid), 2)
+        self.assertEqual(solid.numOccurrences, 8)
+
+    def test_autoMinKmerCount(self):
+        self.assertEqual(
+            self.readsToKmers.autoMinKmerCount(np.array([0, 50, 10, 4, 9, 12, 3])), 3
+        )
+        self.assertEqual(self.readsToKmers.autoMinKmerCount(np.array([0, 50, 10, 4])), 1)
+        self.assertEqual(self.readsToKmers.autoMinKmerCount(np.array([0, 2, 2])), 1)
+
+    def test_saveAndOpen(self):
+        with tempfile.TemporaryDirectory() as directory:
+            indexFile = os.path.join(directory, "r-kmerIndex.bin")
+            self.index.save(indexFile)
+            mapped = KmerIndex.open(indexFile)
+            self.assertEqual(mapped.k, 3)
+            for name in ["codes", "counts", "offsets", "readIndex", "positions"]:
+                self.assertTrue(
+                    np.array_equal(getattr(mapped, name), getattr(self.index, name))
+                )
+                self.assertFalse(getattr(mapped, name).flags.owndata)
+            self.assertEqual(mapped.occurrences("ACT"), self.index.occurrences("ACT"))
+            self.assertEqual(mapped.readIds, self.ids)
+            del mapped
+
+    def test_openRejectsOtherFiles(self):
+        with tempfile.TemporaryDirectory() as directory:
+            indexFile = os.path.join(directory, "r-kmerIndex.bin")
+            with open(indexFile, "wb") as file:
+                file.write(b"{}" * 64)
+            with self.assertRaises(ValueError):
+                KmerIndex.open(indexFile)
+
+    def test_emptyIndex(self):
+        empty = np.zeros(0, dtype=np.int64)
+        index = KmerIndex.fromOccurrences(3, empty, empty, empty, [])
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.numOccurrences, 0)
+        self.assertEqual(index.count("ACG"), 0)
+        with tempfile.TemporaryDirectory() as directory:
+            indexFile = os.path.join(directory, "r-kmerIndex.bin")
+            index.save(indexFile)
+            mapped = KmerIndex.open(indexFile)
+            self.assertEqual(len(mapped), 0)
+            self.assertEqual(mapped.readIds, [])
+            del mapped
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+
+sys.path.insert(0, "../src")
+import random
+import unittest
+import numpy as np
+from components import kmerCodes
+from components.kmerMatcher import KmerMatcher
+
+
+class TestKmerMatcher(unittest.TestCase):
+    def setUp(self):
+        random.seed(3)
+        self.k = 6
+        self.reference = np.array(
+            [kmerCodes.encodeKmer(kmer) for kmer in ["ACGTAC", "TTTTTT", "ACGTAA", "GGGCCC"]],
+            dtype=np.uint64,
+        )
+
+    def test_seeds(self):
+        # few reference k-mers: the d + 1 segments of the pigeonhole principle, one per seed
+        matcher = KmerMatcher(self.reference, self.k, maxHammingDistance=2)
+        self.assertEqual(matcher.segments, [(0, 2), (2, 2), (4, 2)])
+        self.assertEqual(matcher.seeds, [(0,), (1,), (2,)])
+        # ACGTAC: the seeds keep AC, GT and AC in place
+        self.assertEqual(
+            (self.reference[0] & np.array(matcher.seedMasks)).tolist(),
+            [0b000100000000, 0b000010110000, 0b000000000001],
+        )
+        self.assertEqual(KmerMatcher(self.reference, 7, 2).segments, [(0, 2), (2, 3), (5, 2)])
+        self.assertEqual(KmerMatcher(self.reference, 6, 0).segments, [(0, 6)])
+        # many reference k-mers: more segments, seeds of several segments
+        matcher = KmerMatcher(self.reference, 21, maxHammingDistance=2)
+        self.assertEqual(matcher.chooseSegments(30000), matcher.splitSegments(4))
+        self.assertEqual(matcher.chooseSegments(10), matcher.splitSegments(3))
+        with self.assertRaises(ValueError):
+            KmerMatcher(self.reference, self.k, maxHammingDistance=6)
+
+    def test_matches(self):
+        matcher = KmerMatcher(self.reference, self.k, maxHammingDistance=1)
+        queries = [kmerCodes.encodeKmer(kmer) for kmer in ["ACGTAC", "CCGTAT", "TTTTTA", "CCCCCC"]]
+        queryIndex, referenceIndex, distance = matcher.matches(queries)
+        self.assertEqual(queryIndex.tolist(), [0, 2, 0])
+        self.assertEqual(referenceIndex.tolist(), [0, 1, 2])
+        self.assertEqual(distance.tolist(), [0, 1, 1])
+
+    def test_matchesBruteForce(self):
+        for k, maxHammingDistance in [(4, 0), (5, 1), (7, 2), (9, 3), (6, 5)]:
+            reference = np.array(
+                [random.getrandbits(2 * k) for _ in range(300)], dtype=np.uint64
+            )
+            queries = np.concatenate(
+                [reference[:50] ^ np.uint64(1), np.array([random.getrandbits(2 * k) for _ in range(200)], dtype=np.uint64)]
+            )
+            matcher = KmerMatcher(reference, k, maxHammingDistance)
+            matcher.chunkSize = 100
+            manySeeds = KmerMatcher(
+                reference, k, maxHammingDistance, numSegments=min(k, maxHammingDistance + 3)
+            )
+            self.assertEqual(
+                [array.tolist() for array in matcher.matches(queries)],
+                [array.tolist() for array in manySeeds.matches(queries)],
+            )
+            queryIndex, referenceIndex, distance = matcher.matches(queries)
+            distances = kmerCodes.hammingDistances(queries[None, :], reference[:, None])
+            expectedReference, expectedQuery = np.nonzero(distances <= maxHammingDistance)
+            self.assertEqual(referenceIndex.tolist(), expectedReference.tolist())
+            self.assertEqual(queryIndex.tolist(), expectedQuery.tolist())
+            self.assertEqual(
+                distance.tolist(), distances[expectedReference, expectedQuery].tolist()
+            )
+        empty = KmerMatcher(reference, 9).matches(np.zeros(0, dtype=np.uint64))
+        self.assertEqual([len(array) for array in empty], [0, 0, 0])
+        empty = KmerMatcher(np.zeros(0, dtype=np.uint64), 9).matches(reference)
+        self.assertEqual([len(array) for array in empty], [0, 0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
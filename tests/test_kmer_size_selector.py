@@ -0,0 +1,62 @@
+import sys
+
+sys.path.insert(0, "../src")
+import random
+import unittest
+import numpy as np
+from components import kmerCodes
+from components.kmerSizeSelector import KmerSizeSelector
+from components.readStore import ReadStore
+
+
+class TestKmerSizeSelector(unittest.TestCase):
+    def setUp(self):
+        random.seed(2)
+        self.genome = "".join(random.choice("ACGT") for _ in range(2000))
+        reads = []
+        for _ in range(1500):
+            start = random.randrange(len(self.genome) - 80)
+            read = list(self.genome[start : start + random.randint(50, 80)])
+            if random.random() < 0.3:
+                read[random.randrange(len(read))] = random.choice("ACGTN")
+            reads.append("".join(read))
+        self.readStore = ReadStore.fromReads([str(i) for i in range(len(reads))], reads)
+
+    def test_candidates(self):
+        selector = KmerSizeSelector(self.readStore, 50)
+        self.assertEqual(selector.candidates, list(range(11, 33, 2)))
+        selector = KmerSizeSelector(self.readStore, 16)
+        self.assertEqual(selector.candidates, [11, 13])
+        selector = KmerSizeSelector(self.readStore, 8)
+        self.assertEqual(selector.candidates, [6])
+        with self.assertRaises(ValueError):
+            KmerSizeSelector(self.readStore, 3)
+
+    def test_countHistograms(self):
+        selector = KmerSizeSelector(
+            self.readStore, 50, candidates=[4, 9, 10, 17, 31], sampleFraction=0.2
+        )
+        reads = selector.sampleReads()
+        self.assertEqual(len(reads), 1000)
+        histograms = selector.countHistograms(reads)
+        codes, readStarts, lengths = self.readStore.subset(reads).unpack()
+        for k in selector.candidates:
+            kmers = kmerCodes.kmerCodes(codes, readStarts, lengths, k)[0]
+            expected = np.bincount(np.unique(kmers, return_counts=True)[1], minlength=2)
+            self.assertTrue(np.array_equal(histograms[k], expected))
+
+    def test_selectK(self):
+        # 5-mers cannot tell the 2000 bases of the genome apart, longer k-mers can
+        selector = KmerSizeSelector(self.readStore, 50, candidates=[5, 15, 25, 45])
+        k = selector.selectK()
+        self.assertIn(k, [15, 25])
+        self.assertEqual([entry["k"] for entry in selector.report], [5, 15, 25])
+        best = max(entry["solidKmers"] for entry in selector.report)
+        self.assertEqual(
+            [entry["k"] for entry in selector.report if entry["solidKmers"] == best][-1], k
+        )
+        self.assertLess(selector.report[0]["solidKmers"], 4**5)
+
+
+if __name__ == "__main__":
+    unittest.main()
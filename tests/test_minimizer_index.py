@@ -0,0 +1,86 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+import numpy as np
+from components.minimizerIndex import MinimizerIndex, minimizerHashes, sequenceMinimizers
+from components import kmerCodes
+
+
+class TestMinimizerIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.sequences = [
+            "".join(rng.choice(list("ACGT"), 300)),
+            "".join(rng.choice(list("ACGT"), 200)),
+        ]
+        self.index = MinimizerIndex.fromSequences(["virus1", "virus2"], self.sequences, 6, 4)
+
+    # Input: sequence, minimizer length, window
+    # Output: minimizer hashes of the sequence, one window at a time
+    def bruteForceMinimizers(self, sequence, minimizerLength, window):
+        hashes = [None] * max(len(sequence) - minimizerLength + 1, 0)
+        codes, positions = kmerCodes.sequenceKmerCodes(sequence, minimizerLength)
+        for code, position in zip(minimizerHashes(codes).tolist(), positions.tolist()):
+            hashes[position] = code
+        minimizers = set()
+        # windows at the ends of the sequence hold fewer k-mers
+        for stop in range(1, len(hashes) + window):
+            windowHashes = [
+                value for value in hashes[max(stop - window, 0) : stop] if value is not None
+            ]
+            if windowHashes:
+                minimizers.add(min(windowHashes))
+        return minimizers
+
+    def test_sequenceMinimizers(self):
+        sequences = self.sequences + ["ACGTNNACGTTACG", "", "ACG"]
+        hashes, sequenceIndex = sequenceMinimizers(sequences, 6, 4)
+        for index, sequence in enumerate(sequences):
+            self.assertEqual(
+                set(hashes[sequenceIndex == index].tolist()),
+                self.bruteForceMinimizers(sequence, 6, 4),
+            )
+        self.assertEqual(
+            self.index.sketchSizes.tolist(),
+            [len(self.bruteForceMinimizers(sequence, 6, 4)) for sequence in self.sequences],
+        )
+
+    def test_sharedMinimizers(self):
+        contigs = [
+            self.sequences[0][50:250],
+            "T" * 40,
+            self.sequences[1][:100] + "N" + self.sequences[0][:100],
+        ]
+        contig, virus, shared, sketchSizes = self.index.sharedMinimizers(contigs)
+        counts = {(c, v): s for c, v, s in zip(contig.tolist(), virus.tolist(), shared.tolist())}
+        # every minimizer of a window inside the virus is one of the virus's minimizers
+        self.assertGreaterEqual(counts[(0, 0)], sketchSizes[0] - 2)
+        self.assertLess(counts.get((0, 1), 0), 5)
+        self.assertLessEqual(counts.get((1, 0), 0) + counts.get((1, 1), 0), 2)
+        self.assertGreater(counts[(2, 0)], 10)
+        self.assertGreater(counts[(2, 1)], 10)
+        with self.assertRaises(ValueError):
+            MinimizerIndex.fromSequences(["virus1"], self.sequences[:1], 6, 0)
+
+    def test_saveOpen(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileLocation = os.path.join(directory, "minimizers.bin")
+            self.index.save(fileLocation)
+            opened = MinimizerIndex.open(fileLocation)
+            self.assertEqual(opened.virusIds, ["virus1", "virus2"])
+            self.assertEqual((opened.minimizerLength, opened.window), (6, 4))
+            self.assertEqual(opened.hashes.tolist(), self.index.hashes.tolist())
+            self.assertEqual(opened.entryVirus.tolist(), self.index.entryVirus.tolist())
+            self.assertEqual(opened.sketchSizes.tolist(), self.index.sketchSizes.tolist())
+            truncatedLocation = os.path.join(directory, "truncated.bin")
+            with open(fileLocation, "rb") as file, open(truncatedLocation, "wb") as truncated:
+                truncated.write(file.read()[:-1])
+            with self.assertRaises(ValueError):
+                MinimizerIndex.open(truncatedLocation)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+import numpy as np
+from components.importBioSample import ImportBioSample
+from components.partitionedKmerCounter import PartitionedKmerCounter
+from components.qc import QualityControl
+from components.readsToKmers import ReadsToKmers
+
+
+class TestPartitionedKmerCounter(unittest.TestCase):
+    def test_matchesInMemoryIndex(self):
+        k = 21
+        biosample = ImportBioSample(
+            biosampleFile="testbiosample.fastq", batchSize=3
+        ).streamBioSample()
+        cleanedStore, minimumReadLength, report, qcMetaData = QualityControl(
+            biosample=biosample, asReadStore=True
+        ).qualityControl()
+        expected = ReadsToKmers(readsData=cleanedStore, k=k).buildKmerIndex()
+
+        with tempfile.TemporaryDirectory() as directory:
+            counter = PartitionedKmerCounter(
+                batches=ImportBioSample(
+                    biosampleFile="testbiosample.fastq", batchSize=3
+                ).streamBioSample(),
+                k=k,
+                numPartitions=8,
+                partitionDir=os.path.join(directory, "partitions"),
+            )
+            result = counter.countKmers(os.path.join(directory, "r-kmerIndex.bin"))
+            partitionedStore, kmerIndex, partitionedMinimum, partitionedReport = result[:4]
+
+            self.assertEqual(partitionedStore.ids, cleanedStore.ids)
+            self.assertEqual(partitionedMinimum, minimumReadLength)
+            self.assertEqual(partitionedReport, report)
+            self.assertGreater(np.count_nonzero(counter.partitionSizes), 1)
+            self.assertFalse(os.path.exists(counter.partitionDir))
+            for name in ["codes", "counts", "offsets", "readIndex", "positions"]:
+                self.assertTrue(
+                    np.array_equal(getattr(kmerIndex, name), getattr(expected, name))
+                )
+            self.assertEqual(kmerIndex.readIds, cleanedStore.ids)
+            del kmerIndex, result
+
+    def test_numPartitions(self):
+        with self.assertRaises(ValueError):
+            PartitionedKmerCounter(batches=[], k=5, numPartitions=6)
+        # a small k has fewer code prefixes than partitions
+        self.assertEqual(
+            PartitionedKmerCounter(batches=[], k=2, numPartitions=64).numPartitions, 16
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,9 @@ import sys
 
 
 sys.path.insert(0, "../src/components")
+sys.path.insert(0, "../src")
 import json
+import statistics
 import unittest
 import pandas as pd
 
@@ -35,6 +37,34 @@ class TestQualityControl(unittest.TestCase):
             self.assertIn("medianQ", qcReport[firstKey])
             self.assertIn("length", qcReport[firstKey])
 
+    def test_qualityControlReadStore(self):
+        biosampleDf, minSeqLength, qcReport, qcMetaData = QualityControl(
+            self.test_data
+        ).qualityControl()
+        cleanedStore, storeMinSeqLength, storeReport, storeMetaData = QualityControl(
+            self.test_data, asReadStore=True
+        ).qualityControl()
+
+        self.assertEqual(cleanedStore.ids, list(biosampleDf["id"]))
+        self.assertEqual(list(cleanedStore.sequences()), list(biosampleDf["sequence"]))
+        self.assertEqual(storeMinSeqLength, minSeqLength)
+        self.assertEqual(storeMetaData, qcMetaData)
+
+    def test_qualityControlBatchMatchesPerRead(self):
+        qc = QualityControl(self.test_data)
+        batchQc = qc.qualityControlBatch(self.test_data)
+
+        for index, read in enumerate(self.test_data.values()):
+            qscores = [qc.asciiToPhred(q) for q in read["quality"]]
+            half = len(qscores) // 2
+            trimmed = qscores[:half] + [q for q in qscores[half:] if q >= 20]
+            self.assertEqual(batchQc["trimmedLengths"][index], len(trimmed))
+            self.assertEqual(batchQc["medianQ"][index], statistics.median(trimmed))
+            self.assertAlmostEqual(batchQc["meanQ"][index], statistics.mean(trimmed))
+            self.assertEqual(
+                batchQc["keepRead"][index], statistics.median(trimmed) >= 20
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
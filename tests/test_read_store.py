@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, "../src")
+import unittest
+import numpy as np
+from components.readStore import ReadStore
+
+
+class TestReadStore(unittest.TestCase):
+    def setUp(self):
+        self.ids = ["@Read1", "@Read2", "@Read3", "@Read4"]
+        self.sequences = ["ACTGGATCTTCAG", "CTAGCNTTATC", "AGCCTTCG", "TTTAGCTAG"]
+        self.qualities = ["AAAAAA#EEE//E", "BBBAASSSDDE", "EEE...//", "AAAEEE68/"]
+        self.store = ReadStore.fromReads(self.ids, self.sequences, self.qualities)
+
+    def test_roundTrip(self):
+        self.assertEqual(len(self.store), 4)
+        self.assertEqual(list(self.store.sequences()), self.sequences)
+        self.assertEqual(self.store.quality(0)[0], ord("A") - 33)
+        # 2-bit packing: every read takes ceil(length / 4) bytes
+        self.assertEqual(len(self.store.packed), 4 + 3 + 2 + 3)
+
+    def test_subsetAndConcatenate(self):
+        subset = self.store.subset([1, 3])
+        self.assertEqual(subset.ids, ["@Read2", "@Read4"])
+        self.assertEqual(list(subset.sequences()), [self.sequences[1], self.sequences[3]])
+
+        joined = ReadStore.concatenate([self.store.subset([0, 1]), self.store.subset([2, 3])])
+        self.assertEqual(list(joined.sequences()), self.sequences)
+        np.testing.assert_array_equal(joined.qualities, self.store.qualities)
+
+    def test_saveAndLoad(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileLocation = os.path.join(tempDir, "store.npz")
+            self.store.save(fileLocation)
+            loaded = ReadStore.load(fileLocation)
+        self.assertEqual(loaded.ids, self.ids)
+        self.assertEqual(list(loaded.sequences()), self.sequences)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+from components.referenceCache import ReferenceCache
+from components.referenceIndex import REFERENCE_VERSION
+
+
+class TestReferenceCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.virusFile = os.path.join(self.directory.name, "viruses.fasta")
+        self.cacheDir = os.path.join(self.directory.name, "cache")
+        self.writeViruses("ACGTACGTTT", "GGACCATTAC")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def writeViruses(self, first, second):
+        with open(self.virusFile, "w") as file:
+            file.write(f">V1 | first virus\n{first}\n>V2 | second virus\n{second}\n")
+
+    def load(self, k=4):
+        cache = ReferenceCache([self.virusFile], k, maxHammingDistance=1, cacheDir=self.cacheDir)
+        viruses, referenceIndex = cache.load()
+        return cache, viruses, referenceIndex
+
+    def test_hit(self):
+        cache, viruses, built = self.load()
+        self.assertFalse(cache.hit)
+        cache, cachedViruses, opened = self.load()
+        self.assertTrue(cache.hit)
+        self.assertEqual(
+            cachedViruses,
+            {
+                ">V1": {"name": "first virus", "length": 10},
+                ">V2": {"name": "second virus", "length": 10},
+            },
+        )
+        self.assertEqual(opened.virusIds, built.virusIds)
+        self.assertEqual(opened.entryCodes.tolist(), built.entryCodes.tolist())
+        self.assertEqual(opened.maxHammingDistance, 1)
+
+    def test_invalidation(self):
+        self.load()
+        self.writeViruses("ACGTACGTTT", "GGACCATTACGG")
+        cache, viruses, referenceIndex = self.load()
+        self.assertFalse(cache.hit)
+        self.assertEqual(viruses[">V2"]["length"], 12)
+        # the entry of the old file is replaced, not kept alongside
+        self.assertEqual(len(os.listdir(self.cacheDir)), 2)
+        # other settings are cached separately
+        cache, viruses, referenceIndex = self.load(k=5)
+        self.assertFalse(cache.hit)
+        self.assertEqual(referenceIndex.k, 5)
+        self.assertEqual(len(os.listdir(self.cacheDir)), 4)
+
+    def test_fmIndex(self):
+        cache = ReferenceCache([self.virusFile], 4, cacheDir=self.cacheDir)
+        viruses, built = cache.loadFmIndex()
+        self.assertFalse(cache.hit)
+        # the FM-index does not depend on k
+        cache = ReferenceCache([self.virusFile], 7, cacheDir=self.cacheDir)
+        viruses, opened = cache.loadFmIndex()
+        self.assertTrue(cache.hit)
+        self.assertEqual(opened.virusIds, [">V1", ">V2"])
+        self.assertEqual(opened.bwt.tolist(), built.bwt.tolist())
+
+    def test_minimizerIndex(self):
+        cache = ReferenceCache([self.virusFile], 4, cacheDir=self.cacheDir)
+        built = cache.loadMinimizerIndex(4, 3)
+        self.assertFalse(cache.hit)
+        opened = cache.loadMinimizerIndex(4, 3)
+        self.assertTrue(cache.hit)
+        self.assertEqual(opened.virusIds, [">V1", ">V2"])
+        self.assertEqual(opened.hashes.tolist(), built.hashes.tolist())
+        # another window is cached separately
+        cache.loadMinimizerIndex(4, 2)
+        self.assertFalse(cache.hit)
+
+    def test_unreadableEntry(self):
+        cache, viruses, built = self.load()
+        indexLocation = cache.entryLocations(["kmer", 4, 1, REFERENCE_VERSION])[0]
+        with open(indexLocation, "wb") as file:
+            file.write(b"broken")
+        cache, viruses, rebuilt = self.load()
+        self.assertFalse(cache.hit)
+        self.assertEqual(rebuilt.entryCodes.tolist(), built.entryCodes.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+
+sys.path.insert(0, "../src")
+import tempfile
+import unittest
+from components import kmerCodes
+from components.referenceIndex import ReferenceIndex
+
+
+class TestReferenceIndex(unittest.TestCase):
+    def setUp(self):
+        # ACGT is shared by both viruses, GTAC by the first one twice
+        self.index = ReferenceIndex.fromSequences(
+            ["virus1", "virus2"], ["ACGTACG", "TTACGTT"], 4, maxHammingDistance=1
+        )
+
+    def test_entries(self):
+        index = self.index
+        self.assertEqual(index.virusIndptr.tolist(), [0, 4, 8])
+        self.assertEqual(
+            index.kmers(range(index.numEntries)),
+            ["ACGT", "CGTA", "GTAC", "TACG", "TTAC", "TACG", "ACGT", "CGTT"],
+        )
+        self.assertEqual(index.entryVirus.tolist(), [0, 0, 0, 0, 1, 1, 1, 1])
+        self.assertEqual(index.entryRank.tolist(), [0, 1, 2, 3, 0, 1, 2, 3])
+        self.assertEqual(index.entryPositions(0).tolist(), [0])
+        self.assertEqual(index.entryPositions(6).tolist(), [2])
+        # 6 distinct k-mers in the panel
+        self.assertEqual(len(index.codes), 6)
+
+    def test_matches(self):
+        queries = [kmerCodes.encodeKmer(kmer) for kmer in ["ACGT", "GGGG", "TACC"]]
+        queryIndex, entries, distance = self.index.matches(queries)
+        hits = sorted(zip(queryIndex.tolist(), entries.tolist(), distance.tolist()))
+        # ACGT: both viruses, TACC: TACG of both viruses
+        self.assertEqual(hits, [(0, 0, 0), (0, 6, 0), (2, 3, 1), (2, 5, 1)])
+
+    def test_positions(self):
+        index = ReferenceIndex.fromSequences(["virus"], ["ACGACGA"], 3)
+        self.assertEqual(index.kmers(range(index.numEntries)), ["ACG", "CGA", "GAC"])
+        self.assertEqual(
+            [index.entryPositions(entry).tolist() for entry in range(index.numEntries)],
+            [[0, 3], [1, 4], [2]],
+        )
+        empty = ReferenceIndex.fromSequences([], [], 3)
+        self.assertEqual(empty.numEntries, 0)
+        self.assertEqual([len(array) for array in empty.matches([1, 2])], [0, 0, 0])
+
+    def test_saveOpen(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileLocation = os.path.join(directory, "reference.bin")
+            self.index.save(fileLocation)
+            opened = ReferenceIndex.open(fileLocation)
+            self.assertEqual(opened.virusIds, ["virus1", "virus2"])
+            self.assertEqual(opened.k, 4)
+            self.assertEqual(opened.matcher.segments, self.index.matcher.segments)
+            self.assertEqual(opened.entryRank.tolist(), self.index.entryRank.tolist())
+            self.assertEqual(opened.entryPositions(6).tolist(), [2])
+            queries = [kmerCodes.encodeKmer(kmer) for kmer in ["ACGT", "GGGG", "TACC"]]
+            for openedArray, array in zip(
+                opened.matches(queries), self.index.matches(queries)
+            ):
+                self.assertEqual(openedArray.tolist(), array.tolist())
+            del opened
+
+            with open(fileLocation, "r+b") as file:
+                file.truncate(os.path.getsize(fileLocation) - 1)
+            with self.assertRaises(ValueError):
+                ReferenceIndex.open(fileLocation)
+
+
+if __name__ == "__main__":
+    unittest.main()
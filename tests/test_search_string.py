@@ -1,11 +1,17 @@
 import json
 import unittest
+import numpy as np
 import sys
 from unittest.mock import patch, mock_open
 
 sys.path.insert(0, "../src/components")
 from searchForViruses import SearchString
 
+sys.path.insert(0, "../src")
+from components.fmIndex import FmIndex
+from components.minimizerIndex import MinimizerIndex
+from components.referenceIndex import ReferenceIndex
+
 
 class TestSearchString(unittest.TestCase):
     def setUp(self):
@@ -48,6 +54,119 @@ class TestSearchString(unittest.TestCase):
         result = self.searchString.hammingDistance(virus, contig)
         self.assertEqual(result, expected)
 
+    def test_createContigsInfo(self):
+        virus = "ACGTACGGTCAGTTACG"
+        contigs = ["ACGTACGG", "TTTTACGGACGTACGN", "GG", "CAGTAACGT"]
+        searchString = SearchString(self.viruses, self.readsKmerPoolFile, contigs, 5)
+        virusKmerPool = searchString.virusToKmers(virus)
+        # every pair of virus and contig k-mers compared one by one
+        expected = []
+        for id, contig in enumerate(contigs):
+            contigKmers = [contig[i : i + 5] for i in range(len(contig) - 4)]
+            hits = [
+                {
+                    virusKmer: {
+                        "indexOfVKmerInContig": [contig.index(contigKmer), contig.index(contigKmer) + 5],
+                        "hammingDistance": searchString.hammingDistance(virusKmer, contigKmer),
+                        "kmerLength": 5,
+                    }
+                }
+                for virusKmer in virusKmerPool
+                for contigKmer in contigKmers
+                if "N" not in contigKmer
+                and searchString.hammingDistance(virusKmer, contigKmer) <= 2
+            ]
+            expected.append(
+                {"contigId": id + 1, "contig": contig, "length": len(contig), "v-kmers": hits, "kmerCount": len(hits)}
+            )
+        self.assertEqual(searchString.createContigsInfo(virusKmerPool), expected)
+        searchString.batchKmers = 1
+        self.assertEqual(searchString.createContigsInfo(virusKmerPool), expected)
+
+    def test_scanContigs(self):
+        viruses = ["ACGTACGGTCAGTTACG", "GGTCAGTTACCCAT", "TTTTTTTT"]
+        contigs = ["ACGTACGG", "TTTTACGGACGTACGN", "CAGTAACGT", "GGTCAGTTAC"]
+        searchString = SearchString(self.viruses, self.readsKmerPoolFile, contigs, 5)
+        referenceIndex = ReferenceIndex.fromSequences(["v1", "v2", "v3"], viruses, 5, 2)
+        # one scan for all viruses gives each virus the hits of its own search
+        self.assertEqual(
+            searchString.scanContigs(referenceIndex),
+            [searchString.createContigsInfo(searchString.virusToKmers(virus)) for virus in viruses],
+        )
+
+    def test_memContigs(self):
+        viruses = ["ACGTACGGTCAGTTACG", "GGTCAGTTACCCAT"]
+        contigs = ["ACGTACGG", "TTTTT", "CAGTTACGA"]
+        searchString = SearchString(
+            self.viruses, self.readsKmerPoolFile, contigs, 5, searchMode="fm"
+        )
+        fmIndex = FmIndex.fromSequences(["v1", "v2"], viruses)
+        virusContigsInfo = searchString.scanContigs(fmIndex)
+        self.assertEqual(
+            [[contig["kmerCount"] for contig in contigsInfo] for contigsInfo in virusContigsInfo],
+            [[1, 0, 1], [0, 0, 1]],
+        )
+        self.assertEqual(
+            virusContigsInfo[0][2]["mems"],
+            [{"indexOfMemInContig": [0, 8], "indexOfMemInVirus": [9, 17], "memLength": 8}],
+        )
+        # CAGTTAC of v2, the contig's C after it differs from the virus
+        self.assertEqual(
+            virusContigsInfo[1][2]["mems"],
+            [{"indexOfMemInContig": [0, 7], "indexOfMemInVirus": [3, 10], "memLength": 7}],
+        )
+        # the k-mer search with no mismatches finds the same contigs in each virus
+        searchString = SearchString(
+            self.viruses, self.readsKmerPoolFile, contigs, 5, maxHammingDistance=0
+        )
+        kmerContigsInfo = searchString.scanContigs(
+            ReferenceIndex.fromSequences(["v1", "v2"], viruses, 5, 0)
+        )
+        self.assertEqual(
+            [[contig["kmerCount"] > 0 for contig in contigsInfo] for contigsInfo in kmerContigsInfo],
+            [[contig["kmerCount"] > 0 for contig in contigsInfo] for contigsInfo in virusContigsInfo],
+        )
+        with self.assertRaises(ValueError):
+            SearchString(self.viruses, self.readsKmerPoolFile, contigs, 5, searchMode="bwa")
+
+    def test_minimizerPrefilter(self):
+        rng = np.random.default_rng(5)
+        viruses = ["".join(rng.choice(list("ACGT"), 300)) for _ in range(2)]
+        contigs = [viruses[0][10:80], viruses[1][20:90], "".join(rng.choice(list("ACGT"), 70))]
+        referenceIndex = ReferenceIndex.fromSequences(["v1", "v2"], viruses, 8, 1)
+        fmIndex = FmIndex.fromSequences(["v1", "v2"], viruses)
+        minimizerIndex = MinimizerIndex.fromSequences(["v1", "v2"], viruses, 8, 5)
+        for index in (referenceIndex, fmIndex):
+            searchMode = "fm" if index is fmIndex else "kmer"
+            unfiltered = SearchString(
+                self.viruses, self.readsKmerPoolFile, contigs, 8, 1, searchMode=searchMode
+            ).scanContigs(index)
+            searchString = SearchString(
+                self.viruses,
+                self.readsKmerPoolFile,
+                contigs,
+                8,
+                1,
+                searchMode=searchMode,
+                minSharedMinimizers=3,
+                minimizerIndex=minimizerIndex,
+            )
+            filtered = searchString.scanContigs(index)
+            # each contig is only searched against the virus it comes from
+            self.assertEqual(searchString.skippedPairs.tolist(), [2, 2])
+            self.assertEqual(searchString.skippedContigs, 1)
+            for virus in range(2):
+                for contig in range(3):
+                    if contig == virus:
+                        self.assertEqual(filtered[virus][contig], unfiltered[virus][contig])
+                        self.assertGreater(filtered[virus][contig]["kmerCount"], 0)
+                    else:
+                        self.assertEqual(filtered[virus][contig]["kmerCount"], 0)
+        # the minimizer index must hold the viruses of the reference index
+        searchString.minimizerIndex = MinimizerIndex.fromSequences(["v2"], viruses[1:], 8, 5)
+        with self.assertRaises(ValueError):
+            searchString.scanContigs(fmIndex)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,48 @@
+import sys
+import json
+
+sys.path.insert(0, "../src")
+import unittest
+from components.qc import QualityControl
+from components.readsToKmers import ReadsToKmers
+from components.shardedReadsToKmers import ShardedReadsToKmers
+
+
+class TestShardedReadsToKmers(unittest.TestCase):
+    def setUp(self):
+        with open("test_data/biosample_ex.json") as file:
+            self.test_data = json.load(file)
+        self.k = 21
+
+    def test_matchesSingleProcess(self):
+        cleanedStore, minSeqLength, qcReport, qcMetaData = QualityControl(
+            self.test_data, asReadStore=True
+        ).qualityControl()
+        codes, readIndex, positions = ReadsToKmers(
+            cleanedStore, self.k
+        ).extractKmerCodes()
+
+        batches = [{id: read} for id, read in self.test_data.items()]
+        sharded = ShardedReadsToKmers(batches, self.k, workers=2)
+        (
+            shardedStore,
+            (shardedCodes, shardedReadIndex, shardedPositions),
+            shardedMinSeqLength,
+            shardedReport,
+            shardedMetaData,
+        ) = sharded.extractKmerCodes()
+
+        self.assertEqual(shardedStore.ids, cleanedStore.ids)
+        self.assertEqual(shardedCodes.tolist(), codes.tolist())
+        self.assertEqual(shardedReadIndex.tolist(), readIndex.tolist())
+        self.assertEqual(shardedPositions.tolist(), positions.tolist())
+        self.assertEqual(shardedReport, qcReport)
+        self.assertEqual(shardedMetaData, qcMetaData)
+        self.assertEqual(
+            sum(timings["shards"] for timings in sharded.workerTimings.values()),
+            len(batches),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,27 @@
 import unittest
 from test_reads_to_kmers import TestReadsToKmers
+from test_kmer_size_selector import TestKmerSizeSelector
 from test_de_bruijn_graph import TestDeBruijnGraph
+from test_csr_graph import TestCsrGraph
+from test_graph_simplifier import TestGraphSimplifier
 from test_create_contigs import TestCreateContigs
+from test_contig_writer import TestContigWriter
+from test_contig_file import TestContigFile
 from test_search_string import TestSearchString
+from test_kmer_matcher import TestKmerMatcher
+from test_reference_index import TestReferenceIndex
+from test_reference_cache import TestReferenceCache
+from test_fm_index import TestFmIndex
+from test_minimizer_index import TestMinimizerIndex
 from test_qc import TestQualityControl
 from test_import_biosample import TestImportBioSample
 from test_import_virus import TestImportVirus
+from test_read_store import TestReadStore
+from test_kmer_codes import TestKmerCodes
+from test_kmer_index import TestKmerIndex
+from test_count_min_sketch import TestCountMinSketch
+from test_sharded_reads_to_kmers import TestShardedReadsToKmers
+from test_partitioned_kmer_counter import TestPartitionedKmerCounter
 
 
 # runs all tests
@@ -13,11 +29,31 @@ def suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestImportBioSample))
     suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestImportVirus))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestReadStore))
     suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestQualityControl))
     suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestReadsToKmers))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestKmerSizeSelector))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestKmerCodes))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestKmerIndex))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCountMinSketch))
+    suite.addTest(
+        unittest.TestLoader().loadTestsFromTestCase(TestShardedReadsToKmers)
+    )
+    suite.addTest(
+        unittest.TestLoader().loadTestsFromTestCase(TestPartitionedKmerCounter)
+    )
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCsrGraph))
     suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestDeBruijnGraph))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestGraphSimplifier))
     suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCreateContigs))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestContigWriter))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestContigFile))
     suite.addTest(unittest.makeSuite(TestSearchString))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestKmerMatcher))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestReferenceIndex))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestReferenceCache))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestFmIndex))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestMinimizerIndex))
 
     return suite
 